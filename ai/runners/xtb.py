@@ -1,19 +1,131 @@
+import codecs
 import json
+import os
+import resource
+import signal
 import subprocess
 import shlex
-import re
+import time
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, List, Optional
 
+from api.services.executor import xtb_env
+from api.services.lazy_cubes import orbitals_record
 from api.services.settings import settings
-from nox.artifacts.cubes import generate_cubes_from_molden, validate_cube_file
+from nox.parsers.xtb_output import XTBOutputParser
 
 
 def _write_xyz(xyz_text: str, path: Path) -> None:
     path.write_text(xyz_text.strip() + "\n", encoding="utf-8")
 
 
-def _run_cmd(cmd: str, cwd: Path, log_path: Path) -> int:
+# Intervalle de lecture du log pendant l'exécution (secondes)
+LOG_POLL_INTERVAL = 0.5
+# Délai entre SIGTERM et SIGKILL à l'arrêt d'un calcul (secondes)
+KILL_GRACE = 2.0
+# Tolérance sur le temps CPU mesuré (rusage compte par ticks) avant de
+# conclure que la limite CPU a été atteinte (secondes)
+CPU_TIME_SLACK = 0.1
+
+
+class RunLimits:
+    """Limites d'un calcul : temps réel, temps CPU (0 = aucune) et annulation.
+
+    Après ``_run_cmd``, ``stopped`` vaut ``"cancelled"`` ou ``"timeout"`` si
+    le calcul a été arrêté avant la fin, sinon None. ``heartbeat`` est
+    appelé au plus toutes les ``heartbeat_interval`` secondes pendant le
+    calcul (signe de vie du job).
+    """
+
+    def __init__(
+        self,
+        wall_time: float = 0,
+        cpu_time: int = 0,
+        is_cancelled: Optional[Callable[[], bool]] = None,
+        heartbeat: Optional[Callable[[], None]] = None,
+        heartbeat_interval: float = 30.0,
+    ) -> None:
+        self.wall_time = wall_time
+        self.cpu_time = cpu_time
+        self.is_cancelled = is_cancelled
+        self.heartbeat = heartbeat
+        self.heartbeat_interval = heartbeat_interval
+        self.stopped: Optional[str] = None
+        self._last_beat = float("-inf")
+
+    def apply(self, pid: int) -> None:
+        """Limite de temps CPU du processus ``pid`` (SIGXCPU puis SIGKILL)."""
+        if self.cpu_time > 0:
+            try:
+                resource.prlimit(
+                    pid,
+                    resource.RLIMIT_CPU,
+                    (self.cpu_time, self.cpu_time + int(KILL_GRACE)),
+                )
+            except ProcessLookupError:
+                # déjà terminé
+                pass
+
+    def check(self, elapsed: float) -> Optional[str]:
+        now = time.monotonic()
+        due = now - self._last_beat >= self.heartbeat_interval
+        if self.heartbeat is not None and due:
+            self._last_beat = now
+            self.heartbeat()
+        if self.is_cancelled is not None and self.is_cancelled():
+            return "cancelled"
+        if self.wall_time > 0 and elapsed > self.wall_time:
+            return "timeout"
+        return None
+
+
+def _kill_group(proc: subprocess.Popen) -> None:
+    """Arrête tout le groupe de processus de xtb : SIGTERM, puis SIGKILL."""
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(proc.pid, sig)
+        except ProcessLookupError:
+            return
+        try:
+            proc.wait(timeout=KILL_GRACE)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+
+def _reap(proc: subprocess.Popen):
+    """``proc.poll()`` par ``os.wait4``.
+
+    Renvoie les ressources consommées (rusage) par le processus s'il vient
+    de se terminer, sinon None.
+    """
+    try:
+        pid, status, usage = os.wait4(proc.pid, os.WNOHANG)
+    except ChildProcessError:
+        # déjà récupéré ailleurs
+        proc.poll()
+        return None
+    if pid == 0:
+        return None
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    return usage
+
+
+def _run_cmd(
+    cmd: str,
+    cwd: Path,
+    log_path: Path,
+    on_output: Optional[Callable[[str], None]] = None,
+    limits: Optional[RunLimits] = None,
+) -> int:
+    """Lance xtb, stdout/stderr dans ``log_path``.
+
+    xtb tourne dans son propre groupe de processus, arrêté en entier si
+    ``limits`` signale une annulation ou un dépassement de temps. Si
+    ``on_output`` est fourni, le log est relu pendant l'exécution et chaque
+    nouveau morceau de texte lui est passé (une seule lecture du log).
+    """
+    limits = limits or RunLimits()
     with log_path.open("w", encoding="utf-8") as logf:
         proc = subprocess.Popen(
             shlex.split(cmd),
@@ -21,117 +133,125 @@ def _run_cmd(cmd: str, cwd: Path, log_path: Path) -> int:
             stdout=logf,
             stderr=subprocess.STDOUT,
             text=True,
+            env=xtb_env(),
+            start_new_session=True,
         )
-        ret = proc.wait()
-    return ret
+        # pas de preexec_fn (non sûr avec des threads) : limite posée après coup
+        limits.apply(proc.pid)
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        reader = log_path.open("rb") if on_output is not None else None
+        start = last_check = time.monotonic()
+        usage = None
+        try:
+            while True:
+                if proc.returncode is None:
+                    usage = _reap(proc)
+                finished = proc.returncode is not None
+                chunk = reader.read() if reader is not None else b""
+                if chunk:
+                    on_output(decoder.decode(chunk))
+                elif finished:
+                    break
+                now = time.monotonic()
+                if not finished and now - last_check >= LOG_POLL_INTERVAL:
+                    last_check = now
+                    reason = limits.check(now - start)
+                    if reason is not None:
+                        limits.stopped = reason
+                        _kill_group(proc)
+                        continue
+                if not chunk:
+                    time.sleep(LOG_POLL_INTERVAL)
+            if reader is not None:
+                on_output(decoder.decode(b"", final=True))
+        finally:
+            if reader is not None:
+                reader.close()
+            if proc.poll() is None:
+                _kill_group(proc)
+    # limite CPU atteinte : le noyau a tué xtb. Un SIGKILL venu d'ailleurs
+    # (OOM killer, opérateur) avant la limite reste un échec.
+    cpu_used = usage.ru_utime + usage.ru_stime if usage is not None else 0.0
+    if (
+        limits.stopped is None
+        and limits.cpu_time > 0
+        and proc.returncode in (-signal.SIGXCPU, -signal.SIGKILL)
+        and cpu_used >= limits.cpu_time - CPU_TIME_SLACK
+    ):
+        limits.stopped = "timeout"
+    return proc.returncode
 
 
-def _parse_xtbout_json(json_path: Path) -> Dict[str, float]:
-    scalars: Dict[str, float] = {}
-    try:
-        data = json.loads(json_path.read_text(encoding="utf-8"))
-    except Exception:
-        return scalars
-
-    # énergie totale, plusieurs variantes possibles
-    # essayer chemins connus, sinon rien
-    candidates_E = [
-        ("energy", "total"),
-        ("results", "total_energy"),
-        ("scf", "etot"),
-        ("etot",),
-    ]
-    for path in candidates_E:
-        node = data
-        try:
-            for k in path:
-                node = node[k]
-            if isinstance(node, (int, float, str)):
-                scalars["E_total_hartree"] = float(node)
-                break
-        except Exception:
-            continue
+def _feed_file(parser: XTBOutputParser, path: Path, chunk_size: int = 1 << 20):
+    """Passe un fichier texte au parseur par morceaux."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    with path.open("rb") as f:
+        while chunk := f.read(chunk_size):
+            parser.feed(decoder.decode(chunk))
+    parser.feed(decoder.decode(b"", final=True))
+    parser.close()
 
-    # gap eV
-    candidates_gap = [
-        ("gap",),
-        ("results", "gap"),
-        ("orbitals", "gap"),
-    ]
-    for path in candidates_gap:
-        node = data
-        try:
-            for k in path:
-                node = node[k]
-            if isinstance(node, (int, float, str)):
-                scalars["gap_eV"] = float(node)
-                break
-        except Exception:
-            continue
 
-    # dipôle total en Debye
-    candidates_dip = [
-        ("dipole", "total"),
-        ("properties", "dipole", "total"),
-    ]
-    for path in candidates_dip:
-        node = data
-        try:
-            for k in path:
-                node = node[k]
-            if isinstance(node, (int, float, str)):
-                scalars["dipole_D"] = float(node)
-                break
-        except Exception:
-            continue
+# Noms possibles du fichier Molden selon la version de xtb
+MOLDEN_NAMES = ("molden.input", "orbitals.molden")
 
-    return scalars
 
+def _xtb_method_flags(params: Dict[str, Any], charge: int) -> str:
+    """Options qui définissent le calcul (méthode, charge, spin), hors tâches."""
+    flags = f"--gfn {int(params.get('gfn', 2))}"
+    if params.get("uhf", False):
+        flags += " --uhf"
+    # charge, si différent de valeur par défaut
+    chrg = int(params.get("chrg", charge))
+    if chrg != 0:
+        flags += f" --chrg {chrg}"
+    return flags
 
-def _parse_from_text(text: str) -> Dict[str, float]:
-    scalars: Dict[str, float] = {}
-    # Energie totale, lignes type: "TOTAL ENERGY  -40.123456 Hartree"
-    m = re.search(r"TOTAL\s+ENERGY\s+(-?\d+\.\d+)", text, re.IGNORECASE)
-    if m:
-        try:
-            scalars["E_total_hartree"] = float(m.group(1))
-        except Exception:
-            pass
-    # GAP, lignes type: "HOMO-LUMO GAP  5.43 eV"
-    m = re.search(r"HOMO[-\s]?LUMO\s+GAP\s+(\d+\.\d+)", text, re.IGNORECASE)
-    if m:
-        try:
-            scalars["gap_eV"] = float(m.group(1))
-        except Exception:
-            pass
-    # Dipôle total, lignes type: "dipole moment  total:   1.234 Debye"
-    m = re.search(r"dipole\s+moment.*total[:\s]+(\d+\.\d+)", text, re.IGNORECASE)
-    if m:
-        try:
-            scalars["dipole_D"] = float(m.group(1))
-        except Exception:
-            pass
-    return scalars
+
+def _find_molden(work: Path) -> Path:
+    for name in MOLDEN_NAMES:
+        molden = work / name
+        if molden.is_file() and molden.stat().st_size > 0:
+            return molden
+    return Path()
 
 
-def _maybe_generate_molden(work: Path, inp_name: str) -> Path:
-    """Essaye de produire un fichier Molden pour les MOs, utile pour générer des cubes plus tard.
-    Plusieurs binaires xtb supportent l'option --molden, selon version. On essaie sans casser le job.
+def _restart_for_molden(
+    work: Path, inp_name: str, method_flags: str, limits: RunLimits
+) -> Path:
+    """Dernier recours si le calcul principal n'a pas écrit de Molden.
+
+    Simple point sur la géométrie optimisée (``xtbopt.xyz``) avec les mêmes
+    options de méthode ; xtb repart de ``xtbrestart`` s'il existe, donc le
+    SCF converge en quelques itérations au lieu d'un calcul complet. Soumis
+    aux mêmes ``limits`` que le calcul principal.
     """
-    molden = work / "orbitals.molden"
-    cmd = f"{settings.xtb_bin} {inp_name} --molden"
+    geometry = "xtbopt.xyz" if (work / "xtbopt.xyz").exists() else inp_name
+    cmd = f"{settings.xtb_bin} {geometry} {method_flags} --molden"
     try:
-        ret = _run_cmd(cmd, work, work / "molden.log")
-        if ret == 0 and molden.exists() and molden.stat().st_size > 0:
-            return molden
+        _run_cmd(cmd, work, work / "molden.log", limits=limits)
     except Exception:
         pass
-    return Path()
+    return _find_molden(work)
 
 
 def run_xtb_job(
-    job_dir: Path, xyz: str, charge: int, multiplicity: int, params: Dict[str, Any]
+    job_dir: Path,
+    xyz: str,
+    charge: int,
+    multiplicity: int,
+    params: Dict[str, Any],
+    on_progress: Optional[Callable[[float], None]] = None,
+    limits: Optional[RunLimits] = None,
 ) -> Dict[str, Any]:
+    """Exécute xtb dans ``job_dir`` et assemble le ResultBundle.
+
+    Le log est analysé au fil de l'eau par ``XTBOutputParser`` : les mêmes
+    données servent à ``on_progress`` (fraction dans [0, 1]) et au résultat
+    final (scalaires et séries). Un calcul arrêté par ``limits`` garde ses
+    résultats partiels et porte ``stopped`` (``cancelled`` ou ``timeout``).
+    """
+    limits = limits or RunLimits()
     job_dir.mkdir(parents=True, exist_ok=True)
     inp = job_dir / "input.xyz"
     _write_xyz(xyz, inp)
@@ -141,28 +261,53 @@ def run_xtb_job(
     json_out = job_dir / "xtbout.json"
 
     # commande XTB
-    gfn = int(params.get("gfn", 2))
-    cmd = f"{settings.xtb_bin} {inp.name} --gfn {gfn} --json"
+    method_flags = _xtb_method_flags(params, charge)
+    cmd = f"{settings.xtb_bin} {inp.name} {method_flags} --json"
     if params.get("opt", True):
         cmd += " --opt"
     if params.get("hess", False):
         cmd += " --hess"
-    if params.get("uhf", False):
-        cmd += " --uhf"
-    # charge, si différent de valeur par défaut
-    chrg = int(params.get("chrg", charge))
-    if chrg != 0:
-        cmd += f" --chrg {chrg}"
+    # orbitales écrites par le calcul principal (géométrie finale)
+    if params.get("cubes", False):
+        cmd += " --molden"
+
+    parser = XTBOutputParser()
 
-    # exécuter
-    ret = _run_cmd(cmd, job_dir, log)
+    def on_output(text: str) -> None:
+        for event in parser.feed(text):
+            if on_progress is not None and "progress" in event:
+                on_progress(event["progress"])
+
+    # exécuter (le log est analysé pendant le calcul)
+    ret = _run_cmd(cmd, job_dir, log, on_output=on_output, limits=limits)
+    parser.close()
 
-    scalars: Dict[str, float] = {}
     artifacts: List[Dict[str, Any]] = []
 
-    # parse prioritaire du JSON
+    # xtb.out seulement si le log n'a rien donné
+    if out.is_file():
+        if not parser.scalars():
+            _feed_file(parser, out)
+        artifacts.append(
+            {
+                "name": "xtb.out",
+                "path": str(out),
+                "mime": "text/plain",
+                "size": out.stat().st_size,
+            }
+        )
+
+    # trajectoire d'optimisation (énergie, gradient par géométrie)
+    opt_log = job_dir / "xtbopt.log"
+    if opt_log.is_file():
+        _feed_file(parser, opt_log)
+
+    # le JSON est prioritaire pour les scalaires
     if json_out.exists():
-        scalars.update(_parse_xtbout_json(json_out))
+        try:
+            parser.feed_json(json.loads(json_out.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            pass
         artifacts.append(
             {
                 "name": "xtbout.json",
@@ -172,30 +317,8 @@ def run_xtb_job(
             }
         )
 
-    # fallback parsing texte
-    text = ""
-    if out.exists() and out.is_file():
-        try:
-            text = out.read_text(encoding="utf-8", errors="ignore")
-            artifacts.append(
-                {
-                    "name": "xtb.out",
-                    "path": str(out),
-                    "mime": "text/plain",
-                    "size": out.stat().st_size,
-                }
-            )
-        except Exception:
-            text = ""
-    if not text and log.exists():
-        try:
-            text = log.read_text(encoding="utf-8", errors="ignore")
-        except Exception:
-            text = ""
-    if text:
-        parsed = _parse_from_text(text)
-        for k, v in parsed.items():
-            scalars.setdefault(k, v)
+    scalars = parser.scalars()
+    series = parser.series()
 
     # logs en artefacts (seulement si pas déjà ajouté et si existe)
     if log.exists() and not any(a["name"] == "xtb.log" for a in artifacts):
@@ -208,10 +331,31 @@ def run_xtb_job(
             }
         )
 
-    # génération Molden si demandé
+    # géométrie optimisée et restart, réutilisables par les étapes suivantes
+    for name, mime in (
+        ("xtbopt.xyz", "chemical/x-xyz"),
+        ("xtbrestart", "application/octet-stream"),
+    ):
+        path = job_dir / name
+        if path.is_file():
+            artifacts.append(
+                {
+                    "name": name,
+                    "path": str(path),
+                    "mime": mime,
+                    "size": path.stat().st_size,
+                }
+            )
+
+    # orbitales : les cubes sont construits à la demande (api.services.lazy_cubes)
+    orbitals = None
     if params.get("cubes", False):
-        molden_path = _maybe_generate_molden(job_dir, inp.name)
-        if molden_path and molden_path.exists() and molden_path.is_file():
+        molden_path = _find_molden(job_dir)
+        # xtb peut finir en erreur (ex. optimisation non convergée, code 2)
+        # avec une énergie : la reprise vaut alors la peine
+        if not molden_path.is_file() and limits.stopped is None and scalars:
+            molden_path = _restart_for_molden(job_dir, inp.name, method_flags, limits)
+        if molden_path.is_file():
             artifacts.append(
                 {
                     "name": molden_path.name,
@@ -220,39 +364,16 @@ def run_xtb_job(
                     "size": molden_path.stat().st_size,
                 }
             )
+            orbitals = orbitals_record(molden_path.name)
 
-            # Generate HOMO/LUMO cube files using our cube module
-            try:
-                cube_files = generate_cubes_from_molden(
-                    molden_path, job_dir, ["homo", "lumo"]
-                )
-
-                for cube_file in cube_files:
-                    if cube_file.exists():
-                        cube_info = validate_cube_file(cube_file)
-                        artifacts.append(
-                            {
-                                "name": cube_file.name,
-                                "path": str(cube_file),
-                                "mime": "application/x-cube",
-                                "size": cube_file.stat().st_size,
-                                "metadata": cube_info,
-                            }
-                        )
-
-            except Exception as e:
-                print(f"Cube generation failed: {e}")
-        else:
-            # XTB peut générer molden.input automatiquement
-            molden_input = job_dir / "molden.input"
-            if molden_input.exists():
-                artifacts.append(
-                    {
-                        "name": "molden.input",
-                        "path": str(molden_input),
-                        "mime": "text/plain",
-                        "size": molden_input.stat().st_size,
-                    }
-                )
-
-    return {"scalars": scalars, "series": {}, "artifacts": artifacts, "returncode": ret}
+    result = {
+        "scalars": scalars,
+        "series": series,
+        "artifacts": artifacts,
+        "returncode": ret,
+    }
+    if orbitals:
+        result["orbitals"] = orbitals
+    if limits.stopped is not None:
+        result["stopped"] = limits.stopped
+    return result
@@ -1,11 +1,35 @@
 from __future__ import annotations
-from fastapi import APIRouter, HTTPException, Request
-from pydantic import BaseModel, ValidationError
-from typing import Any, Dict
-from api.services.queue import submit_job
-from api.services.jobs_store import get_store
-from api.schemas.job import JobRequest, JobStatus
+import asyncio
+from functools import partial
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from pydantic import BaseModel, TypeAdapter, ValidationError
+from typing import Any, Dict, List, Optional
+from api.services.async_jobs_store import get_async_store
+from api.services.artifacts import (
+    artifact_representation,
+    available_encodings,
+    compressed_chunks,
+    etag_for,
+    etag_matches,
+    find_artifact,
+)
+from api.services.cube_views import VIEW_KINDS, cached_view
+from api.services.ensemble import ENSEMBLE_KIND, submit_ensemble
+from api.services.executor import QueueFullError, get_executor
+from api.services.queue import cancel_job, submit, submit_many
+from api.services.result_cache import get_result_cache
+from api.services.scratch import live_path
+from api.services.settings import settings
+from api.services.sse import sse_response, tail_file
+from api.services.workflow import submit_workflow
+from api.services.jobs_store import TERMINAL_STATES
+from api.services.job_events import wait_for_job
+from api.services.lazy_cubes import find_lazy_cube, lazy_cube_names
+from api.schemas.job import JobRequest, JobStatus, Priority, WorkflowRequest
 from api.schemas.result import ResultBundle, Artifact
+from nox.artifacts.cubes import CubeGenerationError
+from nox.parsers.xtb_progress import XTBProgressParser
 
 router = APIRouter()
 
@@ -13,6 +37,12 @@ router = APIRouter()
 class SimpleJobRequest(BaseModel):
     kind: str = "echo"
     payload: Dict[str, Any] = {}
+    user: Optional[str] = None
+    priority: Optional[Priority] = None
+
+
+# Public (JobStatus) state names accepted as aliases of store states
+STATE_ALIASES = {"pending": "queued", "completed": "done"}
 
 
 @router.post("/jobs")
@@ -26,42 +56,175 @@ async def create_job(request: Request):
         if "kind" in body and "payload" in body:
             # Simple job request
             simple_req = SimpleJobRequest(**body)
-            job_id = submit_job(simple_req.kind, simple_req.payload)
-            j = get_store().get(job_id)
-            if j is None:
-                raise HTTPException(500, "Failed to create job")
-            return {"job_id": job_id, "state": j.state}
+            j = await asyncio.to_thread(
+                submit,
+                simple_req.kind,
+                simple_req.payload,
+                user=simple_req.user,
+                priority=simple_req.priority,
+            )
+            return {"job_id": j.id, "state": j.state}
 
         # Otherwise try to parse as XTB JobRequest
         try:
             xtb_req = JobRequest(**body)
-            payload = {"job_request": xtb_req.model_dump_json()}
-            job_id = submit_job("xtb", payload)
+            if xtb_req.kind == ENSEMBLE_KIND:
+                j = await asyncio.to_thread(submit_ensemble, xtb_req)
+                return JobStatus(
+                    job_id=j.id,
+                    state="completed" if j.state == "done" else j.state,
+                    progress=1.0 if j.state == "done" else j.progress,
+                    message="Ensemble submitted",
+                )
+            payload = {"job_request": xtb_req.model_dump()}
+            j = await asyncio.to_thread(
+                submit,
+                "xtb",
+                payload,
+                user=xtb_req.user,
+                priority=xtb_req.priority or "interactive",
+            )
+            if j.state == "done":
+                return JobStatus(
+                    job_id=j.id,
+                    state="completed",
+                    progress=1.0,
+                    message="Result served from cache",
+                )
 
             return JobStatus(
-                job_id=job_id, state="pending", message="Job queued for processing"
+                job_id=j.id,
+                state="pending",
+                message="Job queued for processing",
+                queue_position=_queue_position(j.id),
             )
         except ValidationError:
             raise HTTPException(422, "Invalid job request format")
 
+    except QueueFullError as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": "5"})
     except Exception as e:
         raise HTTPException(400, f"Invalid request: {str(e)}")
 
 
+_job_request_list = TypeAdapter(List[JobRequest])
+
+
+@router.post("/jobs/batch")
+async def create_jobs_batch(request: Request):
+    """Create many XTB jobs from a JSON array or an NDJSON stream"""
+    body = await request.body()
+    try:
+        if "ndjson" in request.headers.get("content-type", ""):
+            requests = [
+                JobRequest.model_validate_json(line)
+                for line in body.splitlines()
+                if line.strip()
+            ]
+        else:
+            requests = _job_request_list.validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(422, f"Invalid job request format: {e}")
+
+    if not requests:
+        raise HTTPException(422, "Empty batch")
+    if any(r.kind == ENSEMBLE_KIND for r in requests):
+        raise HTTPException(422, "Ensemble jobs must be submitted individually")
+    if len(requests) > settings.jobs_batch_max:
+        raise HTTPException(
+            413, f"Batch too large: {len(requests)} > {settings.jobs_batch_max}"
+        )
+
+    try:
+        jobs = await asyncio.to_thread(
+            submit_many,
+            "xtb",
+            [{"job_request": r.model_dump()} for r in requests],
+            users=[r.user for r in requests],
+            priorities=[r.priority or "batch" for r in requests],
+        )
+    except QueueFullError as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": "5"})
+    return {
+        "job_ids": [j.id for j in jobs],
+        "count": len(jobs),
+        "cached": sum(1 for j in jobs if j.state == "done"),
+    }
+
+
+@router.post("/jobs/workflow", response_model=JobStatus)
+async def create_workflow(req: WorkflowRequest):
+    """Run chained XTB stages server-side; the returned job tracks the whole DAG"""
+    try:
+        j = await asyncio.to_thread(submit_workflow, req)
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    except QueueFullError as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": "5"})
+    return JobStatus(
+        job_id=j.id,
+        state="completed" if j.state == "done" else j.state,
+        progress=1.0 if j.state == "done" else j.progress,
+        message=f"Workflow of {len(req.stages)} stages submitted",
+    )
+
+
 @router.post("/jobs/simple")
-def create_simple_job(req: SimpleJobRequest):
+async def create_simple_job(req: SimpleJobRequest):
     """Create a simple job (echo, etc.) - legacy endpoint"""
-    job_id = submit_job(req.kind, req.payload)
-    j = get_store().get(job_id)
-    if j is None:
-        raise HTTPException(500, "Failed to create job")
-    return {"job_id": job_id, "state": j.state}
+    try:
+        j = await asyncio.to_thread(
+            submit, req.kind, req.payload, user=req.user, priority=req.priority
+        )
+    except QueueFullError as e:
+        raise HTTPException(503, str(e), headers={"Retry-After": "5"})
+    return {"job_id": j.id, "state": j.state}
+
+
+@router.get("/jobs")
+async def list_jobs(
+    state: Optional[str] = None,
+    user: Optional[str] = None,
+    cursor: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """List jobs newest first; `next_cursor` is the offset of the next page"""
+    state = STATE_ALIASES.get(state, state)
+    jobs, next_cursor = await get_async_store().list_jobs(
+        state=state, user=user, cursor=cursor, limit=limit
+    )
+    return {
+        "jobs": [
+            {
+                "job_id": j.id,
+                "state": j.state,
+                "user": j.user,
+                "error": j.error,
+                "created_at": j.created_at,
+                "updated_at": j.updated_at,
+            }
+            for j in jobs
+        ],
+        "next_cursor": next_cursor,
+    }
+
+
+@router.get("/metrics/jobs")
+async def get_job_metrics():
+    """Job subsystem counters (result cache, local executor)"""
+    cache = get_result_cache()
+    return {
+        "result_cache": (
+            await asyncio.to_thread(cache.stats) if cache is not None else None
+        ),
+        "local_executor": get_executor().stats(),
+    }
 
 
 @router.get("/jobs/{job_id}")
-def get_job_simple(job_id: str):
+async def get_job_simple(job_id: str):
     """Get job status (raw format) - primary endpoint for simple jobs"""
-    j = get_store().get(job_id)
+    j = await get_async_store().get(job_id)
     if not j:
         raise HTTPException(404, detail="Job not found")
     # Convert id to job_id for consistency
@@ -72,31 +235,105 @@ def get_job_simple(job_id: str):
 
 
 @router.get("/jobs/{job_id}/status", response_model=JobStatus)
-def get_job_status(job_id: str):
+async def get_job_status(job_id: str):
     """Get job status (JobStatus format with state mapping)"""
-    j = get_store().get(job_id)
+    j = await get_async_store().get(job_id)
     if not j:
         raise HTTPException(404, "Job not found")
+    return _job_status(j)
+
+
+@router.get("/jobs/{job_id}/wait", response_model=JobStatus)
+async def wait_job(job_id: str, timeout: float = Query(30, ge=0)):
+    """Long-poll: return the job's status once it finishes or after ``timeout``"""
+    j = await wait_for_job(job_id, min(timeout, settings.job_wait_max_sec))
+    if not j:
+        raise HTTPException(404, "Job not found")
+    return _job_status(j)
+
+
+# Map our job states to the expected states
+API_STATES = {
+    "queued": "pending",
+    "running": "running",
+    "done": "completed",
+    "failed": "failed",
+}
 
-    # Map our job states to the expected states
-    state_mapping = {
-        "queued": "pending",
-        "running": "running",
-        "done": "completed",
-        "failed": "failed",
-    }
 
+def _job_status(j) -> JobStatus:
+    job_id = j.id
     return JobStatus(
         job_id=job_id,
-        state=state_mapping.get(j.state, j.state),
+        state=API_STATES.get(j.state, j.state),
+        progress=1.0 if j.state == "done" else j.progress,
         message=j.error or "Job processing",
+        queue_position=_queue_position(job_id) if j.state == "queued" else None,
     )
 
 
+@router.post("/jobs/{job_id}/cancel", response_model=JobStatus)
+@router.delete("/jobs/{job_id}", response_model=JobStatus)
+async def cancel(job_id: str):
+    """Cancel a job; a running xtb is killed and its partial results kept"""
+    j = await asyncio.to_thread(cancel_job, job_id)
+    if not j:
+        raise HTTPException(404, "Job not found")
+    if j.state in ("done", "failed", "timeout"):
+        raise HTTPException(409, f"Job already {j.state}")
+    return JobStatus(
+        job_id=job_id,
+        state=API_STATES.get(j.state, j.state),
+        progress=j.progress,
+        message="Job cancelled" if j.state == "cancelled" else "Cancellation requested",
+    )
+
+
+def _queue_position(job_id: str) -> Optional[int]:
+    """Position in the local scheduler; None in Redis mode or once dispatched."""
+    return get_executor().position(job_id)
+
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Stream XTB progress parsed from the job log as server-sent events"""
+    store = get_async_store()
+    j = await store.get(job_id)
+    if not j:
+        raise HTTPException(404, "Job not found")
+    # The log lives in the scratch directory until the job is persisted
+    log_path = partial(live_path, job_id, "xtb.log")
+
+    async def is_done() -> bool:
+        current = await store.get(job_id)
+        return current is None or current.state in TERMINAL_STATES
+
+    async def events():
+        parser = XTBProgressParser()
+        async for chunk in tail_file(log_path, is_done):
+            for event in parser.feed(chunk):
+                if "progress" in event:
+                    await store.set_progress(job_id, event["progress"])
+                yield ("progress", event)
+        for event in parser.close():
+            yield ("progress", event)
+        final = await store.get(job_id)
+        yield (
+            "state",
+            {
+                "job_id": job_id,
+                "state": final.state if final else "unknown",
+                "error": final.error if final else None,
+            },
+        )
+
+    return sse_response(events(), heartbeat=settings.sse_heartbeat_sec)
+
+
 @router.get("/jobs/{job_id}/artifacts", response_model=ResultBundle)
-def get_artifacts(job_id: str):
+async def get_artifacts(job_id: str):
     """Get job results and artifacts if calculation is completed"""
-    j = get_store().get(job_id)
+    j = await get_async_store().get(job_id)
     if not j or j.state != "done" or not j.result:
         raise HTTPException(404, "Result not available")
 
@@ -108,5 +345,114 @@ def get_artifacts(job_id: str):
         artifacts.append(Artifact(**art_dict))
 
     return ResultBundle(
-        scalars=rb.get("scalars", {}), series=rb.get("series", {}), artifacts=artifacts
+        scalars=rb.get("scalars", {}),
+        series=rb.get("series", {}),
+        artifacts=artifacts,
+        cubes=lazy_cube_names(rb),
+    )
+
+
+async def _job_artifact(job_id: str, name: str):
+    """Declared artifact of a job, or a cube built on demand from its orbitals"""
+    j = await get_async_store().get(job_id)
+    if not j:
+        raise HTTPException(404, "Job not found")
+    found = find_artifact(j.result, name)
+    if found is None and j.state == "done":
+        try:
+            found = await asyncio.to_thread(find_lazy_cube, j.result, name)
+        except CubeGenerationError as e:
+            raise HTTPException(503, f"Cube generation unavailable: {e}")
+    if found is None:
+        raise HTTPException(404, "Artifact not found")
+    return found
+
+
+@router.get("/jobs/{job_id}/artifacts/{name}/{view}")
+async def get_cube_view(
+    job_id: str,
+    name: str,
+    view: str,
+    resolution: int = Query(64, ge=2, le=512),
+    isovalue: Optional[float] = None,
+    axis: int = Query(2, ge=0, le=2),
+    index: Optional[int] = Query(None, ge=0),
+):
+    """Reduced view of a cube artifact: ``grid``, ``slice`` or ``isosurface``.
+
+    Grids are block-averaged to at most ``resolution`` points per axis
+    before slicing or meshing; results are cached per artifact and
+    parameters.
+    """
+    if view not in VIEW_KINDS:
+        raise HTTPException(404, f"Unknown view: {view}")
+    found = await _job_artifact(job_id, name)
+    if found[1].get("mime") != "application/x-cube":
+        raise HTTPException(404, "Cube artifact not found")
+    try:
+        path = await asyncio.to_thread(
+            cached_view,
+            found[0],
+            view,
+            resolution,
+            isovalue=isovalue,
+            axis=axis,
+            index=index,
+        )
+    except ValueError as e:
+        raise HTTPException(422, str(e))
+    return FileResponse(path, media_type="application/json")
+
+
+@router.get("/jobs/{job_id}/artifacts/{name}")
+async def download_artifact(
+    job_id: str,
+    name: str,
+    request: Request,
+    compress: Optional[str] = None,
+    format: Optional[str] = None,
+):
+    """Download one artifact file.
+
+    Served with sendfile via FileResponse, with Range and If-None-Match
+    support. ``?format=`` picks one of the artifact's declared ``formats``
+    (e.g. ``cube`` or ``npz`` for compact cubes). ``?compress=gzip|zstd``
+    streams an on-the-fly compressed copy instead (no ranges).
+    """
+    # Validate every query parameter before a 304 can short-circuit
+    if compress and compress not in available_encodings():
+        raise HTTPException(406, f"Unsupported compression: {compress}")
+    stored, art = await _job_artifact(job_id, name)
+    try:
+        path, media_type, body = await asyncio.to_thread(
+            artifact_representation, stored, art, format
+        )
+    except ValueError as e:
+        raise HTTPException(406, str(e))
+
+    stat = await asyncio.to_thread(path.stat)
+    # A content hash only describes the stored file
+    etag = etag_for(art if path == stored else {}, stat)
+    if body is not None:
+        # Converted on the fly from the stored file
+        etag = f'{etag[:-1]}-cube"'
+    if compress:
+        etag = f'{etag[:-1]}-{compress}"'
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    headers = {"ETag": etag}
+    if body is not None:
+        headers["Content-Disposition"] = f'attachment; filename="{name}"'
+    if compress:
+        headers["Content-Encoding"] = compress
+        body = compressed_chunks(path if body is None else body, compress)
+    if body is not None:
+        return StreamingResponse(body, media_type=media_type, headers=headers)
+    return FileResponse(
+        path,
+        media_type=media_type,
+        filename=path.name if path.name.startswith(name) else name,
+        stat_result=stat,
+        headers=headers,
     )
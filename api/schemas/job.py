@@ -1,4 +1,10 @@
-from pydantic import BaseModel
+from typing import Any, Dict, List, Literal, Optional, Union
+
+from pydantic import BaseModel, Field, model_validator
+
+
+# Scheduling classes, served in this order (see api.services.scheduler)
+Priority = Literal["interactive", "batch", "bulk"]
 
 
 class XTBParams(BaseModel):
@@ -12,16 +18,70 @@ class XTBParams(BaseModel):
 
 
 class JobInputs(BaseModel):
-    xyz: str
+    # One geometry; for "ensemble" jobs a multi-frame XYZ or a list of frames
+    xyz: Union[str, List[str]]
     charge: int = 0
     multiplicity: int = 1
     params: XTBParams = XTBParams()
+    # Kelvin, used for ensemble Boltzmann weights
+    temperature: float = 298.15
+
+
+class JobLimits(BaseModel):
+    # Seconds; None uses the server default, capped by it when both are set
+    wall_time_sec: Optional[float] = Field(None, gt=0)
+    cpu_time_sec: Optional[int] = Field(None, gt=0)
 
 
 class JobRequest(BaseModel):
     engine: str = "xtb"
     kind: str = "opt_properties"
     inputs: JobInputs
+    user: Optional[str] = None
+    # Default: interactive for single jobs, batch for batches and ensembles
+    priority: Optional[Priority] = None
+    limits: JobLimits = JobLimits()
+
+    @model_validator(mode="after")
+    def _frames_only_for_ensembles(self):
+        if isinstance(self.inputs.xyz, list) and self.kind != "ensemble":
+            raise ValueError("a list of geometries requires kind 'ensemble'")
+        return self
+
+
+class WorkflowStage(BaseModel):
+    name: str
+    # XTBParams overrides for this stage
+    params: Dict[str, Any] = {}
+    depends_on: List[str] = []
+
+
+def default_stages() -> List[WorkflowStage]:
+    """opt, then hess, properties and cubes in parallel on the optimized geometry."""
+    return [
+        WorkflowStage(name="opt", params={"opt": True}),
+        WorkflowStage(
+            name="hess", params={"opt": False, "hess": True}, depends_on=["opt"]
+        ),
+        WorkflowStage(name="properties", params={"opt": False}, depends_on=["opt"]),
+        WorkflowStage(
+            name="cubes", params={"opt": False, "cubes": True}, depends_on=["opt"]
+        ),
+    ]
+
+
+class WorkflowRequest(BaseModel):
+    engine: str = "xtb"
+    inputs: JobInputs
+    stages: List[WorkflowStage] = Field(default_factory=default_stages)
+    user: Optional[str] = None
+    priority: Optional[Priority] = None
+
+    @model_validator(mode="after")
+    def _single_geometry(self):
+        if isinstance(self.inputs.xyz, list):
+            raise ValueError("workflows take a single geometry")
+        return self
 
 
 class JobStatus(BaseModel):
@@ -29,3 +89,5 @@ class JobStatus(BaseModel):
     state: str
     progress: float = 0.0
     message: str = ""
+    # Estimated 1-based position among queued jobs (local mode only)
+    queue_position: Optional[int] = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Dict, List
+from typing import Any, Dict, List, Optional
 
 
 class Artifact(BaseModel):
@@ -7,9 +7,17 @@ class Artifact(BaseModel):
     path: str
     mime: str = "application/octet-stream"
     size: int
+    # Content hash, recorded when the file is persisted from a scratch run
+    sha256: Optional[str] = None
+    # Download representations (?format=...), the first being the default;
+    # empty when the file is only served as stored
+    formats: List[str] = []
+    metadata: Dict[str, Any] = {}
 
 
 class ResultBundle(BaseModel):
     scalars: Dict[str, float] = {}
     series: Dict[str, List[List[float]]] = {}
     artifacts: List[Artifact] = []
+    # Cube artifacts built on first download from the job's orbitals
+    cubes: List[str] = []
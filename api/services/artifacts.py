@@ -0,0 +1,113 @@
+"""
+Artifact lookup and download helpers for the job routes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+from nox.artifacts.cubes import COMPACT_SUFFIX, cube_text_chunks
+
+from .settings import settings
+
+CHUNK_SIZE = 1024 * 1024
+
+try:  # optional dependency
+    import zstandard
+except ImportError:  # pragma: no cover - depends on environment
+    zstandard = None
+
+
+def find_artifact(result: Optional[dict], name: str) -> Optional[Tuple[Path, dict]]:
+    """Return the path and record of artifact ``name`` declared in a job result.
+
+    Only declared artifacts that live under ``settings.artifacts_root`` are
+    served, so a tampered record cannot expose arbitrary files.
+    """
+    if not result:
+        return None
+    root = settings.artifacts_root.resolve()
+    for art in result.get("artifacts", []):
+        if art.get("name") != name:
+            continue
+        path = Path(art.get("path", "")).resolve()
+        if not path.is_relative_to(root) or not path.is_file():
+            return None
+        return path, art
+    return None
+
+
+def artifact_representation(
+    path: Path, art: Dict[str, Any], fmt: Optional[str]
+) -> Tuple[Path, str, Optional[Iterator[bytes]]]:
+    """Return the file, media type and body serving ``art`` in format ``fmt``.
+
+    Artifacts without declared ``formats`` are served as stored (the body
+    is None: send the file). Compact cubes requested as text are converted
+    while streaming; the body yields the text and nothing is written.
+    """
+    formats = art.get("formats") or []
+    mime = art.get("mime") or "application/octet-stream"
+    if not formats:
+        if fmt:
+            raise ValueError(f"Artifact has no alternative formats: {fmt}")
+        return path, mime, None
+    fmt = fmt or formats[0]
+    if fmt not in formats:
+        raise ValueError(f"Unsupported format: {fmt}")
+    compact = path.name.endswith(COMPACT_SUFFIX)
+    if fmt == "npz":
+        return path, "application/x-npz", None
+    if fmt == "cube" and compact:
+        return path, mime, cube_text_chunks(path)
+    return path, mime, None
+
+
+def etag_for(art: Dict[str, Any], stat: os.stat_result) -> str:
+    """Strong ETag from the stored content hash, else from size and mtime."""
+    digest = art.get("sha256")
+    if not digest:
+        base = f"{stat.st_mtime_ns}-{stat.st_size}"
+        digest = hashlib.md5(base.encode(), usedforsecurity=False).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def available_encodings() -> Tuple[str, ...]:
+    return ("gzip", "zstd") if zstandard is not None else ("gzip",)
+
+
+def _file_chunks(path: Path) -> Iterator[bytes]:
+    with path.open("rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            yield chunk
+
+
+def compressed_chunks(
+    source: Union[Path, Iterable[bytes]], encoding: str
+) -> Iterator[bytes]:
+    """Compress a file or a byte stream on the fly, one chunk at a time."""
+    if encoding == "zstd":
+        if zstandard is None:
+            raise ValueError("zstd support is not installed")
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+    elif encoding == "gzip":
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    else:
+        raise ValueError(f"Unsupported encoding: {encoding}")
+    chunks = _file_chunks(source) if isinstance(source, Path) else source
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    yield compressor.flush()
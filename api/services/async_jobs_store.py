@@ -0,0 +1,188 @@
+"""
+Asyncio access to the jobs store for the API's request handlers.
+
+Status polls, listings and progress updates go through ``get_async_store``
+so they never block the event loop nor take a threadpool slot:
+
+* ``AsyncRedisJobsStore`` talks to Redis with ``redis.asyncio`` over one
+  connection pool shared by the whole process;
+* ``AsyncInMemoryJobsStore`` reads the process-local store in local mode
+  (its operations are short, lock-protected dict accesses);
+* ``AsyncThreadedJobsStore`` runs any other blocking store (e.g. a Redis
+  store built on an injected client) in worker threads.
+
+Writes that dispatch jobs (``queue.submit`` and friends) keep using the
+blocking store.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+from typing import List, Optional, Tuple
+
+from .envelope import offloaded_name, read_offloaded
+from .jobs_store import (
+    AtomicRedisJobsStore,
+    InMemoryJobsStore,
+    Job,
+    RedisJobsStore,
+    RedisKeys,
+    _SET_PROGRESS_LUA,
+    _job_from_flat,
+    get_store,
+)
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - depends on environment
+    aioredis = None
+
+
+class AsyncInMemoryJobsStore:
+    def __init__(self, store: InMemoryJobsStore) -> None:
+        self.store = store
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return self.store.get(job_id)
+
+    async def list_jobs(
+        self,
+        state: Optional[str] = None,
+        user: Optional[str] = None,
+        cursor: int = 0,
+        limit: int = 50,
+    ) -> Tuple[List[Job], Optional[int]]:
+        return self.store.list_jobs(state=state, user=user, cursor=cursor, limit=limit)
+
+    async def set_progress(self, job_id: str, progress: float) -> None:
+        self.store.set_progress(job_id, progress)
+
+
+class AsyncThreadedJobsStore:
+    """Any blocking store, called from worker threads."""
+
+    def __init__(self, store) -> None:
+        self.store = store
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    async def list_jobs(
+        self,
+        state: Optional[str] = None,
+        user: Optional[str] = None,
+        cursor: int = 0,
+        limit: int = 50,
+    ) -> Tuple[List[Job], Optional[int]]:
+        return await asyncio.to_thread(
+            self.store.list_jobs, state=state, user=user, cursor=cursor, limit=limit
+        )
+
+    async def set_progress(self, job_id: str, progress: float) -> None:
+        await asyncio.to_thread(self.store.set_progress, job_id, progress)
+
+
+class AsyncRedisJobsStore(RedisKeys):
+    """Read side of ``RedisJobsStore`` on a ``redis.asyncio`` client.
+
+    Writes (submit, cancel) stay on the sync store, run by the routes with
+    ``asyncio.to_thread``: besides the job hash they read the result cache
+    on disk, join flights and enqueue on the broker or local executor, all
+    blocking calls that would have to run in a thread anyway.
+    """
+
+    def __init__(self, redis_client, prefix: str, atomic: bool = True) -> None:
+        self.r = redis_client
+        self.prefix = prefix
+        self._set_progress_script = (
+            self.r.register_script(_SET_PROGRESS_LUA) if atomic else None
+        )
+
+    async def _job(self, data) -> Job:
+        job = _job_from_flat(
+            [x for item in data.items() for x in item], follow_refs=False
+        )
+        name = offloaded_name(job.result)
+        if name is not None:
+            # Large results live in the job directory: read them off the loop
+            job.result = await asyncio.to_thread(read_offloaded, job.id, name)
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        data = await self.r.hgetall(self._key(job_id))
+        if not data:
+            return None
+        return await self._job(data)
+
+    async def list_jobs(
+        self,
+        state: Optional[str] = None,
+        user: Optional[str] = None,
+        cursor: int = 0,
+        limit: int = 50,
+    ) -> Tuple[List[Job], Optional[int]]:
+        """Same paging as ``RedisJobsStore.list_jobs``."""
+        if state is not None:
+            index = self._state_index(state)
+        elif user is not None:
+            index = self._user_index(user)
+        else:
+            index = self._created_index()
+        ids = await self.r.zrevrange(index, cursor, cursor + limit)
+        has_more = len(ids) > limit
+        ids = [i.decode() if isinstance(i, bytes) else i for i in ids[:limit]]
+
+        pipe = self.r.pipeline()
+        for job_id in ids:
+            pipe.hgetall(self._key(job_id))
+        found = [data for data in await pipe.execute() if data]
+        jobs = await asyncio.gather(*map(self._job, found))
+        if user is not None:
+            jobs = [job for job in jobs if job.user == user]
+        return list(jobs), (cursor + limit if has_more else None)
+
+    async def set_progress(self, job_id: str, progress: float) -> None:
+        if self._set_progress_script is None:
+            await self.r.hset(self._key(job_id), "progress", json.dumps(progress))
+            return
+        await self._set_progress_script(
+            keys=[self._key(job_id)], args=[json.dumps("running"), json.dumps(progress)]
+        )
+
+
+_pool = None
+_async_store = None
+_async_store_for = None
+_async_lock = threading.Lock()
+
+
+def redis_pool(url: str):
+    """Connection pool shared by every asyncio Redis client of the process."""
+    global _pool
+    if _pool is None:
+        _pool = aioredis.ConnectionPool.from_url(url)
+    return _pool
+
+
+def get_async_store():
+    """Asyncio view of ``get_store()``'s backend."""
+    global _async_store, _async_store_for
+    store = get_store()
+    with _async_lock:
+        if _async_store is None or _async_store_for is not store:
+            url = os.getenv("REDIS_URL")
+            if isinstance(store, InMemoryJobsStore):
+                _async_store = AsyncInMemoryJobsStore(store)
+            elif isinstance(store, RedisJobsStore) and url and aioredis is not None:
+                _async_store = AsyncRedisJobsStore(
+                    aioredis.Redis(connection_pool=redis_pool(url)),
+                    store.prefix,
+                    atomic=isinstance(store, AtomicRedisJobsStore),
+                )
+            else:
+                _async_store = AsyncThreadedJobsStore(store)
+            _async_store_for = store
+        return _async_store
@@ -0,0 +1,153 @@
+"""
+Reduced views of cube artifacts for web viewers.
+
+Downsampled grids, slice planes and isosurface meshes are computed from a
+cube artifact (text or compact) and cached on disk per artifact version
+and view parameters, so repeated viewer requests are served as files.
+Arrays are returned base64-encoded in little-endian binary form, ready for
+``Float32Array``/``Uint32Array`` on the client.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from nox.artifacts.cubes import COMPACT_SUFFIX, CubeFile
+from nox.artifacts.isosurface import downsample, marching_tetrahedra
+
+from .disk_cache import DiskLRUCache
+from .settings import settings
+
+VIEW_FILE = "view.json"
+VIEW_KINDS = ("grid", "slice", "isosurface")
+
+
+def load_cube(path: Path) -> CubeFile:
+    if path.name.endswith(COMPACT_SUFFIX):
+        return CubeFile.from_compact(path)
+    return CubeFile(path)
+
+
+def encode_array(array: np.ndarray, dtype: str) -> Dict[str, Any]:
+    data = np.ascontiguousarray(array, dtype=np.dtype(dtype).newbyteorder("<"))
+    return {
+        "dtype": dtype,
+        "shape": list(data.shape),
+        "data": base64.b64encode(data.tobytes()).decode("ascii"),
+    }
+
+
+def _volume(cube: CubeFile) -> np.ndarray:
+    data = np.asarray(cube.data)
+    # Multi-orbital cubes: views show the first orbital
+    return data[..., 0] if data.ndim == 4 else data
+
+
+def compute_view(
+    cube: CubeFile,
+    kind: str,
+    resolution: int,
+    isovalue: Optional[float] = None,
+    axis: int = 2,
+    index: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Compute one view of ``cube`` as a JSON-serializable dict."""
+    h = cube.header
+    data, origin, axes = downsample(
+        _volume(cube), np.asarray(h["origin"]), np.asarray(h["axes"]), resolution
+    )
+    view: Dict[str, Any] = {"kind": kind, "source_shape": list(h["shape"])}
+    if kind == "grid":
+        view.update(
+            origin=origin.tolist(),
+            axes=axes.tolist(),
+            values=encode_array(data, "float32"),
+        )
+    elif kind == "slice":
+        if not 0 <= axis <= 2:
+            raise ValueError("axis must be 0, 1 or 2")
+        # index refers to the full-resolution grid; default is the middle plane
+        full = h["shape"][axis]
+        index = full // 2 if index is None else index
+        if not 0 <= index < full:
+            raise ValueError(f"index out of range for axis {axis}: {index}")
+        reduced = min(data.shape[axis] - 1, index * data.shape[axis] // full)
+        others = [a for a in range(3) if a != axis]
+        view.update(
+            axis=axis,
+            index=index,
+            origin=(origin + reduced * axes[axis]).tolist(),
+            axes=axes[others].tolist(),
+            values=encode_array(np.take(data, reduced, axis=axis), "float32"),
+        )
+    elif kind == "isosurface":
+        if isovalue is None:
+            raise ValueError("isovalue is required")
+        vertices, faces = marching_tetrahedra(data, isovalue, origin, axes)
+        view.update(
+            isovalue=isovalue,
+            vertices=encode_array(vertices, "float32"),
+            faces=encode_array(faces, "uint32"),
+        )
+    else:
+        raise ValueError(f"Unknown view: {kind}")
+    return view
+
+
+def view_key(path: Path, kind: str, **params: Any) -> str:
+    """Cache key of a view: artifact file version plus view parameters."""
+    stat = path.stat()
+    ident = {
+        "path": str(path),
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "kind": kind,
+        **params,
+    }
+    return hashlib.sha256(json.dumps(ident, sort_keys=True).encode()).hexdigest()
+
+
+_cache_singleton: Optional[DiskLRUCache] = None
+
+
+def get_view_cache() -> DiskLRUCache:
+    global _cache_singleton
+    if _cache_singleton is None:
+        _cache_singleton = DiskLRUCache(
+            settings.artifacts_root / "_cache" / "views",
+            settings.cube_view_cache_max_bytes,
+        )
+    return _cache_singleton
+
+
+def cached_view(
+    path: Path,
+    kind: str,
+    resolution: int,
+    isovalue: Optional[float] = None,
+    axis: int = 2,
+    index: Optional[int] = None,
+) -> Path:
+    """Return the JSON file holding the requested view, computing it once."""
+    params: Dict[str, Any] = {"resolution": resolution}
+    if kind == "isosurface":
+        params["isovalue"] = isovalue
+    elif kind == "slice":
+        params.update(axis=axis, index=index)
+    key = view_key(path, kind, **params)
+    cache = get_view_cache()
+    entry = cache.get(key)
+    if entry is None:
+        view = compute_view(load_cube(path), kind, **params)
+
+        def populate(tmp: Path) -> None:
+            (tmp / VIEW_FILE).write_text(json.dumps(view), encoding="utf-8")
+
+        entry = cache.put(key, populate)
+    return entry / VIEW_FILE
@@ -0,0 +1,155 @@
+"""
+Size-bounded, content-addressed on-disk LRU cache.
+
+Each entry is a directory named after its key. Entries are built in a
+temporary directory and renamed into place, so readers never observe a
+partially written entry. Recency is tracked in memory (seeded from entry
+mtimes at startup) and mirrored to disk by touching the entry on access,
+so several processes sharing the same root converge on the same order.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+
+def _tree_size(path: Path) -> int:
+    total = 0
+    for p in path.rglob("*"):
+        try:
+            if p.is_file():
+                total += p.stat().st_size
+        except OSError:
+            continue
+    return total
+
+
+class DiskLRUCache:
+    """Directory-per-entry cache evicting least recently used entries."""
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # key -> bytes
+        self._bytes = 0
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _entry_dir(self, key: str) -> Path:
+        return self.root / key
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        self.root.mkdir(parents=True, exist_ok=True)
+        found = []
+        for d in self.root.iterdir():
+            if d.is_dir() and not d.name.startswith("."):
+                found.append((d.stat().st_mtime, d.name, _tree_size(d)))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._bytes += size
+        self._loaded = True
+
+    def get(self, key: str, load: Optional[Callable[[Path], Any]] = None) -> Any:
+        """Return the entry directory for ``key`` or None, marking it used.
+
+        With ``load``, return ``load(entry_dir)`` instead; an entry that
+        fails to load (OSError, ValueError, KeyError) counts as a miss and
+        None is returned. Hits are only counted once the entry is usable.
+        """
+        with self._lock:
+            self._load()
+            d = self._entry_dir(key)
+            if key not in self._entries:
+                # Another process may have populated it since we loaded
+                if not d.is_dir():
+                    self.misses += 1
+                    return None
+                size = _tree_size(d)
+                self._entries[key] = size
+                self._bytes += size
+            elif not d.is_dir():
+                self._bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        value = d
+        if load is not None:
+            try:
+                value = load(d)
+            except (OSError, ValueError, KeyError):
+                with self._lock:
+                    self.misses += 1
+                return None
+        with self._lock:
+            self.hits += 1
+        try:
+            now = time.time()
+            os.utime(d, (now, now))
+        except OSError:
+            pass
+        return value
+
+    def put(self, key: str, populate: Callable[[Path], None]) -> Path:
+        """Build an entry with ``populate(tmp_dir)`` and publish it atomically.
+
+        If the entry already exists it is kept and returned unchanged.
+        """
+        with self._lock:
+            self._load()
+        final = self._entry_dir(key)
+        if final.is_dir():
+            return final
+        tmp = self.root / f".tmp-{key}-{uuid.uuid4().hex}"
+        tmp.mkdir(parents=True)
+        try:
+            populate(tmp)
+            size = _tree_size(tmp)
+            try:
+                os.rename(tmp, final)
+            except OSError:
+                # Lost a race with another writer: keep theirs
+                shutil.rmtree(tmp, ignore_errors=True)
+                return final
+        except Exception:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = size
+                self._bytes += size
+            self._entries.move_to_end(key)
+            self._evict(keep=key)
+        return final
+
+    def _evict(self, keep: str) -> None:
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            key, size = next(iter(self._entries.items()))
+            if key == keep:
+                break
+            del self._entries[key]
+            self._bytes -= size
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
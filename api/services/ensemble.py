@@ -0,0 +1,174 @@
+"""
+Ensemble jobs: one XTB child job per frame, aggregated on the parent.
+
+An ``ensemble`` request carries a multi-frame XYZ (or a list of frames).
+The parent job is created in the ``running`` state and each frame is
+submitted as an ordinary ``xtb`` job whose payload points back to the
+parent. Every finished child records itself on the parent; whichever
+child completes the set aggregates per-frame energies and gaps into the
+parent's result, with Boltzmann weights.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from api.schemas.job import JobRequest
+
+from .jobs_store import Job, get_store
+
+ENSEMBLE_KIND = "ensemble"
+# Boltzmann constant in Hartree per Kelvin
+KB_HARTREE = 3.166811563e-6
+HARTREE_TO_KCAL = 627.509474
+
+
+def split_frames(xyz) -> List[str]:
+    """Split a multi-frame XYZ into frames (a list is returned as is).
+
+    Each frame starts with an atom count line followed by a comment line
+    and that many atom lines.
+    """
+    if isinstance(xyz, list):
+        return [frame.strip() + "\n" for frame in xyz if frame.strip()]
+    lines = xyz.strip().splitlines()
+    frames = []
+    pos = 0
+    while pos < len(lines):
+        if not lines[pos].strip():
+            pos += 1
+            continue
+        try:
+            natoms = int(lines[pos].split()[0])
+        except ValueError:
+            raise ValueError(f"Expected an atom count on XYZ line {pos + 1}")
+        end = pos + 2 + natoms
+        if end > len(lines):
+            raise ValueError(f"Truncated XYZ frame starting on line {pos + 1}")
+        frames.append("\n".join(lines[pos:end]) + "\n")
+        pos = end
+    return frames
+
+
+def boltzmann_weights(energies: np.ndarray, temperature: float) -> np.ndarray:
+    """Normalized Boltzmann weights of ``energies`` (Hartree); NaN gets weight 0."""
+    valid = np.isfinite(energies)
+    weights = np.zeros_like(energies, dtype=float)
+    if not valid.any():
+        return weights
+    rel = energies[valid] - energies[valid].min()
+    w = np.exp(-rel / (KB_HARTREE * temperature))
+    weights[valid] = w / w.sum()
+    return weights
+
+
+def submit_ensemble(job_request: JobRequest) -> Job:
+    """Create the parent job and fan out one ``xtb`` child job per frame."""
+    from .queue import submit_many
+
+    frames = split_frames(job_request.inputs.xyz)
+    if not frames:
+        raise ValueError("Ensemble contains no frames")
+
+    store = get_store()
+    parent = store.create(user=job_request.user)
+    store.set_state(parent.id, "running")
+
+    payloads = []
+    for index, frame in enumerate(frames):
+        inputs = job_request.inputs.model_copy(update={"xyz": frame})
+        child = job_request.model_copy(
+            update={"kind": "opt_properties", "inputs": inputs}
+        )
+        payloads.append(
+            {
+                "job_request": child.model_dump(),
+                "parent_id": parent.id,
+                "frame": index,
+                "ensemble_size": len(frames),
+                "temperature": job_request.inputs.temperature,
+            }
+        )
+    try:
+        submit_many(
+            "xtb",
+            payloads,
+            users=[job_request.user] * len(frames),
+            priorities=[job_request.priority or "batch"] * len(frames),
+        )
+    except Exception as e:
+        store.set_state(parent.id, "failed", error=str(e))
+        raise
+    return store.get(parent.id) or parent
+
+
+def child_finished(payload: Dict[str, Any]) -> None:
+    """Record a finished child on its parent; aggregate once all are done."""
+    parent_id = payload.get("parent_id") if isinstance(payload, dict) else None
+    if not parent_id:
+        return
+    store = get_store()
+    size = int(payload["ensemble_size"])
+    count = store.add_child(parent_id, int(payload["frame"]), payload["job_id"])
+    if count < size:
+        store.set_progress(parent_id, count / size)
+        return
+    if store.cancel_requested(parent_id):
+        store.set_state(parent_id, "cancelled", error="Job cancelled")
+        return
+    aggregate(parent_id, size, float(payload.get("temperature", 298.15)))
+
+
+def aggregate(parent_id: str, size: int, temperature: float) -> None:
+    store = get_store()
+    children = store.children(parent_id)
+    child_ids = [children.get(i) for i in range(size)]
+    energies = np.full(size, np.nan)
+    gaps = np.full(size, np.nan)
+    for i, child_id in enumerate(child_ids):
+        job: Optional[Job] = store.get(child_id) if child_id else None
+        if job is None or job.state != "done" or not job.result:
+            continue
+        scalars = job.result.get("scalars", {})
+        energies[i] = scalars.get("E_total_hartree", np.nan)
+        gaps[i] = scalars.get("gap_eV", np.nan)
+
+    ok = np.isfinite(energies)
+    if not ok.any():
+        store.set_state(parent_id, "failed", error=f"All {size} frames failed")
+        return
+
+    weights = boltzmann_weights(energies, temperature)
+    frames = np.flatnonzero(ok)
+    relative = (energies - energies[ok].min()) * HARTREE_TO_KCAL
+
+    def series(values: np.ndarray) -> List[List[float]]:
+        keep = frames[np.isfinite(values[frames])]
+        return np.column_stack([keep, values[keep]]).tolist()
+
+    scalars = {
+        "n_frames": float(size),
+        "n_failed": float(size - ok.sum()),
+        "E_min_hartree": float(energies[ok].min()),
+        "E_boltzmann_hartree": float(weights[ok] @ energies[ok]),
+    }
+    gap_ok = ok & np.isfinite(gaps)
+    if gap_ok.any():
+        w = weights[gap_ok] / weights[gap_ok].sum()
+        scalars["gap_boltzmann_eV"] = float(w @ gaps[gap_ok])
+
+    result = {
+        "scalars": scalars,
+        "series": {
+            "energy_hartree": series(energies),
+            "relative_energy_kcal_mol": series(relative),
+            "gap_eV": series(gaps),
+            "boltzmann_weight": series(weights),
+        },
+        "artifacts": [],
+        "children": child_ids,
+        "temperature": temperature,
+    }
+    store.set_state(parent_id, "done", result=result)
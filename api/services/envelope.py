@@ -0,0 +1,167 @@
+"""
+Versioned binary envelope for job requests, messages and results.
+
+An envelope is a 4-byte header (``NX``, format version, codec) followed
+by a JSON body, compressed when it is large: zstd when ``zstandard`` is
+installed, zlib otherwise. JSON is produced with ``orjson`` when it is
+available; NumPy values become lists or numbers and bytes become base64
+text with either encoder. Payloads without the header are read as plain
+JSON, so values written before the envelope existed still decode.
+
+Job results larger than ``settings.result_inline_max_bytes`` are written
+to the job directory and only a reference is kept in the store.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import os
+import uuid
+import zlib
+from typing import Any, Optional
+
+from .settings import settings
+from .storage import job_dir
+
+try:  # optional dependency
+    import orjson
+except ImportError:  # pragma: no cover - depends on environment
+    orjson = None
+
+try:  # optional dependency
+    import zstandard
+except ImportError:  # pragma: no cover - depends on environment
+    zstandard = None
+
+# Decompression errors reported as a corrupt envelope
+_CORRUPT = (zlib.error,) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+MAGIC = b"NX"
+VERSION = 1
+CODEC_RAW = b"j"
+CODEC_ZLIB = b"z"
+CODEC_ZSTD = b"s"
+# Bodies smaller than this are not worth compressing
+COMPRESS_MIN_BYTES = 4096
+RESULT_PREFIX = "result."
+RESULT_SUFFIX = ".nxe"
+_REF = "$ref"
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return base64.b64encode(obj).decode("ascii")
+    if hasattr(obj, "tolist"):
+        # NumPy arrays and scalars
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _to_json(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(
+            obj,
+            default=_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY,
+        )
+    return json.dumps(obj, separators=(",", ":"), default=_default).encode()
+
+
+def _from_json(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode ``obj`` as an envelope."""
+    body = _to_json(obj)
+    codec = CODEC_RAW
+    if len(body) >= COMPRESS_MIN_BYTES:
+        if zstandard is not None:
+            body, codec = zstandard.ZstdCompressor(level=3).compress(body), CODEC_ZSTD
+        else:
+            body, codec = zlib.compress(body, 6), CODEC_ZLIB
+    return MAGIC + bytes([VERSION]) + codec + body
+
+
+def loads(data: Any) -> Any:
+    """Decode an envelope; plain JSON (str or bytes) is accepted as is.
+
+    Raises ValueError for an unknown version or codec, or a corrupt body.
+    """
+    if isinstance(data, str):
+        data = data.encode()
+    data = bytes(data)
+    if not data.startswith(MAGIC):
+        return _from_json(data)
+    if len(data) < 4:
+        raise ValueError("Truncated envelope header")
+    version, codec, body = data[2], data[3:4], data[4:]
+    if version != VERSION:
+        raise ValueError(f"Unsupported envelope version: {version}")
+    try:
+        if codec == CODEC_ZLIB:
+            body = zlib.decompress(body)
+        elif codec == CODEC_ZSTD:
+            if zstandard is None:
+                raise ValueError("zstd envelope but zstandard is not installed")
+            body = zstandard.ZstdDecompressor().decompress(body)
+        elif codec != CODEC_RAW:
+            raise ValueError(f"Unknown envelope codec: {codec!r}")
+    except _CORRUPT as e:
+        raise ValueError(f"Corrupt envelope: {e}") from e
+    return _from_json(body)
+
+
+def dump_result(job_id: str, result: Optional[dict]) -> bytes:
+    """Encode a job result, offloading it to the job directory when large.
+
+    Each offload gets a file of its own, so writing one never replaces the
+    result of a transition already stored; a write the store rejects is
+    undone with ``discard_result``.
+    """
+    data = dumps(result)
+    if result is None or len(data) <= settings.result_inline_max_bytes:
+        return data
+    name = f"{RESULT_PREFIX}{uuid.uuid4().hex}{RESULT_SUFFIX}"
+    path = job_dir(job_id) / name
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return dumps({_REF: name, "size": len(data)})
+
+
+def offloaded_name(value: Any) -> Optional[str]:
+    """File name a decoded result refers to, or None for an inline result."""
+    if isinstance(value, dict) and set(value) == {_REF, "size"}:
+        return value[_REF]
+    return None
+
+
+def read_offloaded(job_id: str, name: str) -> Optional[dict]:
+    """Read an offloaded result; None when its file has been removed."""
+    try:
+        return loads((settings.artifacts_root / job_id / name).read_bytes())
+    except FileNotFoundError:
+        return None
+
+
+def discard_result(job_id: str, data: bytes) -> None:
+    """Remove the file offloaded by ``dump_result`` for ``data``, if any."""
+    name = offloaded_name(loads(data))
+    if name is not None:
+        (settings.artifacts_root / job_id / name).unlink(missing_ok=True)
+
+
+def load_result(job_id: str, data: Any) -> Optional[dict]:
+    """Decode a stored job result, following an offloaded reference.
+
+    A reference whose file has been removed decodes to None.
+    """
+    if data is None:
+        return None
+    result = loads(data)
+    name = offloaded_name(result)
+    return result if name is None else read_offloaded(job_id, name)
@@ -0,0 +1,136 @@
+"""
+Bounded executor for local (no Redis) job mode.
+
+A fixed number of slots pull jobs from a bounded ``FairQueue`` (priority
+classes, per-user fair share and concurrency caps, see ``scheduler``).
+Each slot runs at most one xtb process at a time, and the cores are partitioned between
+slots through ``OMP_NUM_THREADS`` (see ``xtb_env``). When the queue is full
+new submissions are rejected with ``QueueFullError`` so the API can answer
+with 503 instead of forking an unbounded number of processes.
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from .scheduler import DEFAULT_PRIORITY, FairQueue
+from .settings import settings
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the local job queue cannot accept more work."""
+
+
+def slot_count() -> int:
+    if settings.local_workers > 0:
+        return settings.local_workers
+    threads = max(1, settings.xtb_threads)
+    return max(1, (os.cpu_count() or 1) // threads)
+
+
+def xtb_env() -> Dict[str, str]:
+    """Environment for an xtb subprocess, pinned to its share of the cores."""
+    env = dict(os.environ)
+    if settings.xtb_threads > 0:
+        threads = str(settings.xtb_threads)
+        env["OMP_NUM_THREADS"] = threads
+        env["MKL_NUM_THREADS"] = threads
+        env.setdefault("OMP_STACKSIZE", "1G")
+    return env
+
+
+class LocalExecutor:
+    def __init__(self, workers: int, max_queue: int) -> None:
+        if workers < 1 or max_queue < 1:
+            raise ValueError("workers and max_queue must be at least 1")
+        self.workers = workers
+        self.max_queue = max_queue
+        self._queue = FairQueue(
+            max_queue, settings.user_weights, settings.user_max_running
+        )
+        self._lock = threading.Lock()
+        self._threads: list = []
+        self._busy = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(
+                    target=self._loop, name=f"local-job-{i}", daemon=True
+                )
+                t.start()
+                self._threads.append(t)
+
+    def _loop(self) -> None:
+        while True:
+            (fn, args), user = self._queue.get()
+            with self._lock:
+                self._busy += 1
+            try:
+                fn(*args)
+            except Exception:  # noqa: BLE001 - job functions record their own errors
+                pass
+            finally:
+                with self._lock:
+                    self._busy -= 1
+                    self.completed += 1
+                self._queue.task_done(user)
+
+    def ensure_capacity(self, n: int = 1) -> None:
+        """Raise QueueFullError unless ``n`` more jobs fit in the queue."""
+        if self._queue.qsize() + n > self.max_queue:
+            with self._lock:
+                self.rejected += n
+            raise QueueFullError(
+                f"Local job queue is full ({self._queue.qsize()}/{self.max_queue})"
+            )
+
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        key: Any = None,
+        user: Optional[str] = None,
+        priority: str = DEFAULT_PRIORITY,
+    ) -> None:
+        self._start()
+        try:
+            self._queue.put((fn, args), key=key, user=user, priority=priority)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise QueueFullError(f"Local job queue is full ({self.max_queue})")
+
+    def position(self, key: Any) -> Optional[int]:
+        """Estimated queue position of the job submitted with ``key``."""
+        return self._queue.position(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                "workers": self.workers,
+                "busy": self._busy,
+                "queued": self._queue.qsize(),
+                "max_queue": self.max_queue,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+        stats.update(self._queue.stats())
+        return stats
+
+
+_executor_singleton: Optional[LocalExecutor] = None
+
+
+def get_executor() -> LocalExecutor:
+    global _executor_singleton
+    if _executor_singleton is None:
+        _executor_singleton = LocalExecutor(slot_count(), settings.local_queue_max)
+    return _executor_singleton
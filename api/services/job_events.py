@@ -0,0 +1,156 @@
+"""
+Waiting for jobs to finish without polling the store.
+
+``GET /jobs/{id}/wait`` parks the request on an asyncio future that is
+resolved when the job changes state:
+
+* with Redis, every ``set_state`` publishes ``{"id", "state"}`` on the
+  store's events channel (inside the transition script for the atomic
+  store); each API process subscribes once, with ``redis.asyncio``, and
+  fans the messages out to its waiting requests;
+* in local mode the in-memory store calls ``Waiters.notify`` directly.
+
+Pub/sub delivery is best effort, so a waiter still re-reads the job every
+few seconds; when no event source is available (a Redis store on an
+injected client) it falls back to polling every ``job_wait_poll_sec``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from .async_jobs_store import aioredis, get_async_store, redis_pool
+from .jobs_store import (
+    TERMINAL_STATES,
+    InMemoryJobsStore,
+    Job,
+    RedisJobsStore,
+    get_store,
+)
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Re-read interval while an event source is active, in case one is missed
+RECHECK_SEC = 5.0
+
+_Entry = Tuple[asyncio.AbstractEventLoop, asyncio.Future]
+
+
+def _resolve(future: asyncio.Future, state: str) -> None:
+    if not future.done():
+        future.set_result(state)
+
+
+class Waiters:
+    """Futures of requests waiting on a job, resolved from any thread."""
+
+    def __init__(self) -> None:
+        self._waiting: Dict[str, Set[_Entry]] = {}
+        self._lock = threading.Lock()
+
+    def add(self, job_id: str) -> _Entry:
+        loop = asyncio.get_running_loop()
+        entry = (loop, loop.create_future())
+        with self._lock:
+            self._waiting.setdefault(job_id, set()).add(entry)
+        return entry
+
+    def discard(self, job_id: str, entry: _Entry) -> None:
+        with self._lock:
+            entries = self._waiting.get(job_id)
+            if entries is not None:
+                entries.discard(entry)
+                if not entries:
+                    del self._waiting[job_id]
+
+    def notify(self, job_id: str, state: str) -> None:
+        with self._lock:
+            entries = list(self._waiting.get(job_id, ()))
+        for loop, future in entries:
+            try:
+                loop.call_soon_threadsafe(_resolve, future, state)
+            except RuntimeError:
+                # The waiter's loop is closed
+                pass
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(entries) for entries in self._waiting.values())
+
+
+waiters = Waiters()
+
+_source_for = None
+_listener: Optional[asyncio.Task] = None
+_source_lock = threading.Lock()
+
+
+async def _listen(channel: str, url: str) -> None:
+    client = aioredis.Redis(connection_pool=redis_pool(url))
+    pubsub = client.pubsub()
+    await pubsub.subscribe(channel)
+    try:
+        async for message in pubsub.listen():
+            if message.get("type") != "message":
+                continue
+            try:
+                event = json.loads(message["data"])
+                waiters.notify(event["id"], event["state"])
+            except (KeyError, TypeError, ValueError):
+                logger.warning("Ignoring malformed job event: %r", message["data"])
+    finally:
+        await pubsub.aclose()
+
+
+def _ensure_source() -> bool:
+    """Hook the waiters to the store's events; False when there are none."""
+    global _source_for, _listener
+    store = get_store()
+    with _source_lock:
+        if isinstance(store, InMemoryJobsStore):
+            if _source_for is not store:
+                store.add_listener(waiters.notify)
+                _source_for = store
+            return True
+        url = os.getenv("REDIS_URL")
+        if not isinstance(store, RedisJobsStore) or not url or aioredis is None:
+            return False
+        if _listener is None or _listener.done() or _source_for is not store:
+            if _listener is not None and not _listener.done():
+                _listener.cancel()
+            _listener = asyncio.get_running_loop().create_task(
+                _listen(store._events_channel(), url)
+            )
+            _source_for = store
+        return True
+
+
+async def wait_for_job(job_id: str, timeout: float) -> Optional[Job]:
+    """Return the job once it is in a terminal state or ``timeout`` elapses.
+
+    None when the job does not exist.
+    """
+    store = get_async_store()
+    recheck = RECHECK_SEC if _ensure_source() else settings.job_wait_poll_sec
+    deadline = time.monotonic() + timeout
+    while True:
+        # Register before reading so a transition in between is not lost
+        entry = waiters.add(job_id)
+        try:
+            j = await store.get(job_id)
+            remaining = deadline - time.monotonic()
+            if j is None or j.state in TERMINAL_STATES or remaining <= 0:
+                return j
+            try:
+                await asyncio.wait_for(entry[1], min(remaining, recheck))
+            except asyncio.TimeoutError:
+                pass
+        finally:
+            waiters.discard(job_id, entry)
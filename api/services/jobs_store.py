@@ -3,19 +3,57 @@ import os
 import json
 import time
 import uuid
+import logging
 import threading
+from collections import OrderedDict
 from dataclasses import dataclass, asdict
-from typing import Optional, Dict
+from typing import Callable, Optional, Dict, List, Tuple
 
+from nox.jobs.states import JobState, is_terminal_state, is_valid_transition
 
-@dataclass
+from . import envelope
+from .envelope import discard_result, dump_result, load_result
+from .settings import settings
+from .storage import job_dir
+
+logger = logging.getLogger(__name__)
+
+# Store-level state names mapped onto the canonical job state machine
+STORE_STATES: Dict[str, JobState] = {
+    "queued": JobState.PENDING,
+    "running": JobState.RUNNING,
+    "done": JobState.COMPLETED,
+    "failed": JobState.FAILED,
+    "cancelled": JobState.CANCELLED,
+    "timeout": JobState.TIMEOUT,
+}
+TERMINAL_STATES = tuple(
+    name for name, state in STORE_STATES.items() if is_terminal_state(state)
+)
+
+
+def allowed_sources(state: str) -> List[str]:
+    """Return the store states from which a transition to ``state`` is valid."""
+    target = STORE_STATES.get(state)
+    if target is None:
+        raise ValueError(f"Unknown job state: {state}")
+    return [
+        name
+        for name, current in STORE_STATES.items()
+        if is_valid_transition(current, target)
+    ]
+
+
+@dataclass(slots=True)
 class Job:
     id: str
-    state: str = "queued"  # queued|running|done|failed
+    state: str = "queued"  # queued|running|done|failed|cancelled|timeout
     result: Optional[dict] = None
     error: Optional[str] = None
     created_at: float = 0.0
     updated_at: float = 0.0
+    user: Optional[str] = None
+    progress: float = 0.0
 
     def to_dict(self) -> dict:
         d = asdict(self)
@@ -24,21 +62,176 @@ class Job:
         return d
 
 
+# Seconds before per-user running counters and cancel flags in Redis expire
+SLOT_TTL = 24 * 3600
+
+
+# Finished job spilled out of the in-memory store, in its job directory
+SPILL_FILE = "job.nxe"
+
+
 class InMemoryJobsStore:
-    def __init__(self) -> None:
+    """Process-local store, bounded for long-running nodes.
+
+    Finished jobs leave memory once they are older than ``terminal_ttl``
+    seconds, or oldest first when the store holds more than ``max_jobs``
+    jobs or more than ``max_result_bytes`` of (encoded) results. An
+    evicted job is written to ``SPILL_FILE`` in its job directory first, so
+    ``get`` still returns it; listings only cover jobs held in memory.
+    Queued and running jobs are never evicted.
+    """
+
+    def __init__(
+        self,
+        max_jobs: Optional[int] = None,
+        max_result_bytes: Optional[int] = None,
+        terminal_ttl: Optional[float] = None,
+    ) -> None:
+        self.max_jobs = settings.store_max_jobs if max_jobs is None else max_jobs
+        self.max_result_bytes = (
+            settings.store_max_result_bytes
+            if max_result_bytes is None
+            else max_result_bytes
+        )
+        self.terminal_ttl = (
+            settings.store_terminal_ttl_sec if terminal_ttl is None else terminal_ttl
+        )
         self._jobs: Dict[str, Job] = {}
+        # Finished jobs in finishing order -> encoded size of their result
+        self._finished: "OrderedDict[str, int]" = OrderedDict()
+        self._result_bytes = 0
+        self._children: Dict[str, Dict[int, str]] = {}
+        self._claims: Dict[str, set] = {}
+        self._running: Dict[str, int] = {}
+        self._cancelled: set = set()
+        self._listeners: List[Callable[[str, str], None]] = []
         self._lock = threading.RLock()
 
-    def create(self) -> Job:
+    def add_listener(self, listener: Callable[[str, str], None]) -> None:
+        """Call ``listener(job_id, state)`` after every state transition."""
         with self._lock:
-            now = time.time()
-            j = Job(id=uuid.uuid4().hex, created_at=now, updated_at=now)
-            self._jobs[j.id] = j
-            return j
+            self._listeners.append(listener)
+
+    def create(self, user: Optional[str] = None) -> Job:
+        with self._lock:
+            j = self._create(user)
+        self._evict()
+        return j
+
+    def _create(self, user: Optional[str]) -> Job:
+        now = time.time()
+        j = Job(id=uuid.uuid4().hex, created_at=now, updated_at=now, user=user)
+        self._jobs[j.id] = j
+        return j
+
+    def create_many(self, users: List[Optional[str]]) -> List[Job]:
+        with self._lock:
+            jobs = [self._create(user) for user in users]
+        self._evict()
+        return jobs
 
     def get(self, job_id: str) -> Optional[Job]:
         with self._lock:
-            return self._jobs.get(job_id)
+            j = self._jobs.get(job_id)
+        return j if j is not None else self._load_spilled(job_id)
+
+    @staticmethod
+    def _spill_path(job_id: str):
+        return settings.artifacts_root / job_id / SPILL_FILE
+
+    def _load_spilled(self, job_id: str) -> Optional[Job]:
+        try:
+            data = self._spill_path(job_id).read_bytes()
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return Job(**envelope.loads(data))
+
+    def _spill(self, job: dict) -> None:
+        path = job_dir(job["id"]) / SPILL_FILE
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.write_bytes(envelope.dumps(job))
+        os.replace(tmp, path)
+
+    def _victims(self) -> List[Tuple[Job, float, dict, int]]:
+        """Take finished jobs beyond the bounds off the eviction order."""
+        victims = []
+        cutoff = time.time() - self.terminal_ttl if self.terminal_ttl else None
+        while self._finished:
+            job_id, nbytes = next(iter(self._finished.items()))
+            j = self._jobs[job_id]
+            over = (
+                (self.max_jobs and len(self._jobs) - len(victims) > self.max_jobs)
+                or self._result_bytes > self.max_result_bytes
+                or (cutoff is not None and j.updated_at < cutoff)
+            )
+            if not over:
+                break
+            del self._finished[job_id]
+            self._result_bytes -= nbytes
+            victims.append((j, j.updated_at, asdict(j), nbytes))
+        return victims
+
+    def _evict(self) -> None:
+        """Spill finished jobs beyond the bounds, then drop them from memory."""
+        with self._lock:
+            victims = self._victims()
+        if not victims:
+            return
+        spilled = []
+        kept = []
+        for j, stamp, snapshot, nbytes in victims:
+            try:
+                self._spill(snapshot)
+            except OSError:
+                logger.exception("Spilling job %s failed; keeping it in memory", j.id)
+                kept.append((j, stamp, nbytes))
+                continue
+            spilled.append((j, stamp))
+        with self._lock:
+            for j, stamp, nbytes in kept:
+                # Back in the eviction order (last, so it is retried later)
+                # unless an update already re-added it
+                if self._jobs.get(j.id) is j and j.updated_at == stamp:
+                    self._finished[j.id] = nbytes
+                    self._result_bytes += nbytes
+            for j, stamp in spilled:
+                # Updated while being written: the new state stays in memory
+                if self._jobs.get(j.id) is not j or j.updated_at != stamp:
+                    continue
+                del self._jobs[j.id]
+                self._children.pop(j.id, None)
+                self._claims.pop(j.id, None)
+                self._cancelled.discard(j.id)
+
+    def _live(self, job_id: str) -> Job:
+        """In-memory job, reloading it if it was spilled; KeyError if unknown."""
+        j = self._jobs.get(job_id)
+        if j is None:
+            j = self._load_spilled(job_id)
+            if j is None:
+                raise KeyError(job_id)
+            self._jobs[job_id] = j
+        return j
+
+    def list_jobs(
+        self,
+        state: Optional[str] = None,
+        user: Optional[str] = None,
+        cursor: int = 0,
+        limit: int = 50,
+    ) -> Tuple[List[Job], Optional[int]]:
+        """Return a page of jobs, newest first, and the next cursor."""
+        with self._lock:
+            # dict preserves insertion order, i.e. creation order
+            jobs = [
+                j
+                for j in reversed(self._jobs.values())
+                if (state is None or j.state == state)
+                and (user is None or j.user == user)
+            ]
+        page = jobs[cursor : cursor + limit]
+        next_cursor = cursor + limit if cursor + limit < len(jobs) else None
+        return page, next_cursor
 
     def set_state(
         self,
@@ -47,24 +240,137 @@ class InMemoryJobsStore:
         *,
         result: Optional[dict] = None,
         error: Optional[str] = None,
-    ) -> None:
+    ) -> Optional[Job]:
+        """Apply a transition and return the updated job.
+
+        Returns None when the job does not exist or the transition is not
+        allowed from its current state (the job is left untouched).
+        """
+        sources = allowed_sources(state)
+        finished = state in TERMINAL_STATES
+        size = len(envelope.dumps(result)) if finished and result is not None else 0
         with self._lock:
-            j = self._jobs[job_id]
+            try:
+                j = self._live(job_id)
+            except KeyError:
+                return None
+            if j.state not in sources:
+                return None
             j.state = state
             j.result = result
             j.error = error
             j.updated_at = time.time()
+            nbytes = self._finished.pop(job_id, None)
+            if nbytes is not None:
+                self._result_bytes -= nbytes
+            if finished:
+                self._finished[job_id] = size
+                self._result_bytes += size
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(job_id, state)
+        self._evict()
+        return j
+
+    def set_progress(self, job_id: str, progress: float) -> None:
+        with self._lock:
+            j = self._jobs.get(job_id)
+            if j is not None and j.state == "running":
+                j.progress = progress
+
+    def touch(self, job_id: str) -> None:
+        """Heartbeat of a running job: bump its ``updated_at``."""
+        with self._lock:
+            j = self._jobs.get(job_id)
+            if j is not None and j.state == "running":
+                j.updated_at = time.time()
+
+    def add_child(self, parent_id: str, index: int, child_id: str) -> int:
+        """Record a finished child job; return how many children are recorded."""
+        with self._lock:
+            children = self._children.setdefault(parent_id, {})
+            children[index] = child_id
+            return len(children)
+
+    def children(self, parent_id: str) -> Dict[int, str]:
+        with self._lock:
+            return dict(self._children.get(parent_id, {}))
+
+    def claim(self, parent_id: str, token: str) -> bool:
+        """Return True for the first caller claiming ``token`` on a parent job."""
+        with self._lock:
+            claims = self._claims.setdefault(parent_id, set())
+            if token in claims:
+                return False
+            claims.add(token)
+            return True
+
+    def request_cancel(self, job_id: str) -> None:
+        """Flag a job for cancellation; its runner polls ``cancel_requested``."""
+        with self._lock:
+            self._cancelled.add(job_id)
+
+    def cancel_requested(self, job_id: str) -> bool:
+        with self._lock:
+            return job_id in self._cancelled
+
+    def acquire_slot(self, user: Optional[str], cap: int) -> bool:
+        """Count a running job for ``user``; False if they already run ``cap``."""
+        with self._lock:
+            running = self._running.get(user or "", 0)
+            if running >= cap:
+                return False
+            self._running[user or ""] = running + 1
+            return True
+
+    def release_slot(self, user: Optional[str]) -> None:
+        with self._lock:
+            running = self._running.get(user or "", 0) - 1
+            if running > 0:
+                self._running[user or ""] = running
+            else:
+                self._running.pop(user or "", None)
+
+
+class RedisKeys:
+    """Key layout shared by the blocking and asyncio Redis stores."""
+
+    prefix: str
+
+    def _key(self, job_id: str) -> str:
+        return f"{self.prefix}{job_id}"
+
+    # Secondary indexes: sorted sets scored by created_at
+    def _created_index(self) -> str:
+        return f"{self.prefix}idx:created"
+
+    def _state_index(self, state: str) -> str:
+        return f"{self.prefix}idx:state:{state}"
 
+    def _user_index(self, user: str) -> str:
+        return f"{self.prefix}idx:user:{user}"
 
-class RedisJobsStore:
+    # Pub/sub channel carrying {"id", "state"} on every state transition
+    def _events_channel(self) -> str:
+        return f"{self.prefix}events"
+
+
+class RedisJobsStore(RedisKeys):
     def __init__(self, redis_client) -> None:
         self.r = redis_client
         self.prefix = os.getenv("JOBS_PREFIX", "jobs:")
 
-    def _key(self, job_id: str) -> str:
-        return f"{self.prefix}{job_id}"
+    def create(self, user: Optional[str] = None) -> Job:
+        return self.create_many([user])[0]
 
-    def create(self) -> Job:
+    def create_many(self, users: List[Optional[str]]) -> List[Job]:
+        """Create one job per entry of ``users`` in a single pipeline."""
+        pipe = self.r.pipeline(transaction=False)
+        jobs = [self._queue_create(pipe, user) for user in users]
+        pipe.execute()
+        return jobs
+
+    def _queue_create(self, pipe, user: Optional[str]) -> Job:
         job_id = uuid.uuid4().hex
         now = time.time()
         payload = {
@@ -74,18 +380,22 @@ class RedisJobsStore:
             "error": None,
             "created_at": now,
             "updated_at": now,
+            "user": user,
         }
-        self.r.hset(
+        pipe.hset(
             self._key(job_id), mapping={k: json.dumps(v) for k, v in payload.items()}
         )
+        pipe.zadd(self._created_index(), {job_id: now})
+        pipe.zadd(self._state_index("queued"), {job_id: now})
+        if user is not None:
+            pipe.zadd(self._user_index(user), {job_id: now})
         return Job(**payload)
 
     def get(self, job_id: str) -> Optional[Job]:
         data = self.r.hgetall(self._key(job_id))
         if not data:
             return None
-        decoded = {k.decode(): json.loads(v) for k, v in data.items()}
-        return Job(**decoded)
+        return _job_from_flat([x for item in data.items() for x in item])
 
     def set_state(
         self,
@@ -94,21 +404,340 @@ class RedisJobsStore:
         *,
         result: Optional[dict] = None,
         error: Optional[str] = None,
-    ) -> None:
+    ) -> Optional[Job]:
+        """Apply a transition and return the updated job.
+
+        Returns None when the job does not exist or the transition is not
+        allowed from its current state. The check and the write run under
+        WATCH/MULTI, retried if the job changes in between.
+        """
+        sources = allowed_sources(state)
         key = self._key(job_id)
-        now = time.time()
-        if result is None:
-            result_json = None
+        encoded = dump_result(job_id, result)
+
+        def apply(pipe) -> Optional[Job]:
+            data = pipe.hgetall(key)
+            if not data:
+                return None
+            job = _job_from_flat(
+                [x for item in data.items() for x in item], follow_refs=False
+            )
+            if job.state not in sources:
+                return None
+            now = time.time()
+            pipe.multi()
+            pipe.hset(
+                key,
+                mapping={
+                    "state": json.dumps(state),
+                    "result": encoded,
+                    "error": json.dumps(error),
+                    "updated_at": json.dumps(now),
+                },
+            )
+            pipe.zrem(self._state_index(job.state), job_id)
+            pipe.zadd(self._state_index(state), {job_id: job.created_at})
+            pipe.publish(self._events_channel(), state_event(job_id, state))
+            job.state, job.result, job.error, job.updated_at = (
+                state,
+                result,
+                error,
+                now,
+            )
+            return job
+
+        job = self.r.transaction(apply, key, value_from_callable=True)
+        if job is None:
+            # Rejected: the stored job still points at its own result
+            discard_result(job_id, encoded)
+        return job
+
+    def set_progress(self, job_id: str, progress: float) -> None:
+        self.r.hset(self._key(job_id), "progress", json.dumps(progress))
+
+    def touch(self, job_id: str) -> None:
+        """Heartbeat of a running job: bump its ``updated_at``."""
+        self.r.hset(self._key(job_id), "updated_at", json.dumps(time.time()))
+
+    def _children_key(self, parent_id: str) -> str:
+        return f"{self.prefix}{parent_id}:children"
+
+    def add_child(self, parent_id: str, index: int, child_id: str) -> int:
+        """Record a finished child job; return how many children are recorded.
+
+        HSET and HLEN run in one MULTI so exactly one caller sees the final
+        count, and re-delivered messages do not count twice.
+        """
+        key = self._children_key(parent_id)
+        pipe = self.r.pipeline(transaction=True)
+        pipe.hset(key, str(index), child_id)
+        pipe.hlen(key)
+        return pipe.execute()[1]
+
+    def children(self, parent_id: str) -> Dict[int, str]:
+        data = self.r.hgetall(self._children_key(parent_id))
+        return {int(k): v.decode() for k, v in data.items()}
+
+    def claim(self, parent_id: str, token: str) -> bool:
+        """Return True for the first caller claiming ``token`` on a parent job."""
+        return bool(self.r.hsetnx(f"{self.prefix}{parent_id}:claims", token, 1))
+
+    def request_cancel(self, job_id: str) -> None:
+        """Flag a job for cancellation; its runner polls ``cancel_requested``."""
+        self.r.set(f"{self._key(job_id)}:cancel", 1, ex=SLOT_TTL)
+
+    def cancel_requested(self, job_id: str) -> bool:
+        return bool(self.r.exists(f"{self._key(job_id)}:cancel"))
+
+    def _slots_key(self, user: Optional[str]) -> str:
+        return f"{self.prefix}running:{user or ''}"
+
+    def acquire_slot(self, user: Optional[str], cap: int) -> bool:
+        """Count a running job for ``user``; False if they already run ``cap``.
+
+        INCR then DECR on overshoot: concurrent callers may both be refused
+        near the cap, but never both admitted past it. The counter expires
+        so slots leaked by a crashed worker do not block a user forever.
+        """
+        key = self._slots_key(user)
+        pipe = self.r.pipeline(transaction=True)
+        pipe.incr(key)
+        pipe.expire(key, SLOT_TTL)
+        running = pipe.execute()[0]
+        if running > cap:
+            self.r.decr(key)
+            return False
+        return True
+
+    def release_slot(self, user: Optional[str]) -> None:
+        self.r.decr(self._slots_key(user))
+
+    def list_jobs(
+        self,
+        state: Optional[str] = None,
+        user: Optional[str] = None,
+        cursor: int = 0,
+        limit: int = 50,
+    ) -> Tuple[List[Job], Optional[int]]:
+        """Return a page of jobs, newest first, and the next cursor.
+
+        Pages come from a sorted-set index (state, else user, else all jobs)
+        and are fetched with a single pipelined HGETALL batch. When both
+        ``state`` and ``user`` are given, the state index is paged and the
+        page is filtered by user, so it may hold fewer than ``limit`` jobs.
+        """
+        if state is not None:
+            index = self._state_index(state)
+        elif user is not None:
+            index = self._user_index(user)
+        else:
+            index = self._created_index()
+        ids = self.r.zrevrange(index, cursor, cursor + limit)
+        has_more = len(ids) > limit
+        ids = [i.decode() if isinstance(i, bytes) else i for i in ids[:limit]]
+
+        pipe = self.r.pipeline()
+        for job_id in ids:
+            pipe.hgetall(self._key(job_id))
+        jobs = []
+        for data in pipe.execute():
+            if not data:
+                continue
+            job = _job_from_flat([x for item in data.items() for x in item])
+            if user is None or job.user == user:
+                jobs.append(job)
+        return jobs, (cursor + limit if has_more else None)
+
+
+# Create the job hash only if absent and index it; one round trip per job.
+# KEYS = job hash, created index, queued-state index[, user index]
+# ARGV = id, state, created_at, user (JSON-encoded), raw id, raw created_at
+_CREATE_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'id', ARGV[1], 'state', ARGV[2],
+           'result', 'null', 'error', 'null',
+           'created_at', ARGV[3], 'updated_at', ARGV[3], 'user', ARGV[4])
+for i = 2, #KEYS do
+    redis.call('ZADD', KEYS[i], ARGV[6], ARGV[5])
+end
+return 1
+"""
+
+# Validate and apply a state transition, move the job between state
+# indexes, then return the updated hash.
+# KEYS[1] = job hash; KEYS[2..] = state indexes, one per known state
+# ARGV[1..4] = state, result (envelope), error, updated_at (JSON-encoded)
+# ARGV[5] = raw job id; ARGV[6] = number n of allowed source states
+# ARGV[7..6+n] = JSON-encoded states the transition is allowed from
+# ARGV[7+n..] = JSON-encoded state names matching KEYS[2..]
+# ARGV[#ARGV-1], ARGV[#ARGV] = events channel, transition event
+_SET_STATE_LUA = """
+local current = redis.call('HGET', KEYS[1], 'state')
+if not current then
+    return nil
+end
+local n = tonumber(ARGV[6])
+local allowed = false
+for i = 7, 6 + n do
+    if ARGV[i] == current then
+        allowed = true
+        break
+    end
+end
+if not allowed then
+    return {0, redis.call('HGETALL', KEYS[1])}
+end
+redis.call('HSET', KEYS[1], 'state', ARGV[1], 'result', ARGV[2],
+           'error', ARGV[3], 'updated_at', ARGV[4])
+local score = redis.call('HGET', KEYS[1], 'created_at')
+for i = 2, #KEYS do
+    local name = ARGV[5 + n + i]
+    if name == current then
+        redis.call('ZREM', KEYS[i], ARGV[5])
+    end
+    if name == ARGV[1] then
+        redis.call('ZADD', KEYS[i], score, ARGV[5])
+    end
+end
+redis.call('PUBLISH', ARGV[#ARGV - 1], ARGV[#ARGV])
+return {1, redis.call('HGETALL', KEYS[1])}
+"""
+
+
+# Record progress only while the job is running.
+_SET_PROGRESS_LUA = """
+if redis.call('HGET', KEYS[1], 'state') == ARGV[1] then
+    redis.call('HSET', KEYS[1], 'progress', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+# Bump updated_at only while the job is running.
+_TOUCH_LUA = """
+if redis.call('HGET', KEYS[1], 'state') == ARGV[1] then
+    redis.call('HSET', KEYS[1], 'updated_at', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+def state_event(job_id: str, state: str) -> str:
+    """Message published on the events channel for a state transition."""
+    return json.dumps({"id": job_id, "state": state})
+
+
+def _job_from_flat(flat, follow_refs: bool = True) -> Job:
+    """Build a Job from a flat [field, value, ...] HGETALL reply.
+
+    Fields are JSON except ``result``, which is an envelope (possibly a
+    reference to a result offloaded to the job directory). Without
+    ``follow_refs`` such a reference is left in ``result`` unread.
+    """
+    it = iter(flat)
+    decoded = {}
+    result = None
+    for k, v in zip(it, it):
+        if isinstance(k, bytes):
+            k = k.decode()
+        if k == "result":
+            result = v
         else:
-            result_json = result
-        self.r.hset(
-            key,
-            mapping={
-                "state": json.dumps(state),
-                "result": json.dumps(result_json),
-                "error": json.dumps(error),
-                "updated_at": json.dumps(now),
-            },
+            decoded[k] = json.loads(v)
+    if not follow_refs:
+        return Job(**decoded, result=None if result is None else envelope.loads(result))
+    return Job(**decoded, result=load_result(decoded["id"], result))
+
+
+class AtomicRedisJobsStore(RedisJobsStore):
+    """Redis store whose writes are server-side Lua scripts.
+
+    ``create`` and ``set_state`` each cost exactly one round trip; state
+    transitions are validated against ``nox.jobs.states.VALID_TRANSITIONS``
+    inside Redis so concurrent API and worker updates cannot overwrite a
+    terminal state.
+    """
+
+    def __init__(self, redis_client) -> None:
+        super().__init__(redis_client)
+        self._create_script = self.r.register_script(_CREATE_LUA)
+        self._set_state_script = self.r.register_script(_SET_STATE_LUA)
+        self._set_progress_script = self.r.register_script(_SET_PROGRESS_LUA)
+        self._touch_script = self.r.register_script(_TOUCH_LUA)
+
+    def _queue_create(self, pipe, user: Optional[str]) -> Job:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        keys = [
+            self._key(job_id),
+            self._created_index(),
+            self._state_index("queued"),
+        ]
+        if user is not None:
+            keys.append(self._user_index(user))
+        self._create_script(
+            keys=keys,
+            args=[
+                json.dumps(job_id),
+                json.dumps("queued"),
+                json.dumps(now),
+                json.dumps(user),
+                job_id,
+                repr(now),
+            ],
+            client=pipe,
+        )
+        return Job(id=job_id, created_at=now, updated_at=now, user=user)
+
+    def set_state(
+        self,
+        job_id: str,
+        state: str,
+        *,
+        result: Optional[dict] = None,
+        error: Optional[str] = None,
+    ) -> Optional[Job]:
+        """Apply a transition and return the updated job.
+
+        Returns None when the job does not exist or the transition is not
+        allowed from its current state (the stored job is left untouched).
+        """
+        sources = [json.dumps(s) for s in allowed_sources(state)]
+        encoded = dump_result(job_id, result)
+        reply = self._set_state_script(
+            keys=[self._key(job_id), *map(self._state_index, STORE_STATES)],
+            args=[
+                json.dumps(state),
+                encoded,
+                json.dumps(error),
+                json.dumps(time.time()),
+                job_id,
+                len(sources),
+                *sources,
+                *map(json.dumps, STORE_STATES),
+                self._events_channel(),
+                state_event(job_id, state),
+            ],
+        )
+        if not reply or not reply[0]:
+            # Rejected: the stored job still points at its own result
+            discard_result(job_id, encoded)
+            return None
+        return _job_from_flat(reply[1])
+
+    def set_progress(self, job_id: str, progress: float) -> None:
+        self._set_progress_script(
+            keys=[self._key(job_id)], args=[json.dumps("running"), json.dumps(progress)]
+        )
+
+    def touch(self, job_id: str) -> None:
+        self._touch_script(
+            keys=[self._key(job_id)],
+            args=[json.dumps("running"), json.dumps(time.time())],
         )
 
 
@@ -125,7 +754,7 @@ def get_store():
         import redis
 
         client = redis.from_url(REDIS_URL)
-        _store_singleton = RedisJobsStore(client)
+        _store_singleton = AtomicRedisJobsStore(client)
     else:
         _store_singleton = InMemoryJobsStore()
     return _store_singleton
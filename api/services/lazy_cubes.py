@@ -0,0 +1,128 @@
+"""
+On-demand cube builds from a job's Molden orbitals.
+
+XTB jobs that request cubes only record their Molden file (``orbitals`` in
+the result). The first download of ``homo.cube``, ``lumo.cube``,
+``density.cube`` or ``mo<N>.cube`` builds that cube, stores it in a
+bounded on-disk cache keyed on the Molden file and cube kind, and serves
+it like any other artifact. Concurrent requests for the same cube wait on
+a single build.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from nox.artifacts.cubes import (
+    COMPACT_SUFFIX,
+    CubeGenerationError,
+    compact_cube_file,
+    generate_cubes_from_molden,
+    validate_cube_file,
+)
+
+from .artifacts import find_artifact
+from .disk_cache import DiskLRUCache
+from .settings import settings
+
+CUBE_NAME = re.compile(r"^(homo|lumo|density|mo\d+)\.cube$")
+# Kinds advertised in results; any mo<N> is accepted on request
+DEFAULT_KINDS = ["homo", "lumo", "density"]
+
+
+def orbitals_record(molden_name: str) -> Dict[str, object]:
+    """Result entry declaring that cubes can be built from ``molden_name``."""
+    return {"molden": molden_name, "cubes": [f"{k}.cube" for k in DEFAULT_KINDS]}
+
+
+_cache_singleton: Optional[DiskLRUCache] = None
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def get_cube_cache() -> DiskLRUCache:
+    global _cache_singleton
+    if _cache_singleton is None:
+        _cache_singleton = DiskLRUCache(
+            settings.artifacts_root / "_cache" / "cubes",
+            settings.cube_cache_max_bytes,
+        )
+    return _cache_singleton
+
+
+def _build_key(molden: Path, kind: str) -> str:
+    # Keyed on the file itself, so jobs sharing a hard-linked Molden file
+    # (result cache hits) share their cubes too
+    stat = molden.stat()
+    ident = f"{stat.st_dev}|{stat.st_ino}|{stat.st_mtime_ns}|{stat.st_size}|{kind}"
+    return hashlib.sha256(ident.encode()).hexdigest()
+
+
+def _stored_file(entry: Path) -> Optional[Path]:
+    files = [p for p in entry.iterdir() if not p.name.startswith(".")]
+    # One cube per entry: the compact form replaces the text one when built,
+    # and downloads stream text from it without writing into the entry
+    return min(
+        files, key=lambda p: (not p.name.endswith(COMPACT_SUFFIX), p.name), default=None
+    )
+
+
+def _build(molden: Path, kind: str, tmp: Path) -> None:
+    cubes = [c for c in generate_cubes_from_molden(molden, tmp, [kind]) if c.exists()]
+    if not cubes:
+        raise CubeGenerationError(f"No cube generated for {kind}")
+    if settings.cube_storage == "npz" and validate_cube_file(cubes[0])["valid"]:
+        compact_cube_file(cubes[0])
+
+
+def build_cube(molden: Path, kind: str) -> Path:
+    """Return the stored cube of ``kind`` for ``molden``, building it once."""
+    key = _build_key(molden, kind)
+    cache = get_cube_cache()
+    with _locks_guard:
+        lock = _locks.setdefault(key, threading.Lock())
+    with lock:
+        try:
+            entry = cache.get(key)
+            if entry is None:
+                entry = cache.put(key, lambda tmp: _build(molden, kind, tmp))
+        finally:
+            with _locks_guard:
+                _locks.pop(key, None)
+    stored = _stored_file(entry)
+    if stored is None:
+        raise CubeGenerationError(f"Cube cache entry for {kind} is empty")
+    return stored
+
+
+def find_lazy_cube(result: Optional[dict], name: str) -> Optional[Tuple[Path, dict]]:
+    """Build (or fetch) cube ``name`` for a result that declares orbitals.
+
+    Returns the same ``(path, record)`` pair as ``find_artifact``.
+    """
+    m = CUBE_NAME.match(name)
+    orbitals = (result or {}).get("orbitals")
+    if not m or not orbitals:
+        return None
+    found = find_artifact(result, orbitals.get("molden", ""))
+    if found is None:
+        return None
+    path = build_cube(found[0], m.group(1))
+    art = {
+        "name": name,
+        "path": str(path),
+        "mime": "application/x-cube",
+        "size": path.stat().st_size,
+    }
+    if path.name.endswith(COMPACT_SUFFIX):
+        art["formats"] = ["cube", "npz"]
+    return path, art
+
+
+def lazy_cube_names(result: Optional[dict]) -> List[str]:
+    orbitals = (result or {}).get("orbitals") or {}
+    return list(orbitals.get("cubes", []))
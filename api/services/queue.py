@@ -2,8 +2,15 @@ from __future__ import annotations
 import os
 import threading
 import time
-from typing import Dict, Any
-from .jobs_store import get_store
+from typing import Dict, Any, List, Optional
+from .ensemble import child_finished
+from .executor import QueueFullError, get_executor
+from .jobs_store import TERMINAL_STATES, Job, get_store
+from .scheduler import DEFAULT_PRIORITY, check_priority, queue_name
+from .scratch import complete, run_dir, when_persisted
+from .settings import settings
+from .singleflight import FOLLOWER_PRIORITY, coalesce, land
+from .workflow import prepare_stage_dir, stage_finished
 
 
 # Simple demo work; replace with real task kinds
@@ -13,9 +20,181 @@ def echo_worker(payload: Dict[str, Any]) -> Dict[str, Any]:
     return {"echo": payload, "payload": payload}
 
 
-def submit_job(kind: str, payload: Dict[str, Any]) -> str:
+def submit_job(
+    kind: str,
+    payload: Dict[str, Any],
+    user: Optional[str] = None,
+    priority: Optional[str] = None,
+) -> str:
+    return submit(kind, payload, user=user, priority=priority).id
+
+
+def submit(
+    kind: str,
+    payload: Dict[str, Any],
+    user: Optional[str] = None,
+    priority: Optional[str] = None,
+) -> Job:
+    """Create and dispatch a job, returning the freshly created record.
+
+    Callers that need the initial job state should use this instead of
+    ``submit_job`` followed by ``get_store().get()``. ``priority`` is one
+    of ``scheduler.PRIORITY_CLASSES``; None means
+    ``scheduler.DEFAULT_PRIORITY``, so routes submitting single XTB jobs
+    pass ``interactive`` explicitly.
+    """
+    priority = check_priority(priority)
+    local = not _use_redis()
+    if local:
+        get_executor().ensure_capacity(1)
+
+    store = get_store()
+    job = store.create(user=user)
+    cached = _prepare(store, job, kind, payload, priority)
+    if cached is not None:
+        return cached
+    _dispatch(store, job.id, kind, payload, user, priority, local)
+    return job
+
+
+def redispatch(payload: Dict[str, Any]) -> None:
+    """Dispatch a queued xtb job again, as if it had just been submitted.
+
+    Used for the followers of a flight whose leader did not complete: each
+    is served from the result cache, joins a new flight or runs.
+    """
     store = get_store()
-    job = store.create()
+    job = store.get(payload["job_id"])
+    if job is None:
+        return
+    priority = check_priority(payload.pop(FOLLOWER_PRIORITY, None))
+    if _prepare(store, job, "xtb", payload, priority) is not None:
+        return
+    try:
+        _dispatch(store, job.id, "xtb", payload, job.user, priority, not _use_redis())
+    except QueueFullError:
+        # The job was failed and its parent notified
+        pass
+
+
+def _dispatch(
+    store,
+    job_id: str,
+    kind: str,
+    payload: Dict[str, Any],
+    user: Optional[str],
+    priority: str,
+    local: bool,
+) -> None:
+    if not local:
+        # Publish to Dramatiq actor; worker will update Redis-backed store
+        # We import inside to avoid dramatiq dep at import time in CI
+        from workers.jobs_worker import enqueue_job
+
+        # Dispatch send in background to avoid synchronous execution when
+        # using a stub broker which may run actors immediately. This keeps
+        # POST semantics predictable (queued) for tests that inspect state
+        # immediately after submission.
+        message = job_message(enqueue_job, job_id, kind, payload, priority)
+        threading.Thread(
+            target=lambda: enqueue_job.broker.enqueue(message),
+            daemon=True,
+        ).start()
+        return
+
+    # Local mode for CI or dev without Redis: bounded worker slots
+    _dispatch_local(store, job_id, kind, payload, user, priority)
+
+
+def submit_many(
+    kind: str,
+    payloads: List[Dict[str, Any]],
+    users: Optional[List[Optional[str]]] = None,
+    priorities: Optional[List[Optional[str]]] = None,
+) -> List[Job]:
+    """Create and dispatch many jobs at once.
+
+    All job records are created in one store batch (a single Redis
+    pipeline) and the uncached jobs are enqueued as one Dramatiq group from
+    a single background thread. ``users`` and ``priorities`` run parallel
+    to ``payloads``.
+    """
+    if users is None:
+        users = [None] * len(payloads)
+    priorities = [check_priority(p) for p in priorities or [None] * len(payloads)]
+    local = not _use_redis()
+    if local:
+        get_executor().ensure_capacity(len(payloads))
+
+    store = get_store()
+    jobs = store.create_many(users)
+    submitted: List[Job] = []
+    pending = []
+    for job, payload, user, priority in zip(jobs, payloads, users, priorities):
+        cached = _prepare(store, job, kind, payload, priority)
+        submitted.append(cached if cached is not None else job)
+        if cached is None:
+            pending.append((job.id, payload, user, priority))
+
+    if not pending:
+        return submitted
+
+    if not local:
+        from dramatiq import group
+        from workers.jobs_worker import enqueue_job
+
+        messages = [
+            job_message(enqueue_job, job_id, kind, p, priority)
+            for job_id, p, _, priority in pending
+        ]
+        threading.Thread(target=lambda: group(messages).run(), daemon=True).start()
+        return submitted
+
+    for job_id, payload, user, priority in pending:
+        _dispatch_local(store, job_id, kind, payload, user, priority)
+    return submitted
+
+
+def job_message(actor, job_id: str, kind: str, payload: Dict[str, Any], priority: str):
+    """Dramatiq message for ``job_id`` on the queue of its priority class."""
+    message = actor.message(job_id, kind, payload, priority=priority)
+    return message.copy(queue_name=queue_name(actor.queue_name, priority))
+
+
+def _dispatch_local(
+    store,
+    job_id: str,
+    kind: str,
+    payload: Dict[str, Any],
+    user: Optional[str] = None,
+    priority: str = DEFAULT_PRIORITY,
+) -> None:
+    try:
+        get_executor().submit(
+            _run_local,
+            store,
+            job_id,
+            kind,
+            payload,
+            key=job_id,
+            user=user,
+            priority=priority,
+        )
+    except QueueFullError as e:
+        # Lost a race for the last queue slots after the capacity check
+        store.set_state(job_id, "failed", error=str(e))
+        land(payload)
+        raise
+
+
+def _prepare(
+    store, job: Job, kind: str, payload: Dict[str, Any], priority: str
+) -> Optional[Job]:
+    """Attach the job id to the payload; complete the job if its result is cached.
+
+    Also returns the job, still queued, when an identical job is already in
+    flight: it completes with that job instead of being dispatched.
+    """
     job_id = job.id
 
     # Ensure payload carries the job_id for worker/local runner
@@ -25,6 +204,30 @@ def submit_job(kind: str, payload: Dict[str, Any]) -> str:
         # If payload is not a mutable dict for any reason, ignore
         pass
 
+    if kind == "xtb":
+        cached = _cached_xtb_result(payload, job_id)
+        if cached is not None:
+            # Serve identical calculations without queueing
+            store.set_state(job_id, "running")
+            done = store.set_state(job_id, "done", result=cached) or job
+            notify_parents(payload)
+            return done
+        key = _request_hash(payload)
+        if key is not None and coalesce(key, payload, priority) is not None:
+            return job
+    return None
+
+
+def _request_hash(payload: Dict[str, Any]) -> Optional[str]:
+    from api.services.result_cache import request_key
+
+    try:
+        return request_key(load_job_request(payload.get("job_request")))
+    except Exception:
+        return None
+
+
+def _use_redis() -> bool:
     # Check Redis URL dynamically to support test monkeypatching
     redis_url = os.getenv("REDIS_URL")
 
@@ -42,56 +245,188 @@ def submit_job(kind: str, payload: Dict[str, Any]) -> str:
         except Exception:
             # If settings import fails or has no attribute, ignore
             pass
+    return bool(redis_url)
 
-    if redis_url:
-        # Publish to Dramatiq actor; worker will update Redis-backed store
-        # We import inside to avoid dramatiq dep at import time in CI
-        from workers.jobs_worker import enqueue_job
 
-        # Dispatch send in background to avoid synchronous execution when
-        # using a stub broker which may run actors immediately. This keeps
-        # POST semantics predictable (queued) for tests that inspect state
-        # immediately after submission.
-        threading.Thread(
-            target=lambda: enqueue_job.send(job_id, kind, payload),
-            daemon=True,
-        ).start()
-        return job_id
+def _run_local(store, job_id: str, kind: str, payload: Dict[str, Any]) -> None:
+    if skip_cancelled(store, job_id, payload):
+        return
+    result = None
+    error = None
+    try:
+        store.set_state(job_id, "running")
+        if kind == "echo":
+            result = echo_worker(payload)
+        elif kind == "xtb":
+            # For local mode, run XTB calculation directly
+            prepare_stage_dir(payload, run_dir(job_id))
+            result = _xtb_runner(payload)
+        else:
+            result = {"echo": payload}
+    except Exception as e:  # noqa: BLE001
+        error = str(e)
+    # Scratch runs complete once their artifacts are persisted
+    complete(
+        job_id,
+        result,
+        lambda r, persist_error: _finish_local(
+            store, job_id, payload, r, error or persist_error
+        ),
+    )
 
-    # Local thread mode for CI or dev without Redis
-    def _runner():
-        try:
-            store.set_state(job_id, "running")
-            if kind == "echo":
-                result = echo_worker(payload)
-            elif kind == "xtb":
-                # For local mode, run XTB calculation directly
-                result = _xtb_runner(payload)
-            else:
-                result = {"echo": payload}
-            # If runner returned a returncode, treat non-success as failure
-            if isinstance(result, dict) and "returncode" in result:
-                rc = result.get("returncode")
-                has_energy = (
-                    result.get("scalars", {}).get("E_total_hartree") is not None
+
+def _finish_local(
+    store,
+    job_id: str,
+    payload: Dict[str, Any],
+    result: Any,
+    error: Optional[str],
+) -> None:
+    try:
+        if error is not None:
+            store.set_state(job_id, "failed", error=error)
+        elif isinstance(result, dict) and result.get("stopped"):
+            # Cancelled or timed out: keep the partial results
+            stopped = result["stopped"]
+            store.set_state(job_id, stopped, error=f"Job {stopped}", result=result)
+        # If runner returned a returncode, treat non-success as failure
+        elif isinstance(result, dict) and "returncode" in result:
+            rc = result.get("returncode")
+            has_energy = result.get("scalars", {}).get("E_total_hartree") is not None
+            success = (rc == 0) or (rc == 2 and has_energy)
+            if not success:
+                store.set_state(
+                    job_id,
+                    "failed",
+                    error=f"returncode={rc}",
+                    result=result,
                 )
-                success = (rc == 0) or (rc == 2 and has_energy)
-                if not success:
-                    store.set_state(
-                        job_id,
-                        "failed",
-                        error=f"returncode={rc}",
-                        result=result,
-                    )
-                else:
-                    store.set_state(job_id, "done", result=result)
             else:
                 store.set_state(job_id, "done", result=result)
-        except Exception as e:  # noqa: BLE001
-            store.set_state(job_id, "failed", error=str(e))
+        else:
+            store.set_state(job_id, "done", result=result)
+    except Exception as e:  # noqa: BLE001
+        store.set_state(job_id, "failed", error=str(e))
+    finally:
+        notify_parents(payload)
+
+
+def cancel_job(job_id: str) -> Optional[Job]:
+    """Cancel a job and return it; None if it does not exist.
+
+    A queued job is cancelled at once. A running job is flagged and its
+    runner kills the xtb process group at its next poll, keeping partial
+    results. The flag of an ensemble or workflow job reaches its children
+    (see ``parent_of``): queued ones are skipped, running ones killed, and
+    the parent ends cancelled as they report back. Finished jobs are
+    returned unchanged.
+    """
+    store = get_store()
+    job = store.get(job_id)
+    if job is None or job.state in TERMINAL_STATES:
+        return job
+    store.request_cancel(job_id)
+    if job.state == "queued":
+        store.set_state(job_id, "cancelled", error="Cancelled before start")
+    return store.get(job_id)
+
+
+def parent_of(payload: Dict[str, Any]) -> Optional[str]:
+    """Id of the ensemble or workflow job a child payload belongs to."""
+    if not isinstance(payload, dict):
+        return None
+    return payload.get("parent_id") or payload.get("workflow_id")
+
+
+def _cancel_requested(job_id: str, parent_id: Optional[str]) -> bool:
+    store = get_store()
+    return store.cancel_requested(job_id) or (
+        parent_id is not None and store.cancel_requested(parent_id)
+    )
 
-    threading.Thread(target=_runner, daemon=True).start()
-    return job_id
+
+def skip_cancelled(store, job_id: str, payload: Dict[str, Any]) -> bool:
+    """True when a dispatched job must not run, its parent being notified.
+
+    That is when it was cancelled while queued, or its parent job was.
+    """
+    current = store.get(job_id)
+    if current is None:
+        return False
+    if current.state not in TERMINAL_STATES:
+        parent_id = parent_of(payload)
+        if parent_id is None or not store.cancel_requested(parent_id):
+            return False
+        store.set_state(job_id, "cancelled", error="Parent job cancelled")
+    notify_parents(payload)
+    return True
+
+
+def run_limits(job_request, job_id: str, parent_id: Optional[str] = None):
+    """``RunLimits`` of a job: its requested limits capped by the server's.
+
+    The run is cancelled when the job or its ``parent_id`` job is, and
+    beats the job's ``updated_at`` every ``job_heartbeat_sec`` meanwhile.
+    """
+    from ai.runners.xtb import RunLimits
+
+    def effective(requested, default):
+        if requested and default:
+            return min(requested, default)
+        return requested or default
+
+    return RunLimits(
+        wall_time=effective(
+            job_request.limits.wall_time_sec, settings.job_wall_time_sec
+        ),
+        cpu_time=int(
+            effective(job_request.limits.cpu_time_sec, settings.job_cpu_time_sec)
+        ),
+        is_cancelled=lambda: _cancel_requested(job_id, parent_id),
+        heartbeat=lambda: get_store().touch(job_id),
+        heartbeat_interval=settings.job_heartbeat_sec,
+    )
+
+
+def notify_parents(payload: Dict[str, Any]) -> None:
+    """Report a finished job to its coalesced followers and its parent job."""
+    land(payload)
+    child_finished(payload)
+    stage_finished(payload)
+
+
+def load_job_request(value: Any):
+    """Validate a payload's ``job_request``.
+
+    Payloads carry the request as a dict; JSON strings from messages
+    queued by older versions are still accepted.
+    """
+    from api.schemas.job import JobRequest
+
+    if isinstance(value, JobRequest):
+        return value
+    if isinstance(value, dict):
+        return JobRequest.model_validate(value)
+    return JobRequest.model_validate_json(value or "{}")
+
+
+def _cached_xtb_result(payload: Dict[str, Any], job_id: str) -> Optional[Dict]:
+    """Look up an XTB request in the result cache, linking artifacts on a hit."""
+    from api.services.result_cache import get_result_cache, request_key
+    from api.services.storage import job_dir
+
+    cache = get_result_cache()
+    if cache is None:
+        return None
+    try:
+        key = request_key(load_job_request(payload.get("job_request")))
+    except Exception:
+        # Malformed request (e.g. bad XYZ): a miss, the runner reports it
+        return None
+    result = cache.get(key, job_dir(job_id))
+    if result is not None:
+        result["payload"] = payload
+    return result
 
 
 def _default_xtb_runner(payload: Dict[str, Any]) -> Dict[str, Any]:
@@ -99,19 +434,17 @@ def _default_xtb_runner(payload: Dict[str, Any]) -> Dict[str, Any]:
 
     Kept as an injectable callable so tests can replace it with a stub.
     """
-    from api.schemas.job import JobRequest
-    from api.services.storage import job_dir
+    from api.services.result_cache import remember
     from ai.runners.xtb import run_xtb_job
 
     # Parse the job request
-    job_request_json = payload.get("job_request", "{}")
     try:
-        JR = JobRequest.model_validate_json(job_request_json)
+        JR = load_job_request(payload.get("job_request"))
     except Exception as e:
         raise ValueError(f"Invalid job request: {e}")
 
     job_id = payload.get("job_id", "unknown")
-    jd = job_dir(job_id)
+    jd = run_dir(job_id)
 
     result = run_xtb_job(
         jd,
@@ -119,10 +452,14 @@ def _default_xtb_runner(payload: Dict[str, Any]) -> Dict[str, Any]:
         JR.inputs.charge,
         JR.inputs.multiplicity,
         JR.inputs.params.model_dump(),
+        on_progress=lambda p: get_store().set_progress(job_id, p),
+        limits=run_limits(JR, job_id, parent_of(payload)),
     )
 
     # Include the original payload in the result
     result["payload"] = payload
+    if result.get("stopped"):
+        return result
 
     # XTB success: return code 0 OR (return code 2 with valid energy results)
     has_energy = result.get("scalars", {}).get("E_total_hartree") is not None
@@ -136,6 +473,8 @@ def _default_xtb_runner(payload: Dict[str, Any]) -> Dict[str, Any]:
         )
         raise RuntimeError(error_msg)
 
+    # Cache the result once its artifacts are in the artifact store
+    when_persisted(job_id, lambda r: remember(JR, r))
     return result
 
 
@@ -7,7 +7,7 @@ is consistent between the API server and Dramatiq workers.
 
 import json
 import uuid
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 import redis
 from datetime import datetime, timezone
 
@@ -28,9 +28,26 @@ class RedisJobStorage:
         """Get Redis key for job"""
         return f"job:{job_id}"
 
-    def create_job(self, job_request: Dict[str, Any]) -> str:
+    # Secondary indexes (sorted sets) kept in sync with every write so that
+    # listing and cleanup never need to scan the keyspace.
+    CREATED_INDEX = "jobs:idx:created"
+    FINISHED_INDEX = "jobs:idx:finished"
+    TERMINAL_STATES = ("completed", "failed")
+
+    def _state_index(self, state: str) -> str:
+        """Get Redis key for the per-state index"""
+        return f"jobs:idx:state:{state}"
+
+    def _user_index(self, user: str) -> str:
+        """Get Redis key for the per-user index"""
+        return f"jobs:idx:user:{user}"
+
+    def create_job(
+        self, job_request: Dict[str, Any], user: Optional[str] = None
+    ) -> str:
         """Create new job and store in Redis"""
         job_id = uuid.uuid4().hex
+        now = datetime.now(timezone.utc)
 
         job_data = {
             "job_id": job_id,
@@ -39,13 +56,21 @@ class RedisJobStorage:
             "progress": 0.0,
             "request": job_request,
             "result": None,
-            "created_at": datetime.now(timezone.utc).isoformat(),
-            "updated_at": datetime.now(timezone.utc).isoformat(),
+            "user": user,
+            "created_at": now.isoformat(),
+            "updated_at": now.isoformat(),
         }
 
-        # Store in Redis with 24 hour expiration
+        # Store in Redis with 24 hour expiration, indexed by creation time
         key = self._job_key(job_id)
-        self.redis_client.setex(key, 86400, json.dumps(job_data))
+        score = now.timestamp()
+        pipe = self.redis_client.pipeline()
+        pipe.setex(key, 86400, json.dumps(job_data))
+        pipe.zadd(self.CREATED_INDEX, {job_id: score})
+        pipe.zadd(self._state_index("pending"), {job_id: score})
+        if user is not None:
+            pipe.zadd(self._user_index(user), {job_id: score})
+        pipe.execute()
 
         return job_id
 
@@ -68,15 +93,37 @@ class RedisJobStorage:
         if job_data is None:
             return False
 
+        previous_state = job_data.get("state")
+
         # Apply updates
+        now = datetime.now(timezone.utc)
         job_data.update(updates)
-        job_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+        job_data["updated_at"] = now.isoformat()
 
-        # Save back to Redis
+        # Save back to Redis and move the job between indexes in one trip
         key = self._job_key(job_id)
-        self.redis_client.setex(key, 86400, json.dumps(job_data))
+        pipe = self.redis_client.pipeline()
+        pipe.setex(key, 86400, json.dumps(job_data))
+        state = job_data.get("state")
+        if state != previous_state:
+            created = self._timestamp(job_data.get("created_at")) or now.timestamp()
+            pipe.zrem(self._state_index(previous_state), job_id)
+            pipe.zadd(self._state_index(state), {job_id: created})
+            if state in self.TERMINAL_STATES:
+                pipe.zadd(self.FINISHED_INDEX, {job_id: now.timestamp()})
+        pipe.execute()
         return True
 
+    @staticmethod
+    def _timestamp(value: Optional[str]) -> Optional[float]:
+        """Convert an ISO timestamp to epoch seconds"""
+        if not value:
+            return None
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+        except (ValueError, AttributeError):
+            return None
+
     def set_job_state(
         self, job_id: str, state: str, message: str = "", progress: float = 0.0
     ) -> bool:
@@ -110,40 +157,88 @@ class RedisJobStorage:
             },
         )
 
-    def list_jobs(self, pattern: str = "job:*") -> Dict[str, Dict[str, Any]]:
-        """List all jobs matching pattern"""
-        keys = self.redis_client.keys(pattern)
+    def list_job_ids(
+        self,
+        state: Optional[str] = None,
+        user: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 50,
+    ) -> List[str]:
+        """List job IDs, newest first, from the state/user/created index"""
+        if state is not None:
+            index = self._state_index(state)
+        elif user is not None:
+            index = self._user_index(user)
+        else:
+            index = self.CREATED_INDEX
+        return self.redis_client.zrevrange(index, offset, offset + limit - 1)
+
+    def list_jobs(
+        self,
+        state: Optional[str] = None,
+        user: Optional[str] = None,
+        offset: int = 0,
+        limit: int = 50,
+    ) -> Dict[str, Dict[str, Any]]:
+        """List a page of jobs using the secondary indexes and a single MGET"""
+        job_ids = self.list_job_ids(state, user, offset, limit)
+        if not job_ids:
+            return {}
+
+        values = self.redis_client.mget([self._job_key(j) for j in job_ids])
         jobs = {}
-
-        for key in keys:
-            job_id = key.replace("job:", "")
-            job_data = self.get_job(job_id)
-            if job_data:
+        expired = []
+        for job_id, job_data_json in zip(job_ids, values):
+            if job_data_json is None:
+                # Job key expired; drop its stale index entries lazily
+                expired.append(job_id)
+                continue
+            try:
+                job_data = json.loads(job_data_json)
+            except json.JSONDecodeError:
+                continue
+            if user is None or job_data.get("user") == user:
                 jobs[job_id] = job_data
 
+        if expired:
+            # The job bodies are gone, so only a known user's index is cleaned
+            self._remove_from_indexes(
+                expired, [user] * len(expired) if user is not None else ()
+            )
         return jobs
 
+    def _remove_from_indexes(self, job_ids: List[str], users: List[str] = ()) -> None:
+        """Remove job IDs from every index they may appear in"""
+        pipe = self.redis_client.pipeline()
+        pipe.zrem(self.CREATED_INDEX, *job_ids)
+        pipe.zrem(self.FINISHED_INDEX, *job_ids)
+        for state in ("pending", "running", *self.TERMINAL_STATES):
+            pipe.zrem(self._state_index(state), *job_ids)
+        for user in set(users):
+            pipe.zrem(self._user_index(user), *job_ids)
+        pipe.execute()
+
     def cleanup_old_jobs(self, max_age_hours: int = 24) -> int:
         """Clean up old completed/failed jobs"""
-        jobs = self.list_jobs()
-        cleaned = 0
         cutoff = datetime.now(timezone.utc).timestamp() - (max_age_hours * 3600)
-
-        for job_id, job_data in jobs.items():
-            if job_data.get("state") in ["completed", "failed"]:
-                completed_at = job_data.get("completed_at") or job_data.get("failed_at")
-                if completed_at:
-                    try:
-                        job_time = datetime.fromisoformat(
-                            completed_at.replace("Z", "+00:00")
-                        ).timestamp()
-                        if job_time < cutoff:
-                            key = self._job_key(job_id)
-                            self.redis_client.delete(key)
-                            cleaned += 1
-                    except (ValueError, AttributeError):
-                        continue
-
+        job_ids = self.redis_client.zrangebyscore(self.FINISHED_INDEX, "-inf", cutoff)
+        if not job_ids:
+            return 0
+
+        values = self.redis_client.mget([self._job_key(j) for j in job_ids])
+        users = []
+        for job_data_json in values:
+            if job_data_json is None:
+                continue
+            try:
+                user = json.loads(job_data_json).get("user")
+            except json.JSONDecodeError:
+                continue
+            if user is not None:
+                users.append(user)
+
+        cleaned = self.redis_client.delete(*[self._job_key(j) for j in job_ids])
+        self._remove_from_indexes(job_ids, users)
         return cleaned
 
 
@@ -0,0 +1,142 @@
+"""
+Content-addressed cache of XTB results.
+
+Results are keyed on a canonical hash of the normalized geometry, charge,
+multiplicity and XTB parameters, and stored with their artifacts in a
+size-bounded on-disk LRU under ``settings.artifacts_root``. Artifacts are
+hard-linked in and out of the cache whenever possible, so hits cost no
+copies.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .disk_cache import DiskLRUCache
+from .settings import settings
+
+# Coordinates are rounded to this many decimals (Angstrom) before hashing
+COORD_DECIMALS = 5
+RESULT_FILE = "result.json"
+
+
+def normalize_xyz(xyz: str) -> str:
+    """Return a canonical XYZ body: comment dropped, symbols and numbers normalized."""
+    lines = [ln.strip() for ln in xyz.strip().splitlines()]
+    atoms = lines[2:] if lines and lines[0].isdigit() else lines
+    out = []
+    for line in atoms:
+        parts = line.split()
+        if len(parts) < 4:
+            continue
+        coords = []
+        for value in parts[1:4]:
+            rounded = round(float(value), COORD_DECIMALS)
+            coords.append(f"{rounded + 0.0:.{COORD_DECIMALS}f}")  # no "-0.0"
+        out.append(" ".join([parts[0].capitalize(), *coords]))
+    return "\n".join(out)
+
+
+def cache_key(xyz: str, charge: int, multiplicity: int, params: Dict[str, Any]) -> str:
+    header = {"charge": charge, "multiplicity": multiplicity, "params": params}
+    canonical = json.dumps(header, sort_keys=True) + "\n" + normalize_xyz(xyz)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def request_key(job_request) -> str:
+    """Cache key of a ``JobRequest``."""
+    inputs = job_request.inputs
+    return cache_key(
+        inputs.xyz, inputs.charge, inputs.multiplicity, inputs.params.model_dump()
+    )
+
+
+def _link_or_copy(src: Path, dst: Path) -> None:
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class ResultCache:
+    """Stores ``ResultBundle`` dicts and their artifact files by cache key."""
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.store = DiskLRUCache(root, max_bytes)
+
+    def get(self, key: str, dest_dir: Path) -> Optional[Dict[str, Any]]:
+        """Materialize a cached result into ``dest_dir`` and return it."""
+
+        def load(entry: Path) -> Dict[str, Any]:
+            result = json.loads((entry / RESULT_FILE).read_text(encoding="utf-8"))
+            dest_dir.mkdir(parents=True, exist_ok=True)
+            for art in result.get("artifacts", []):
+                dst = dest_dir / art["name"]
+                if not dst.exists():
+                    _link_or_copy(entry / art["name"], dst)
+                art["path"] = str(dst)
+            return result
+
+        # Counted as a hit only once the entry is materialized
+        result = self.store.get(key, load)
+        if result is None:
+            return None
+        result["cache_key"] = key
+        return result
+
+    def put(self, key: str, result: Dict[str, Any]) -> None:
+        """Store a successful result; artifacts outside a flat job dir are skipped."""
+        artifacts = [
+            a for a in result.get("artifacts", []) if Path(a.get("path", "")).is_file()
+        ]
+        cached = {
+            "scalars": result.get("scalars", {}),
+            "series": result.get("series", {}),
+            "artifacts": [dict(a) for a in artifacts],
+            "returncode": result.get("returncode", 0),
+        }
+        if result.get("orbitals"):
+            cached["orbitals"] = result["orbitals"]
+
+        def populate(tmp: Path) -> None:
+            for art in cached["artifacts"]:
+                _link_or_copy(Path(art["path"]), tmp / art["name"])
+                art["path"] = art["name"]
+            (tmp / RESULT_FILE).write_text(json.dumps(cached), encoding="utf-8")
+
+        self.store.put(key, populate)
+
+    def stats(self) -> Dict[str, int]:
+        return self.store.stats()
+
+
+_cache_singleton: Optional[ResultCache] = None
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Return the process-wide result cache, or None when disabled."""
+    global _cache_singleton
+    if not settings.result_cache_enabled:
+        return None
+    if _cache_singleton is None:
+        _cache_singleton = ResultCache(
+            settings.artifacts_root / "_cache" / "results",
+            settings.result_cache_max_bytes,
+        )
+    return _cache_singleton
+
+
+def remember(job_request, result: Dict[str, Any]) -> None:
+    """Store a successful XTB result for ``job_request`` (best effort)."""
+    cache = get_result_cache()
+    if cache is None:
+        return
+    try:
+        cache.put(request_key(job_request), result)
+    except OSError:
+        pass
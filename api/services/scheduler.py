@@ -0,0 +1,188 @@
+"""
+Priority classes and per-user fair-share scheduling for queued jobs.
+
+Jobs belong to a priority class: ``interactive`` (single calculations a
+user is waiting on), ``batch`` (batch submissions, ensembles) and
+``bulk`` (large screens). Classes are served in strict priority order so
+interactive jobs only wait for the next free slot. Within a class, users
+are served by deficit round robin (DRR): each visit adds the user's
+weight to their deficit and every dispatched job costs one, so a user
+with 20k queued jobs gets the same share of slots as a user with one.
+Users already running ``user_cap`` jobs are skipped until one finishes.
+
+``FairQueue`` replaces the FIFO of the local executor. In Redis mode each
+class is a separate Dramatiq queue (see ``queue_name``) and per-user caps
+are enforced by the worker through the jobs store.
+"""
+
+from __future__ import annotations
+
+import math
+import queue
+import threading
+from collections import Counter, OrderedDict, deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+PRIORITY_CLASSES = ("interactive", "batch", "bulk")
+DEFAULT_PRIORITY = "batch"
+ANONYMOUS = ""
+
+
+def check_priority(priority: Optional[str], default: str = DEFAULT_PRIORITY) -> str:
+    """Return ``priority`` (or ``default`` when None); raise ValueError if unknown."""
+    priority = priority or default
+    if priority not in PRIORITY_CLASSES:
+        raise ValueError(
+            f"Unknown priority {priority!r}, expected one of {PRIORITY_CLASSES}"
+        )
+    return priority
+
+
+def queue_name(base: str, priority: str) -> str:
+    """Dramatiq queue carrying jobs of ``priority``."""
+    return f"{base}.{priority}"
+
+
+class FairQueue:
+    """Bounded queue with strict priority classes and per-user DRR.
+
+    Items are queued with a ``key`` (the job id), a user and a class;
+    ``get`` blocks until some user below their cap has a queued item and
+    returns ``(item, user)``. Callers report completion with
+    ``task_done(user)`` so the user's running count drops; ``join`` waits
+    until every queued item is done, as with ``queue.Queue``.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        weights: Optional[Dict[str, float]] = None,
+        user_cap: int = 0,
+    ) -> None:
+        self.maxsize = maxsize
+        self.weights = dict(weights or {})
+        self.user_cap = user_cap
+        self._cond = threading.Condition()
+        # class -> user -> queued (key, item); OrderedDict order is the DRR ring
+        self._queues: Dict[str, "OrderedDict[str, Deque[Tuple[Any, Any]]]"] = {
+            p: OrderedDict() for p in PRIORITY_CLASSES
+        }
+        self._deficit: Dict[str, Dict[str, float]] = {p: {} for p in PRIORITY_CLASSES}
+        self._running: Counter = Counter()
+        self._size = 0
+        self._unfinished = 0
+
+    def weight(self, user: str) -> float:
+        return max(0.01, float(self.weights.get(user, 1.0)))
+
+    def qsize(self) -> int:
+        with self._cond:
+            return self._size
+
+    def put(
+        self,
+        item: Any,
+        *,
+        key: Any = None,
+        user: Optional[str] = None,
+        priority: str = DEFAULT_PRIORITY,
+    ) -> None:
+        """Queue ``item``; raise ``queue.Full`` when ``maxsize`` is reached."""
+        user = user or ANONYMOUS
+        with self._cond:
+            if self._size >= self.maxsize:
+                raise queue.Full
+            self._queues[priority].setdefault(user, deque()).append((key, item))
+            self._size += 1
+            self._unfinished += 1
+            self._cond.notify()
+
+    def get(self) -> Tuple[Any, str]:
+        with self._cond:
+            while True:
+                picked = self._pick()
+                if picked is not None:
+                    return picked
+                self._cond.wait()
+
+    def task_done(self, user: Optional[str]) -> None:
+        user = user or ANONYMOUS
+        with self._cond:
+            self._running[user] -= 1
+            if self._running[user] <= 0:
+                del self._running[user]
+            self._unfinished -= 1
+            # A capped user may be eligible again
+            self._cond.notify_all()
+
+    def join(self) -> None:
+        with self._cond:
+            while self._unfinished:
+                self._cond.wait()
+
+    def _eligible(self, user: str) -> bool:
+        return not self.user_cap or self._running[user] < self.user_cap
+
+    def _pick(self) -> Optional[Tuple[Any, str]]:
+        for priority in PRIORITY_CLASSES:
+            ring = self._queues[priority]
+            deficit = self._deficit[priority]
+            eligible = [u for u in ring if self._eligible(u)]
+            if not eligible:
+                continue
+            while True:
+                user = next(u for u in ring if self._eligible(u))
+                if deficit.get(user, 0.0) < 1.0:
+                    deficit[user] = deficit.get(user, 0.0) + self.weight(user)
+                if deficit[user] < 1.0:
+                    # Low weight: keep accumulating over later rounds
+                    ring.move_to_end(user)
+                    continue
+                deficit[user] -= 1.0
+                items = ring[user]
+                _, item = items.popleft()
+                if not items:
+                    del ring[user]
+                    deficit.pop(user, None)
+                elif deficit[user] < 1.0:
+                    ring.move_to_end(user)
+                self._size -= 1
+                self._running[user] += 1
+                return item, user
+        return None
+
+    def position(self, key: Any) -> Optional[int]:
+        """Estimated 1-based dispatch position of the item queued as ``key``.
+
+        Counts every item of higher classes, plus the share of other users'
+        items DRR serves before this one. None when ``key`` is not queued.
+        """
+        with self._cond:
+            ahead = 0
+            for priority in PRIORITY_CLASSES:
+                ring = self._queues[priority]
+                for user, items in ring.items():
+                    index = next(
+                        (i for i, (k, _) in enumerate(items) if k == key), None
+                    )
+                    if index is None:
+                        continue
+                    rounds = (index + 1) / self.weight(user)
+                    for other, others in ring.items():
+                        if other != user:
+                            ahead += min(
+                                len(others), math.ceil(rounds * self.weight(other))
+                            )
+                    return ahead + index + 1
+                ahead += sum(len(items) for items in ring.values())
+            return None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "queued_by_priority": {
+                    p: sum(len(items) for items in ring.values())
+                    for p, ring in self._queues.items()
+                },
+                "running_by_user": dict(self._running),
+            }
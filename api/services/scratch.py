@@ -0,0 +1,175 @@
+"""
+Scratch run directories and background artifact persistence.
+
+When ``settings.scratch_root`` is set (e.g. a tmpfs such as ``/dev/shm`` or
+a local SSD), xtb runs in ``<scratch_root>/<job_id>`` so its temporary
+files never touch the artifact store. Once the run ends, a background
+thread moves only the declared artifacts into ``job_dir(job_id)``,
+recording each file's SHA-256 while copying, removes the scratch
+directory and then completes the job. The compute slot is free for the
+next job while the copy runs.
+
+Without a scratch root, jobs run directly in their job directory and
+complete inline, as before.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .settings import settings
+from .storage import job_dir
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+# Kept from a run that failed without a result, so its log outlives the
+# scratch directory
+FAILED_RUN_FILES = ("xtb.log",)
+
+_hooks: Dict[str, List[Callable[[Dict[str, Any]], None]]] = {}
+_hooks_lock = threading.Lock()
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def scratch_enabled() -> bool:
+    return settings.scratch_root is not None
+
+
+def scratch_dir(job_id: str) -> Path:
+    return Path(settings.scratch_root) / job_id
+
+
+def run_dir(job_id: str) -> Path:
+    """Directory a job runs in: its scratch directory, else its job directory."""
+    if not scratch_enabled():
+        return job_dir(job_id)
+    d = scratch_dir(job_id)
+    d.mkdir(parents=True, exist_ok=True)
+    return d
+
+
+def live_path(job_id: str, name: str) -> Path:
+    """Current location of a file written by a job (scratch while it runs)."""
+    if scratch_enabled():
+        path = scratch_dir(job_id) / name
+        if path.exists():
+            return path
+    return job_dir(job_id) / name
+
+
+def when_persisted(job_id: str, hook: Callable[[Dict[str, Any]], None]) -> None:
+    """Run ``hook(result)`` once the job's artifacts are in the artifact store."""
+    with _hooks_lock:
+        _hooks.setdefault(job_id, []).append(hook)
+
+
+def _move_hashed(src: Path, dst: Path) -> str:
+    """Move ``src`` to ``dst`` and return its SHA-256.
+
+    On the same filesystem the file is renamed and hashed in place;
+    otherwise it is copied through a temporary file, hashing the bytes as
+    they are written, then the source is removed.
+    """
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256()
+    if src.stat().st_dev == dst.parent.stat().st_dev:
+        os.replace(src, dst)
+        with dst.open("rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    tmp = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+    try:
+        with src.open("rb") as fin, tmp.open("wb") as fout:
+            while chunk := fin.read(CHUNK_SIZE):
+                digest.update(chunk)
+                fout.write(chunk)
+        shutil.copystat(src, tmp)
+        os.replace(tmp, dst)
+    finally:
+        tmp.unlink(missing_ok=True)
+    src.unlink()
+    return digest.hexdigest()
+
+
+def persist_artifacts(job_id: str, result: Optional[Dict[str, Any]]) -> None:
+    """Move a scratch run's declared artifacts into the job directory.
+
+    Artifact records are updated in place with their new ``path`` and a
+    ``sha256``; files not declared as artifacts are discarded along with
+    the scratch directory. Artifacts outside the scratch directory (e.g.
+    linked from the result cache) are left alone.
+    """
+    if not scratch_enabled() or not scratch_dir(job_id).is_dir():
+        return
+    src_root = scratch_dir(job_id)
+    dest = job_dir(job_id)
+    try:
+        if result is None:
+            for name in FAILED_RUN_FILES:
+                if (src_root / name).is_file():
+                    _move_hashed(src_root / name, dest / name)
+            return
+        for art in result.get("artifacts", []):
+            src = Path(art.get("path", ""))
+            if not src.is_relative_to(src_root) or not src.is_file():
+                continue
+            dst = dest / src.relative_to(src_root)
+            art["sha256"] = _move_hashed(src, dst)
+            art["path"] = str(dst)
+    finally:
+        shutil.rmtree(src_root, ignore_errors=True)
+
+
+def _persist_pool() -> ThreadPoolExecutor:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=max(1, settings.persist_workers),
+                thread_name_prefix="persist",
+            )
+        return _pool
+
+
+def complete(
+    job_id: str,
+    result: Optional[Dict[str, Any]],
+    finish: Callable[[Optional[Dict[str, Any]], Optional[str]], None],
+    background: bool = True,
+) -> None:
+    """Persist a finished run's artifacts, then call ``finish(result, error)``.
+
+    ``error`` is set when persistence itself failed. With ``background``,
+    jobs that ran in scratch are persisted on a background thread; others
+    (and every job when ``background`` is false) finish inline.
+    """
+    with _hooks_lock:
+        hooks = _hooks.pop(job_id, [])
+
+    def run() -> None:
+        try:
+            persist_artifacts(job_id, result)
+            if result is not None:
+                for hook in hooks:
+                    hook(result)
+        except Exception as e:  # noqa: BLE001
+            logger.exception("Persisting artifacts of job %s failed", job_id)
+            finish(result, f"Artifact persistence failed: {e}")
+            return
+        finish(result, None)
+
+    if background and scratch_enabled() and scratch_dir(job_id).is_dir():
+        _persist_pool().submit(run)
+    else:
+        run()
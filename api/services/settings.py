@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pathlib import Path
+from typing import Dict, Optional
 
 
 class Settings(BaseSettings):
@@ -10,6 +11,55 @@ class Settings(BaseSettings):
     xtb_bin: str = "xtb"
     sse_heartbeat_sec: int = 15
     jobs_force_local: bool = False
+    result_cache_enabled: bool = True
+    result_cache_max_bytes: int = 2 * 1024**3
+    jobs_batch_max: int = 10000
+    # Local job mode: worker slots (0 = cores // xtb_threads) and queue bound
+    local_workers: int = 0
+    local_queue_max: int = 1000
+    # Fair share: jobs running at once per user (0 = no cap) and DRR
+    # weights per user (default 1.0), e.g. USER_WEIGHTS='{"alice": 2}'
+    user_max_running: int = 0
+    user_weights: Dict[str, float] = {}
+    # Redis mode: delay before re-queueing a job of a user at their cap
+    user_cap_retry_ms: int = 2000
+    # Coalesce identical XTB jobs in flight; Redis flight keys expire after
+    # the TTL in case a leader never reports back
+    singleflight_enabled: bool = True
+    singleflight_ttl_sec: int = 6 * 3600
+    # A flight whose running leader has sent no heartbeat for this long is
+    # taken as lost and its followers dispatched again; checked every sweep
+    # seconds. Running xtb jobs beat every job_heartbeat_sec.
+    singleflight_claim_sec: int = 600
+    singleflight_sweep_sec: float = 60
+    job_heartbeat_sec: float = 30
+    # Per-job limits in seconds (0 = none); xtb is killed when exceeded
+    job_wall_time_sec: float = 0
+    job_cpu_time_sec: int = 0
+    # OpenMP threads per xtb process (0 = inherit the environment)
+    xtb_threads: int = 1
+    # Cube artifact storage: "npz" (compact float32) or "cube" (text)
+    cube_storage: str = "npz"
+    cube_view_cache_max_bytes: int = 512 * 1024**2
+    # On-demand cubes built from job orbitals
+    cube_cache_max_bytes: int = 2 * 1024**3
+    # Job results above this encoded size are kept in the job directory
+    result_inline_max_bytes: int = 256 * 1024
+    # Run jobs in <scratch_root>/<job_id> (tmpfs or local SSD) and move
+    # their artifacts to artifacts_root in the background; None = disabled
+    scratch_root: Optional[Path] = None
+    persist_workers: int = 2
+    # Local jobs store: jobs held in memory (0 = unbounded), encoded bytes
+    # of finished jobs' results held in memory, and seconds a finished job
+    # stays in memory; evicted finished jobs are spilled to their job
+    # directory and still served by id
+    store_max_jobs: int = 100000
+    store_max_result_bytes: int = 512 * 1024**2
+    store_terminal_ttl_sec: int = 3600
+    # Longest GET /jobs/{id}/wait long-poll, and how often a waiter
+    # re-reads the job when no event source is available
+    job_wait_max_sec: float = 120
+    job_wait_poll_sec: float = 0.5
 
 
 settings = Settings()
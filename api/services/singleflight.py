@@ -0,0 +1,261 @@
+"""
+Coalescing of identical XTB jobs that are in flight at the same time.
+
+The first job for a request hash (``result_cache.request_key``) becomes
+the flight's leader and runs; identical jobs submitted while it runs
+become followers: they are not dispatched, and when the leader finishes
+each follower receives a copy of its result (artifact records point at
+the leader's files). When the leader does not complete (cancelled, timed
+out or failed) its followers are dispatched again on their own. Only
+concurrent duplicates are coalesced; once the leader lands the flight is
+gone and later requests go through the result cache.
+
+A leader can also be lost (its worker died) and never land. Processes
+with followers run ``sweep`` every ``singleflight_sweep_sec``: flights
+whose leader has finished, is gone, or is running without a heartbeat
+for ``singleflight_claim_sec`` are landed and their followers dispatched
+again. A queued leader is never taken as lost: it is waiting for a slot
+like its followers would.
+
+Flights live in process memory in local mode and in Redis (one key and
+one follower list per flight, plus a registry hash of flight leaders,
+updated by Lua scripts) when the jobs store is Redis-backed, so
+duplicates are coalesced across API nodes.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from . import envelope
+from .jobs_store import TERMINAL_STATES, Job, RedisJobsStore, get_store
+from .settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Payload key marking a leader job with its flight's request hash
+FLIGHT = "flight"
+# Payload key keeping a follower's priority class, to dispatch it again
+FOLLOWER_PRIORITY = "flight_priority"
+
+# Become the leader (SET NX) or join as a follower, atomically.
+# KEYS = leader key, followers list, registry
+# ARGV = job id, follower record, ttl, flight key
+_JOIN_LUA = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'EX', ARGV[3]) then
+    redis.call('HSET', KEYS[3], ARGV[4], ARGV[1])
+    return false
+end
+redis.call('RPUSH', KEYS[2], ARGV[2])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return redis.call('GET', KEYS[1])
+"""
+
+# End the flight if ARGV[1] still leads it (or led it until its key
+# expired) and hand back its followers.
+# KEYS = leader key, followers list, registry; ARGV = job id, flight key
+_LAND_LUA = """
+local leader = redis.call('GET', KEYS[1])
+if leader then
+    if leader ~= ARGV[1] then
+        return {}
+    end
+elseif redis.call('HGET', KEYS[3], ARGV[2]) ~= ARGV[1] then
+    return {}
+end
+local followers = redis.call('LRANGE', KEYS[2], 0, -1)
+redis.call('DEL', KEYS[1], KEYS[2])
+redis.call('HDEL', KEYS[3], ARGV[2])
+return followers
+"""
+
+
+class LocalFlights:
+    def __init__(self) -> None:
+        self._flights: Dict[str, Tuple[str, List[Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+
+    def join(self, key: str, job_id: str, payload: Dict[str, Any]) -> Optional[str]:
+        """Lead the flight for ``key`` (None) or follow it (the leader's id)."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                self._flights[key] = (job_id, [])
+                return None
+            flight[1].append(payload)
+            return flight[0]
+
+    def land(self, key: str, job_id: str) -> List[Dict[str, Any]]:
+        """End the flight led by ``job_id``; return the followers' payloads."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None or flight[0] != job_id:
+                return []
+            del self._flights[key]
+            return flight[1]
+
+    def leaders(self) -> Iterator[Tuple[str, str]]:
+        """``(key, leader id)`` of every flight."""
+        with self._lock:
+            flights = [(key, flight[0]) for key, flight in self._flights.items()]
+        return iter(flights)
+
+
+class RedisFlights:
+    def __init__(self, redis_client, prefix: str) -> None:
+        self.r = redis_client
+        self.prefix = prefix
+        self._join = self.r.register_script(_JOIN_LUA)
+        self._land = self.r.register_script(_LAND_LUA)
+
+    def _registry(self) -> str:
+        return f"{self.prefix}flights"
+
+    def _keys(self, key: str) -> List[str]:
+        leader = f"{self.prefix}flight:{key}"
+        return [leader, f"{leader}:followers", self._registry()]
+
+    def join(self, key: str, job_id: str, payload: Dict[str, Any]) -> Optional[str]:
+        leader = self._join(
+            keys=self._keys(key),
+            args=[
+                job_id,
+                envelope.dumps(payload),
+                settings.singleflight_ttl_sec,
+                key,
+            ],
+        )
+        if leader is None:
+            return None
+        return leader.decode() if isinstance(leader, bytes) else leader
+
+    def land(self, key: str, job_id: str) -> List[Dict[str, Any]]:
+        followers = self._land(keys=self._keys(key), args=[job_id, key])
+        return [envelope.loads(f) for f in followers or []]
+
+    def leaders(self) -> Iterator[Tuple[str, str]]:
+        for key, leader in self.r.hgetall(self._registry()).items():
+            yield (
+                key.decode() if isinstance(key, bytes) else key,
+                leader.decode() if isinstance(leader, bytes) else leader,
+            )
+
+
+_flights = None
+_flights_store = None
+_flights_lock = threading.Lock()
+
+
+def get_flights():
+    """Flight registry matching the jobs store backend."""
+    global _flights, _flights_store
+    store = get_store()
+    with _flights_lock:
+        if _flights is None or _flights_store is not store:
+            if isinstance(store, RedisJobsStore):
+                _flights = RedisFlights(store.r, store.prefix)
+            else:
+                _flights = LocalFlights()
+            _flights_store = store
+        return _flights
+
+
+def coalesce(
+    key: str, payload: Dict[str, Any], priority: Optional[str] = None
+) -> Optional[str]:
+    """Join the flight for ``key`` with the job of ``payload``.
+
+    Returns None when the job leads (its payload is marked and it must be
+    dispatched), else the leader's id: the job must not be dispatched.
+    """
+    if not settings.singleflight_enabled:
+        return None
+    payload[FOLLOWER_PRIORITY] = priority
+    leader = get_flights().join(key, payload["job_id"], payload)
+    if leader is None:
+        del payload[FOLLOWER_PRIORITY]
+        payload[FLIGHT] = key
+    else:
+        _ensure_sweeper()
+    return leader
+
+
+def land(payload: Dict[str, Any]) -> None:
+    """Hand a finished leader's outcome to its followers."""
+    key = payload.get(FLIGHT) if isinstance(payload, dict) else None
+    if key:
+        _hand_over(key, payload["job_id"])
+
+
+def _hand_over(key: str, leader_id: str) -> None:
+    from .queue import notify_parents, redispatch
+
+    followers = get_flights().land(key, leader_id)
+    if not followers:
+        return
+    store = get_store()
+    leader = store.get(leader_id)
+    for follower in followers:
+        job_id = follower["job_id"]
+        current = store.get(job_id)
+        if current is None or current.state != "queued":
+            # Cancelled while following
+            notify_parents(follower)
+            continue
+        if leader is None or leader.state != "done":
+            # Nothing to share: run it on its own
+            redispatch(follower)
+            continue
+        follower.pop(FOLLOWER_PRIORITY, None)
+        store.set_state(job_id, "running")
+        result = dict(leader.result or {})
+        result["payload"] = follower
+        result["coalesced_from"] = leader_id
+        store.set_state(job_id, "done", result=result)
+        notify_parents(follower)
+
+
+def _lost(leader: Optional[Job]) -> bool:
+    if leader is None or leader.state in TERMINAL_STATES:
+        return True
+    # Running leaders beat updated_at (see queue.run_limits)
+    return (
+        leader.state == "running"
+        and time.time() - leader.updated_at > settings.singleflight_claim_sec
+    )
+
+
+def sweep() -> int:
+    """Land the flights whose leader was lost; return how many were landed."""
+    store = get_store()
+    landed = 0
+    for key, leader_id in list(get_flights().leaders()):
+        if _lost(store.get(leader_id)):
+            _hand_over(key, leader_id)
+            landed += 1
+    return landed
+
+
+_sweeper: Optional[threading.Thread] = None
+
+
+def _sweep_forever() -> None:
+    while True:
+        time.sleep(settings.singleflight_sweep_sec)
+        try:
+            sweep()
+        except Exception:  # noqa: BLE001
+            logger.exception("Sweeping job flights failed")
+
+
+def _ensure_sweeper() -> None:
+    global _sweeper
+    with _flights_lock:
+        if _sweeper is None or not _sweeper.is_alive():
+            _sweeper = threading.Thread(
+                target=_sweep_forever, name="flight-sweeper", daemon=True
+            )
+            _sweeper.start()
@@ -1,23 +1,92 @@
 import asyncio
+import codecs
+import json
+from pathlib import Path
+from typing import AsyncIterator, Callable, Optional, Union
+
 from starlette.responses import StreamingResponse
 
 
-async def sse_event_generator(log_iter, heartbeat=15):
+def format_event(data, event: Optional[str] = None) -> str:
+    """Format one SSE message; non-string data is sent as JSON."""
+    if not isinstance(data, str):
+        data = json.dumps(data)
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {data}\n\n"
+
+
+async def sse_event_generator(events: AsyncIterator, heartbeat=15):
+    """Relay ``events`` as SSE, sending a keep-alive after ``heartbeat`` idle seconds.
+
+    Items may be plain strings or ``(event, data)`` tuples.
+    """
+    it = events.__aiter__()
+    pending = None
     try:
         while True:
-            line = next(log_iter, None)
-            if line is not None:
-                yield f"data: {line}\n\n"
-            else:
-                await asyncio.sleep(heartbeat)
+            if pending is None:
+                pending = asyncio.ensure_future(it.__anext__())
+            done, _ = await asyncio.wait({pending}, timeout=heartbeat)
+            if not done:
                 yield ": keep-alive\n\n"
-    except StopIteration:
-        return
+                continue
+            try:
+                item = pending.result()
+            except StopAsyncIteration:
+                return
+            pending = None
+            if isinstance(item, tuple):
+                yield format_event(item[1], event=item[0])
+            else:
+                yield format_event(item)
+    finally:
+        if pending is not None:
+            pending.cancel()
 
 
-def sse_response(log_iter, heartbeat=15):
+def sse_response(events: AsyncIterator, heartbeat=15):
     return StreamingResponse(
-        sse_event_generator(log_iter, heartbeat),
+        sse_event_generator(events, heartbeat),
         media_type="text/event-stream",
         headers={"Cache-Control": "no-cache", "Connection": "keep-alive"},
     )
+
+
+async def tail_file(
+    path: Union[Path, Callable[[], Path]],
+    is_done: Callable[[], bool],
+    poll_interval: float = 0.5,
+    chunk_size: int = 64 * 1024,
+) -> AsyncIterator[str]:
+    """Yield text appended to ``path`` until ``is_done()`` and the file is drained.
+
+    Uses offset polling: reads happen in a worker thread and the event loop
+    only sleeps between polls, so slow disks never block it. The file may
+    not exist yet when tailing starts. ``path`` may be a callable, resolved
+    on every poll, for files that move while they are tailed. ``is_done``
+    may be a coroutine function.
+    """
+    offset = 0
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def read_from(pos: int) -> bytes:
+        try:
+            with (path() if callable(path) else path).open("rb") as f:
+                f.seek(pos)
+                return f.read(chunk_size)
+        except FileNotFoundError:
+            return b""
+
+    while True:
+        if asyncio.iscoroutinefunction(is_done):
+            done = await is_done()
+        else:
+            done = await asyncio.to_thread(is_done)
+        chunk = await asyncio.to_thread(read_from, offset)
+        if chunk:
+            offset += len(chunk)
+            yield decoder.decode(chunk)
+            continue
+        if done:
+            return
+        await asyncio.sleep(poll_interval)
@@ -0,0 +1,215 @@
+"""
+Server-side DAG of chained XTB stages (e.g. opt -> hess/properties/cubes).
+
+A workflow is a parent job in the ``running`` state. Each stage runs as an
+ordinary ``xtb`` child job, so stages go through the usual queue, workers
+and result cache: a stage whose request is cached completes at once and
+is effectively skipped. When a stage finishes, every dependent stage
+whose dependencies are all done is dispatched (claimed once in the store,
+so concurrent finishes never dispatch twice); independent branches thus
+run in parallel. Dependent stages start from the optimized geometry of
+their first dependency and see its job directory through a ``deps/<name>``
+symlink.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from api.schemas.job import JobRequest, WorkflowRequest, XTBParams
+
+from .jobs_store import TERMINAL_STATES, Job, get_store
+from .storage import job_dir
+
+
+def stage_order(request: WorkflowRequest) -> List[str]:
+    """Topological order of the stages; raises ValueError on a bad graph."""
+    deps = {}
+    for stage in request.stages:
+        if stage.name in deps:
+            raise ValueError(f"Duplicate stage: {stage.name}")
+        deps[stage.name] = list(stage.depends_on)
+    if not deps:
+        raise ValueError("Workflow has no stages")
+    for name, needs in deps.items():
+        unknown = [d for d in needs if d not in deps]
+        if unknown:
+            raise ValueError(f"Stage {name} depends on unknown stages: {unknown}")
+
+    order: List[str] = []
+    done: set = set()
+    while len(order) < len(deps):
+        ready = [n for n in deps if n not in done and set(deps[n]) <= done]
+        if not ready:
+            raise ValueError("Workflow stages contain a cycle")
+        order.extend(ready)
+        done.update(ready)
+    return order
+
+
+def submit_workflow(request: WorkflowRequest) -> Job:
+    """Create the workflow job and dispatch its root stages."""
+    stage_order(request)
+    store = get_store()
+    parent = store.create(user=request.user)
+    store.set_state(parent.id, "running")
+    spec = request.model_dump()
+    try:
+        for index, stage in enumerate(request.stages):
+            if not stage.depends_on and store.claim(parent.id, stage.name):
+                _dispatch_stage(parent.id, spec, index, {})
+    except Exception as e:
+        store.set_state(parent.id, "failed", error=str(e))
+        raise
+    return store.get(parent.id) or parent
+
+
+def _dispatch_stage(
+    workflow_id: str, spec: Dict[str, Any], index: int, children: Dict[int, str]
+) -> None:
+    from .queue import submit
+
+    request = WorkflowRequest.model_validate(spec)
+    stage = request.stages[index]
+    names = [s.name for s in request.stages]
+    stage_inputs = {d: children[names.index(d)] for d in stage.depends_on}
+
+    xyz = request.inputs.xyz
+    for dep_id in stage_inputs.values():
+        optimized = job_dir(dep_id) / "xtbopt.xyz"
+        if optimized.is_file():
+            xyz = optimized.read_text(encoding="utf-8")
+            break
+
+    params = XTBParams(**{**request.inputs.params.model_dump(), **stage.params})
+    inputs = request.inputs.model_copy(update={"xyz": xyz, "params": params})
+    job_request = JobRequest(engine=request.engine, inputs=inputs, user=request.user)
+    payload = {
+        "job_request": job_request.model_dump(),
+        "workflow_id": workflow_id,
+        "workflow": spec,
+        "stage": index,
+        "stage_inputs": stage_inputs,
+    }
+    submit(
+        "xtb", payload, user=request.user, priority=request.priority or "interactive"
+    )
+
+
+def prepare_stage_dir(payload: Dict[str, Any], work: Path) -> None:
+    """Expose dependency job directories to a stage before it runs.
+
+    Dependencies are symlinked as ``deps/<stage>``. ``xtbrestart`` is the
+    one file copied rather than linked, since xtb rewrites it in place.
+    """
+    stage_inputs = payload.get("stage_inputs") if isinstance(payload, dict) else None
+    if not stage_inputs:
+        return
+    deps = work / "deps"
+    deps.mkdir(parents=True, exist_ok=True)
+    for name, dep_id in stage_inputs.items():
+        link = deps / name
+        if not link.exists():
+            os.symlink(job_dir(dep_id), link, target_is_directory=True)
+    first = job_dir(next(iter(stage_inputs.values())))
+    restart = first / "xtbrestart"
+    if restart.is_file() and not (work / "xtbrestart").exists():
+        shutil.copyfile(restart, work / "xtbrestart")
+
+
+def stage_finished(payload: Dict[str, Any]) -> None:
+    """Record a finished stage and dispatch the stages it unblocks."""
+    workflow_id = payload.get("workflow_id") if isinstance(payload, dict) else None
+    if not workflow_id:
+        return
+    store = get_store()
+    spec = payload["workflow"]
+    stages = spec["stages"]
+    index = int(payload["stage"])
+    count = store.add_child(workflow_id, index, payload["job_id"])
+    workflow = store.get(workflow_id)
+    if workflow is None or workflow.state in TERMINAL_STATES:
+        # Already failed (another branch) or cancelled: dispatch no more
+        return
+    if store.cancel_requested(workflow_id):
+        # Running stages are stopped by the same flag
+        store.set_state(workflow_id, "cancelled", error="Job cancelled")
+        return
+
+    job = store.get(payload["job_id"])
+    if job is None or job.state != "done":
+        error = job.error if job is not None else "missing"
+        store.set_state(
+            workflow_id,
+            "failed",
+            error=f"Stage {stages[index]['name']} failed: {error}",
+        )
+        return
+
+    children = store.children(workflow_id)
+    names = [s["name"] for s in stages]
+    for t, stage in enumerate(stages):
+        deps = [names.index(d) for d in stage["depends_on"]]
+        if names[index] not in stage["depends_on"] or t in children:
+            continue
+        if not all(d in children and _is_done(store, children[d]) for d in deps):
+            continue
+        if store.claim(workflow_id, stage["name"]):
+            try:
+                _dispatch_stage(workflow_id, spec, t, children)
+            except Exception as e:  # noqa: BLE001
+                store.set_state(
+                    workflow_id,
+                    "failed",
+                    error=f"Stage {stage['name']} could not start: {e}",
+                )
+                return
+
+    if count < len(stages):
+        store.set_progress(workflow_id, count / len(stages))
+        return
+    _aggregate(workflow_id, spec, children)
+
+
+def _is_done(store, job_id: str) -> bool:
+    job = store.get(job_id)
+    return job is not None and job.state == "done"
+
+
+def _aggregate(workflow_id: str, spec: Dict[str, Any], children: Dict[int, str]):
+    """Merge stage results in topological order into the workflow result."""
+    store = get_store()
+    request = WorkflowRequest.model_validate(spec)
+    names = [s.name for s in request.stages]
+    scalars: Dict[str, float] = {}
+    series: Dict[str, Any] = {}
+    artifacts: List[Dict[str, Any]] = []
+    orbitals: Optional[Dict[str, Any]] = None
+    for name in stage_order(request):
+        job = store.get(children[names.index(name)])
+        if job is None or job.state != "done":
+            store.set_state(workflow_id, "failed", error=f"Stage {name} failed")
+            return
+        result = job.result or {}
+        scalars.update(result.get("scalars", {}))
+        series.update(result.get("series", {}))
+        for art in result.get("artifacts", []):
+            artifacts.append({**art, "name": f"{name}.{art['name']}"})
+        if result.get("orbitals"):
+            orbitals = {
+                **result["orbitals"],
+                "molden": f"{name}.{result['orbitals']['molden']}",
+            }
+
+    merged = {
+        "scalars": scalars,
+        "series": series,
+        "artifacts": artifacts,
+        "stages": {n: children[i] for i, n in enumerate(names)},
+    }
+    if orbitals:
+        merged["orbitals"] = orbitals
+    store.set_state(workflow_id, "done", result=merged)
@@ -5,11 +5,15 @@ This module provides functionality to:
 1. Generate HOMO/LUMO cube files from XTB calculations
 2. Convert Molden files to cube format
 3. Validate and process cube files for visualization
+4. Parse and write cube files with NumPy (``CubeFile``)
 """
 
+import json
 import shutil
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any, Tuple
+
+import numpy as np
 
 
 class CubeGenerationError(Exception):
@@ -18,6 +22,244 @@ class CubeGenerationError(Exception):
     pass
 
 
+# Rows of the voxel block written per formatting call
+_WRITE_BLOCK_ROWS = 4096
+# Suffix appended to ``name.cube`` for the compact representation
+COMPACT_SUFFIX = ".npz"
+
+
+class CubeFile:
+    """
+    Gaussian cube file with a lazily parsed header and NumPy voxel data.
+
+    The header is parsed on first access of ``header`` and the voxel block on
+    first use of ``data``. ``write_sidecar`` stores the voxels in a
+    binary ``.npy`` file next to the cube, after which ``data`` is
+    memory-mapped from it, so slicing a large cube touches only the pages it
+    needs.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._header: Optional[Dict[str, Any]] = None
+        self._data: Optional[np.ndarray] = None
+
+    @classmethod
+    def from_array(
+        cls,
+        data: np.ndarray,
+        origin=(0.0, 0.0, 0.0),
+        axes=None,
+        atoms=None,
+        comments: Tuple[str, str] = ("Cube file generated by NOX", ""),
+    ) -> "CubeFile":
+        """Build an in-memory cube; call ``write`` to save it."""
+        data = np.asarray(data, dtype=np.float64)
+        if data.ndim != 3:
+            raise ValueError("Cube data must be a 3D array")
+        axes = np.eye(3) * 0.2 if axes is None else np.asarray(axes, dtype=float)
+        atoms = np.zeros((0, 5)) if atoms is None else np.asarray(atoms, dtype=float)
+        cube = cls(Path())
+        cube._header = {
+            "comments": list(comments),
+            "natoms": len(atoms),
+            "origin": np.asarray(origin, dtype=float),
+            "shape": tuple(data.shape),
+            "axes": axes,
+            "atoms": atoms.reshape(-1, 5),
+            "mo_indices": [],
+            "data_offset": 0,
+        }
+        cube._data = data
+        return cube
+
+    @property
+    def sidecar_path(self) -> Path:
+        return self.path.with_name(self.path.name + ".npy")
+
+    @property
+    def header(self) -> Dict[str, Any]:
+        if self._header is None:
+            self._header = self._read_header()
+        return self._header
+
+    def _read_header(self) -> Dict[str, Any]:
+        with self.path.open("rb") as f:
+            lines = [f.readline().decode("utf-8", "replace") for _ in range(6)]
+            if not lines[-1]:
+                raise ValueError("Invalid cube file: too few header lines")
+            natoms_line = lines[2].split()
+            natoms = int(natoms_line[0])
+            origin = np.array([float(x) for x in natoms_line[1:4]])
+            shape, axes = [], []
+            for line in lines[3:6]:
+                parts = line.split()
+                shape.append(abs(int(parts[0])))
+                axes.append([float(x) for x in parts[1:4]])
+            atoms = []
+            for _ in range(abs(natoms)):
+                parts = f.readline().split()
+                if len(parts) < 5:
+                    raise ValueError("Invalid cube file: truncated atom block")
+                atoms.append([float(x) for x in parts[:5]])
+            mo_indices: List[int] = []
+            if natoms < 0:
+                # Orbital cubes list the MO count and indices after the atoms
+                parts = f.readline().split()
+                mo_indices = [int(x) for x in parts[1 : 1 + int(parts[0])]]
+            data_offset = f.tell()
+        return {
+            "comments": [lines[0].rstrip("\r\n"), lines[1].rstrip("\r\n")],
+            "natoms": abs(natoms),
+            "origin": origin,
+            "shape": tuple(shape),
+            "axes": np.array(axes),
+            "atoms": np.array(atoms, dtype=float).reshape(-1, 5),
+            "mo_indices": mo_indices,
+            "data_offset": data_offset,
+        }
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        nvals = max(1, len(self.header["mo_indices"]))
+        shape = tuple(self.header["shape"])
+        return shape if nvals == 1 else shape + (nvals,)
+
+    @property
+    def data(self) -> np.ndarray:
+        """Voxel values, shape (nx, ny, nz) (plus a trailing MO axis if several)."""
+        if self._data is None:
+            sidecar = self.sidecar_path
+            if (
+                sidecar.exists()
+                and sidecar.stat().st_mtime >= self.path.stat().st_mtime
+            ):
+                self._data = np.load(sidecar, mmap_mode="r")
+            else:
+                self._data = self._read_text_data()
+        return self._data
+
+    def _read_text_data(self) -> np.ndarray:
+        expected = int(np.prod(self.shape))
+        with self.path.open("rb") as f:
+            f.seek(self.header["data_offset"])
+            values = np.fromfile(f, dtype=np.float64, sep=" ")
+        if values.size < expected:
+            raise ValueError(
+                f"Invalid cube file: expected {expected} values, found {values.size}"
+            )
+        return values[:expected].reshape(self.shape)
+
+    def write_sidecar(self) -> Path:
+        """Save voxels to a binary ``.npy`` sidecar and memory-map it."""
+        sidecar = self.sidecar_path
+        np.save(sidecar, np.ascontiguousarray(self.data))
+        self._data = np.load(sidecar, mmap_mode="r")
+        return sidecar
+
+    def slice(self, axis: int, index: int) -> np.ndarray:
+        """Return one grid plane perpendicular to ``axis``."""
+        return np.take(self.data, index, axis=axis)
+
+    def save_compact(self, path: Path) -> Path:
+        """Save as a compressed NPZ: float32 voxels plus the header as JSON."""
+        path = Path(path)
+        h = self.header
+        header = {
+            "comments": h["comments"],
+            "natoms": h["natoms"],
+            "origin": np.asarray(h["origin"]).tolist(),
+            "shape": list(h["shape"]),
+            "axes": np.asarray(h["axes"]).tolist(),
+            "atoms": np.asarray(h["atoms"]).tolist(),
+            "mo_indices": list(h["mo_indices"]),
+        }
+        # np.savez appends .npz to names lacking it, so write via a handle
+        with path.open("wb") as f:
+            np.savez_compressed(
+                f,
+                header=np.array(json.dumps(header)),
+                data=np.asarray(self.data, dtype=np.float32),
+            )
+        return path
+
+    @classmethod
+    def from_compact(cls, path: Path) -> "CubeFile":
+        """Load a cube saved with ``save_compact``."""
+        with np.load(path, allow_pickle=False) as npz:
+            header = json.loads(str(npz["header"]))
+            data = npz["data"]
+        cube = cls(Path(path))
+        cube._header = {
+            "comments": header["comments"],
+            "natoms": header["natoms"],
+            "origin": np.array(header["origin"], dtype=float),
+            "shape": tuple(header["shape"]),
+            "axes": np.array(header["axes"], dtype=float),
+            "atoms": np.array(header["atoms"], dtype=float).reshape(-1, 5),
+            "mo_indices": header["mo_indices"],
+            "data_offset": 0,
+        }
+        cube._data = data
+        return cube
+
+    def text_chunks(self) -> Iterator[str]:
+        """Yield the cube in text format, formatting whole row blocks at once."""
+        h = self.header
+        data = np.asarray(self.data, dtype=np.float64)
+        nz = data.shape[2] * (data.shape[3] if data.ndim == 4 else 1)
+        rows = data.reshape(-1, nz)
+
+        natoms = -h["natoms"] if h["mo_indices"] else h["natoms"]
+        out = [f"{h['comments'][0]}\n{h['comments'][1]}\n"]
+        out.append(f"{natoms:5d}" + "".join(f"{x:12.6f}" for x in h["origin"]) + "\n")
+        for n, vec in zip(h["shape"], h["axes"]):
+            out.append(f"{n:5d}" + "".join(f"{x:12.6f}" for x in vec) + "\n")
+        for atom in h["atoms"]:
+            out.append(
+                f"{int(atom[0]):5d}" + "".join(f"{x:12.6f}" for x in atom[1:]) + "\n"
+            )
+        if h["mo_indices"]:
+            mos = h["mo_indices"]
+            out.append(f"{len(mos):5d}" + "".join(f"{i:5d}" for i in mos) + "\n")
+
+        # One z-row per line group, wrapped every 6 values
+        row_fmt = (
+            "".join(
+                " %12.5E" + ("\n" if (k + 1) % 6 == 0 and k + 1 < nz else "")
+                for k in range(nz)
+            )
+            + "\n"
+        )
+        yield "".join(out)
+        for start in range(0, rows.shape[0], _WRITE_BLOCK_ROWS):
+            block = rows[start : start + _WRITE_BLOCK_ROWS]
+            yield (row_fmt * block.shape[0]) % tuple(block.ravel())
+
+    def write(self, path: Path) -> Path:
+        """Write the cube in text format."""
+        path = Path(path)
+        with path.open("w", encoding="utf-8") as f:
+            for chunk in self.text_chunks():
+                f.write(chunk)
+        return path
+
+
+def compact_cube_file(cube_path: Path, remove_text: bool = True) -> Path:
+    """Convert a text cube to its compact NPZ form (``name.cube.npz``)."""
+    compact = cube_path.with_name(cube_path.name + COMPACT_SUFFIX)
+    CubeFile(cube_path).save_compact(compact)
+    if remove_text:
+        cube_path.unlink()
+    return compact
+
+
+def cube_text_chunks(compact_path: Path) -> Iterator[bytes]:
+    """Stream the text form of a compact cube without writing it to disk."""
+    for chunk in CubeFile.from_compact(compact_path).text_chunks():
+        yield chunk.encode("utf-8")
+
+
 def find_cube_tools() -> Dict[str, Optional[str]]:
     """Find available tools for cube generation."""
     tools = {}
@@ -143,43 +385,28 @@ def _create_placeholder_cubes(output_dir: Path, cube_types: List[str]) -> List[P
     """Create placeholder cube files for testing when no tools are available."""
     cubes = []
 
-    # Standard cube file header format
-    cube_header = """Test molecule cube file generated by NOX
-HOMO/LUMO orbital cube for visualization
-    2    0.000000    0.000000    0.000000
-   40    0.200000    0.000000    0.000000
-   40    0.000000    0.200000    0.000000
-   40    0.000000    0.000000    0.200000
-    1    1.000000    0.000000    0.000000    0.000000
-    1    1.000000    2.000000    0.000000    0.000000
-"""
+    # Small 10x10x10 grid with a simple orbital-like radial shape
+    n = 10
+    idx = np.arange(n) - n // 2
+    x, y, z = np.meshgrid(idx, idx, idx, indexing="ij")
+    r = np.sqrt(x * x + y * y + z * z)
+    atoms = [[1, 1.0, 0.0, 0.0, 0.0], [1, 1.0, 2.0, 0.0, 0.0]]
 
     for cube_type in cube_types:
-        cube_file = output_dir / f"{cube_type}.cube"
-
-        # Create a minimal but valid cube file for testing
-        cube_content = cube_header
-
-        # Add some minimal volumetric data (very small grid for testing)
-        for i in range(10):  # Small 10x10x10 grid instead of 40x40x40
-            for j in range(10):
-                for k in range(10):
-                    # Simple mathematical function for orbital-like shape
-                    x, y, z = i - 5, j - 5, k - 5
-                    r = (x * x + y * y + z * z) ** 0.5
-                    if cube_type == "homo":
-                        value = 0.1 * (1.0 / (1.0 + r)) if r > 0 else 0.1
-                    else:  # lumo
-                        value = 0.05 * (1.0 / (1.0 + r * r)) if r > 0 else 0.05
-
-                    cube_content += f"  {value:12.6e}"
-                    if (k + 1) % 6 == 0:  # Line break every 6 values
-                        cube_content += "\n"
-                cube_content += "\n"
-            cube_content += "\n"
-
-        cube_file.write_text(cube_content)
-        cubes.append(cube_file)
+        if cube_type == "homo":
+            values = 0.1 / (1.0 + r)
+        else:  # lumo and anything else
+            values = 0.05 / (1.0 + r * r)
+
+        cube = CubeFile.from_array(
+            values,
+            atoms=atoms,
+            comments=(
+                "Test molecule cube file generated by NOX",
+                f"{cube_type.upper()} orbital cube for visualization",
+            ),
+        )
+        cubes.append(cube.write(output_dir / f"{cube_type}.cube"))
 
     return cubes
 
@@ -195,35 +422,16 @@ def validate_cube_file(cube_path: Path) -> Dict[str, Any]:
         raise FileNotFoundError(f"Cube file not found: {cube_path}")
 
     try:
-        lines = cube_path.read_text().strip().split("\n")
-
-        # Parse cube header
-        if len(lines) < 6:
-            raise ValueError("Invalid cube file: too few header lines")
-
-        # Line 0-1: Comments
-        comment1, comment2 = lines[0], lines[1]
-
-        # Line 2: Number of atoms and origin
-        natoms_line = lines[2].split()
-        natoms = int(natoms_line[0])
-        origin = [float(x) for x in natoms_line[1:4]]
-
-        # Lines 3-5: Grid vectors
-        grid_info = []
-        for i in range(3, 6):
-            parts = lines[i].split()
-            npoints = int(parts[0])
-            vector = [float(x) for x in parts[1:4]]
-            grid_info.append((npoints, vector))
+        # Only the header is parsed; the voxel block is never read here
+        header = CubeFile(cube_path).header
 
         return {
             "valid": True,
-            "natoms": natoms,
-            "origin": origin,
-            "grid_points": [g[0] for g in grid_info],
-            "grid_vectors": [g[1] for g in grid_info],
-            "comments": [comment1, comment2],
+            "natoms": header["natoms"],
+            "origin": header["origin"].tolist(),
+            "grid_points": list(header["shape"]),
+            "grid_vectors": header["axes"].tolist(),
+            "comments": header["comments"],
             "file_size": cube_path.stat().st_size,
         }
 
@@ -0,0 +1,152 @@
+"""
+Volumetric grid reduction and isosurface extraction with NumPy.
+
+Used to serve light-weight views of cube files: block-averaged grids and
+triangle meshes, so viewers need not download full-resolution volumes.
+Grids are indexed ``data[i, j, k]`` with Cartesian position
+``origin + (i, j, k) @ axes``, as in cube files.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+# Cube corner offsets in (i, j, k) index space
+_CORNERS = np.array(
+    [
+        [0, 0, 0],
+        [1, 0, 0],
+        [1, 1, 0],
+        [0, 1, 0],
+        [0, 0, 1],
+        [1, 0, 1],
+        [1, 1, 1],
+        [0, 1, 1],
+    ]
+)
+# Six tetrahedra around the 0-6 diagonal; neighbouring cells split their
+# shared faces identically, so the mesh has no cracks
+_TETRAHEDRA = np.array(
+    [
+        [0, 5, 1, 6],
+        [0, 1, 2, 6],
+        [0, 2, 3, 6],
+        [0, 3, 7, 6],
+        [0, 7, 4, 6],
+        [0, 4, 5, 6],
+    ]
+)
+
+
+def _case_table():
+    """Triangles (as pairs of tet vertices per corner) for the 16 sign cases."""
+    table = []
+    for case in range(16):
+        inside = [v for v in range(4) if case >> v & 1]
+        outside = [v for v in range(4) if not case >> v & 1]
+        if len(inside) in (1, 3):
+            lone, others = (
+                (inside[0], outside) if len(inside) == 1 else (outside[0], inside)
+            )
+            table.append([[(lone, o) for o in others]])
+        elif len(inside) == 2:
+            (a, b), (c, d) = inside, outside
+            table.append([[(a, c), (a, d), (b, d)], [(a, c), (b, d), (b, c)]])
+        else:
+            table.append([])
+    return table
+
+
+_CASES = _case_table()
+
+
+def downsample(
+    data: np.ndarray, origin: np.ndarray, axes: np.ndarray, resolution: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Block-average ``data`` to at most ``resolution`` points per axis.
+
+    Returns the reduced grid with its origin and step vectors. Edges are
+    padded by repetition so every block is full.
+    """
+    factor = max(1, -(-max(data.shape) // max(1, resolution)))
+    if factor == 1:
+        return data, origin, axes
+    pad = [(0, -n % factor) for n in data.shape]
+    padded = np.pad(data, pad, mode="edge")
+    nx, ny, nz = (n // factor for n in padded.shape)
+    blocks = padded.reshape(nx, factor, ny, factor, nz, factor)
+    reduced = blocks.mean(axis=(1, 3, 5))
+    # Block centres sit half a block in from the original origin
+    new_origin = origin + (factor - 1) / 2 * axes.sum(axis=0)
+    return reduced, new_origin, axes * factor
+
+
+def marching_tetrahedra(
+    data: np.ndarray, isovalue: float, origin: np.ndarray, axes: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Extract the ``isovalue`` surface of ``data`` as a triangle mesh.
+
+    Returns ``(vertices, faces)``: float32 Cartesian coordinates of shape
+    (n, 3) and uint32 vertex indices of shape (m, 3). Vertices are shared
+    between adjacent triangles and faces are wound so their normals point
+    from values above ``isovalue`` towards values below it.
+    """
+    nx, ny, nz = data.shape
+    if min(nx, ny, nz) < 2:
+        return np.zeros((0, 3), np.float32), np.zeros((0, 3), np.uint32)
+
+    # Linear index of every cell's base corner, and of each corner offset
+    base = np.arange(nx * ny * nz).reshape(nx, ny, nz)[:-1, :-1, :-1].ravel()
+    offsets = (_CORNERS * [ny * nz, nz, 1]).sum(axis=1)
+    flat = data.ravel()
+    inside = flat > isovalue
+
+    # Keep only cells whose corners straddle the isovalue
+    corner_inside = inside[base[:, None] + offsets]
+    crossing = corner_inside.any(axis=1) & ~corner_inside.all(axis=1)
+    base = base[crossing]
+
+    edge_a, edge_b = [], []
+    for tet in _TETRAHEDRA:
+        ids = base[:, None] + offsets[tet]  # (cells, 4) grid point indices
+        case = (inside[ids] * [1, 2, 4, 8]).sum(axis=1)
+        for c in range(1, 15):
+            sel = ids[case == c]
+            if not len(sel):
+                continue
+            for tri in _CASES[c]:
+                edge_a.append(np.stack([sel[:, a] for a, _ in tri], axis=1))
+                edge_b.append(np.stack([sel[:, b] for _, b in tri], axis=1))
+    if not edge_a:
+        return np.zeros((0, 3), np.float32), np.zeros((0, 3), np.uint32)
+
+    # Each triangle corner lies on a grid edge (a, b); dedupe shared edges
+    a = np.concatenate(edge_a).ravel()
+    b = np.concatenate(edge_b).ravel()
+    lo, hi = np.minimum(a, b), np.maximum(a, b)
+    _, first, faces = np.unique(
+        lo * flat.size + hi, return_index=True, return_inverse=True
+    )
+    lo, hi = lo[first], hi[first]
+
+    va, vb = flat[lo], flat[hi]
+    t = (isovalue - va) / (vb - va)
+    pa = np.stack(np.unravel_index(lo, data.shape), axis=1)
+    pb = np.stack(np.unravel_index(hi, data.shape), axis=1)
+    index_pos = pa + t[:, None] * (pb - pa)
+    vertices = origin + index_pos @ axes
+    faces = faces.reshape(-1, 3)
+
+    # Orient each face along the descending side of its crossing edge
+    tri = vertices[faces]
+    normals = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+    a0, b0 = a.reshape(-1, 3)[:, 0], b.reshape(-1, 3)[:, 0]
+    step = (
+        np.stack(np.unravel_index(b0, data.shape), axis=1)
+        - np.stack(np.unravel_index(a0, data.shape), axis=1)
+    ) @ axes
+    descent = np.where((flat[a0] > isovalue)[:, None], step, -step)
+    flip = (normals * descent).sum(axis=1) < 0
+    faces[flip] = faces[flip][:, ::-1]
+
+    return vertices.astype(np.float32), faces.astype(np.uint32)
@@ -8,8 +8,10 @@ This module provides core job management functionality including:
 - Job persistence and cleanup utilities
 """
 
+from .cache import JobCache
 from .manager import JobManager
 from .states import JobState
+from .sqlite_storage import SQLiteJobStorage
 from .storage import JobStorage
 
-__all__ = ["JobManager", "JobState", "JobStorage"]
+__all__ = ["JobCache", "JobManager", "JobState", "JobStorage", "SQLiteJobStorage"]
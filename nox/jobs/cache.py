@@ -0,0 +1,129 @@
+"""
+Job Cache
+
+Bounded in-memory cache for job data. Entries are kept in LRU order and
+evicted once either the entry count or the approximate byte budget is
+exceeded; terminal jobs also expire after a TTL. Reads return read-only
+views of the cached dicts instead of copies.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional
+
+from .states import JobState, is_terminal_state
+
+
+def _nbytes(value: Any) -> int:
+    """Approximate in-memory weight of a JSON-like value"""
+    return len(json.dumps(value, default=str, separators=(",", ":")))
+
+
+def _is_terminal(job_data: Mapping[str, Any]) -> bool:
+    try:
+        return is_terminal_state(JobState(job_data.get("state")))
+    except ValueError:
+        return False
+
+
+class _Entry:
+    __slots__ = ("value", "nbytes", "result_nbytes", "expires")
+
+    def __init__(
+        self, value: Dict[str, Any], nbytes: int, result_nbytes: int, expires: float
+    ):
+        self.value = value
+        self.nbytes = nbytes
+        self.result_nbytes = result_nbytes
+        self.expires = expires
+
+
+class JobCache:
+    """LRU cache of job dicts with an item cap, byte budget and terminal TTL"""
+
+    def __init__(
+        self,
+        max_items: int = 10000,
+        max_bytes: int = 64 * 1024 * 1024,
+        terminal_ttl: float = 600.0,
+    ):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.terminal_ttl = terminal_ttl
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, job_id: str) -> bool:
+        return self.get(job_id) is not None
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def get(self, job_id: str) -> Optional[Mapping[str, Any]]:
+        """Read-only view of a cached job, or None when absent or expired"""
+        with self._lock:
+            entry = self._entries.get(job_id)
+            if entry is None:
+                return None
+            if entry.expires and entry.expires <= time.monotonic():
+                self._remove(job_id)
+                return None
+            self._entries.move_to_end(job_id)
+            return MappingProxyType(entry.value)
+
+    def put(self, job_id: str, job_data: Dict[str, Any]) -> None:
+        """Cache ``job_data``; the dict must not be mutated afterwards"""
+        result = job_data.get("result")
+        with self._lock:
+            old = self._entries.get(job_id)
+            if old is not None and old.value.get("result") is result:
+                # Progress updates keep the same result object: skip re-sizing it
+                result_nbytes = old.result_nbytes
+            else:
+                result_nbytes = _nbytes(result)
+            nbytes = (
+                _nbytes({k: v for k, v in job_data.items() if k != "result"})
+                + result_nbytes
+            )
+            expires = (
+                time.monotonic() + self.terminal_ttl
+                if self.terminal_ttl and _is_terminal(job_data)
+                else 0.0
+            )
+            if old is not None:
+                self._remove(job_id)
+            self._entries[job_id] = _Entry(job_data, nbytes, result_nbytes, expires)
+            self._nbytes += nbytes
+            self._evict(self.max_items)
+
+    def pop(self, job_id: str) -> None:
+        with self._lock:
+            if job_id in self._entries:
+                self._remove(job_id)
+
+    def trim(self, max_items: int) -> None:
+        """Evict least recently used entries down to ``max_items``"""
+        with self._lock:
+            self._evict(max_items)
+
+    def _remove(self, job_id: str) -> None:
+        self._nbytes -= self._entries.pop(job_id).nbytes
+
+    def _evict(self, max_items: int) -> None:
+        # The newest entry stays even when it alone exceeds the byte budget
+        while len(self._entries) > 1 and (
+            len(self._entries) > max_items or self._nbytes > self.max_bytes
+        ):
+            job_id = next(iter(self._entries))
+            self._remove(job_id)
+        if len(self._entries) > max_items:
+            self._entries.clear()
+            self._nbytes = 0
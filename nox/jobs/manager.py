@@ -6,21 +6,43 @@ and result retrieval. Integrates with Dramatiq for background processing
 and provides a clean interface for job operations.
 """
 
+import threading
+import time
 import uuid
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Mapping, Optional, List, Union
 from datetime import datetime, timezone
 
-from .states import JobState, is_valid_transition
+from .cache import JobCache
+from .states import JobState, is_terminal_state, is_valid_transition
+from .sqlite_storage import SQLiteJobStorage
 from .storage import JobStorage
 
 
 class JobManager:
     """Central manager for job lifecycle operations"""
 
-    def __init__(self, storage: Optional[JobStorage] = None):
-        """Initialize job manager with optional custom storage"""
+    def __init__(
+        self,
+        storage: Optional[Union[JobStorage, SQLiteJobStorage]] = None,
+        cache: Optional[JobCache] = None,
+        write_delay: float = 0.5,
+    ):
+        """Initialize job manager with optional custom storage and cache
+
+        Non-terminal state updates are written behind: they are applied to
+        the cache at once and flushed to storage after ``write_delay``
+        seconds, so rapid progress updates of a job cost a single write.
+        Creation, results and terminal states are written immediately.
+        """
         self.storage = storage or JobStorage()
-        self._memory_jobs: Dict[str, Dict[str, Any]] = {}
+        self._memory_jobs = cache if cache is not None else JobCache()
+        self.write_delay = write_delay
+        self._dirty: Dict[str, Dict[str, Any]] = {}
+        self._dirty_cond = threading.Condition()
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = False
+        # Serializes storage writes so a late flush never overwrites newer data
+        self._io_lock = threading.Lock()
 
     def create_job(self, job_request: Dict[str, Any]) -> str:
         """Create a new job and return its ID"""
@@ -38,23 +60,29 @@ class JobManager:
         }
 
         # Store in both memory (for immediate access) and persistent storage
-        self._memory_jobs[job_id] = job_data.copy()
-        self.storage.save_job(job_id, job_data)
+        self._write(job_id, job_data)
 
         return job_id
 
-    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
-        """Get job data by ID, checking memory first then storage"""
+    def get_job(self, job_id: str) -> Optional[Mapping[str, Any]]:
+        """Get a read-only view of job data, checking memory first then storage"""
         # Check memory first for performance
-        if job_id in self._memory_jobs:
-            return self._memory_jobs[job_id].copy()
+        job_data = self._memory_jobs.get(job_id)
+        if job_data is not None:
+            return job_data
+
+        with self._dirty_cond:
+            pending = self._dirty.get(job_id)
+        if pending is not None:
+            self._memory_jobs.put(job_id, pending)
+            return self._memory_jobs.get(job_id)
 
         # Fall back to persistent storage
-        job_data = self.storage.load_job(job_id)
-        if job_data:
+        loaded = self.storage.load_job(job_id)
+        if loaded:
             # Cache in memory for future access
-            self._memory_jobs[job_id] = job_data.copy()
-            return job_data
+            self._memory_jobs.put(job_id, loaded)
+            return self._memory_jobs.get(job_id)
 
         return None
 
@@ -62,41 +90,44 @@ class JobManager:
         self, job_id: str, new_state: JobState, message: str = "", progress: float = 0.0
     ) -> bool:
         """Update job state with validation"""
-        job_data = self.get_job(job_id)
-        if not job_data:
+        current = self.get_job(job_id)
+        if not current:
             return False
 
-        current_state = JobState(job_data["state"])
+        current_state = JobState(current["state"])
 
         # Validate state transition
         if not is_valid_transition(current_state, new_state):
             return False
 
-        # Update job data
+        # Update a shallow copy: cached dicts are shared read-only views
+        job_data = dict(current)
         job_data["state"] = new_state.value
         job_data["message"] = message
         job_data["progress"] = progress
         job_data["updated_at"] = datetime.now(timezone.utc).isoformat()
 
-        # Update both memory and storage
-        self._memory_jobs[job_id] = job_data
-        self.storage.save_job(job_id, job_data)
+        # Update memory now; coalesce storage writes until the job ends
+        if is_terminal_state(new_state):
+            self._write(job_id, job_data)
+        else:
+            self._write_behind(job_id, job_data)
 
         return True
 
     def set_job_result(self, job_id: str, result: Dict[str, Any]) -> bool:
         """Set job result and mark as completed"""
-        job_data = self.get_job(job_id)
-        if not job_data:
+        current = self.get_job(job_id)
+        if not current:
             return False
 
         # Update result
+        job_data = dict(current)
         job_data["result"] = result
         job_data["completed_at"] = datetime.now(timezone.utc).isoformat()
 
         # Update both memory and storage
-        self._memory_jobs[job_id] = job_data
-        self.storage.save_job(job_id, job_data)
+        self._write(job_id, job_data)
 
         return True
 
@@ -111,41 +142,91 @@ class JobManager:
     ) -> List[Dict[str, Any]]:
         """List jobs with optional filtering and limiting"""
         # Get jobs from storage (more complete than memory)
-        jobs = self.storage.list_jobs(state_filter)
+        self.flush()
+        jobs = self.storage.list_jobs(state_filter, limit=limit)
 
         # Convert to list and sort by creation time
         job_list = list(jobs.values())
         job_list.sort(key=lambda x: x.get("created_at", ""), reverse=True)
 
-        if limit:
-            job_list = job_list[:limit]
-
         return job_list
 
     def cleanup_memory_cache(self, max_size: int = 1000) -> None:
-        """Clean up memory cache to prevent unbounded growth"""
-        if len(self._memory_jobs) <= max_size:
+        """Shrink the memory cache to its ``max_size`` most recently used jobs"""
+        self._memory_jobs.trim(max_size)
+
+    def _write(self, job_id: str, job_data: Dict[str, Any]) -> None:
+        """Cache and persist job data immediately"""
+        self._memory_jobs.put(job_id, job_data)
+        with self._io_lock:
+            with self._dirty_cond:
+                self._dirty.pop(job_id, None)
+            self.storage.save_job(job_id, dict(job_data))
+
+    def _write_behind(self, job_id: str, job_data: Dict[str, Any]) -> None:
+        """Cache job data now and persist it on the next flush"""
+        if self.write_delay <= 0 or self._closed:
+            self._write(job_id, job_data)
             return
-
-        # Keep most recently updated jobs
-        jobs_by_update = sorted(
-            self._memory_jobs.items(),
-            key=lambda x: x[1].get("updated_at", ""),
-            reverse=True,
-        )
-
-        # Keep only the most recent max_size jobs
-        self._memory_jobs = dict(jobs_by_update[:max_size])
+        self._memory_jobs.put(job_id, job_data)
+        with self._dirty_cond:
+            first = not self._dirty
+            self._dirty[job_id] = job_data
+            if self._flusher is None:
+                self._flusher = threading.Thread(
+                    target=self._flush_loop, name="job-write-behind", daemon=True
+                )
+                self._flusher.start()
+            if first:
+                self._dirty_cond.notify()
+
+    def _flush_loop(self) -> None:
+        while True:
+            with self._dirty_cond:
+                while not self._dirty and not self._closed:
+                    self._dirty_cond.wait()
+                if self._closed:
+                    return
+                # Let further updates of the same jobs coalesce
+                deadline = time.monotonic() + self.write_delay
+                while not self._closed:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._dirty_cond.wait(remaining)
+            self.flush()
+
+    def flush(self) -> None:
+        """Write pending job updates to storage"""
+        with self._io_lock:
+            with self._dirty_cond:
+                pending, self._dirty = self._dirty, {}
+            if not pending:
+                return
+            save_jobs = getattr(self.storage, "save_jobs", None)
+            if save_jobs is not None:
+                # One transaction for the whole batch
+                save_jobs({job_id: dict(data) for job_id, data in pending.items()})
+                return
+            for job_id, job_data in pending.items():
+                self.storage.save_job(job_id, dict(job_data))
+
+    def close(self) -> None:
+        """Flush pending updates and stop the write-behind thread"""
+        with self._dirty_cond:
+            self._closed = True
+            self._dirty_cond.notify_all()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
 
     def get_job_stats(self) -> Dict[str, int]:
         """Get statistics about job states"""
-        all_jobs = self.storage.list_jobs()
-        stats = {"total": len(all_jobs)}
+        self.flush()
+        counts = self.storage.count_by_state()
+        stats = {"total": sum(counts.values())}
 
         for state in JobState:
-            count = sum(
-                1 for job in all_jobs.values() if job.get("state") == state.value
-            )
-            stats[state.value] = count
+            stats[state.value] = counts.get(state.value, 0)
 
         return stats
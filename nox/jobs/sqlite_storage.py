@@ -0,0 +1,250 @@
+"""
+SQLite Job Storage
+
+Drop-in replacement for ``JobStorage`` backed by a single SQLite database
+in WAL mode. State, user and timestamps are indexed columns, so filtered
+listing and per-state statistics are indexed queries instead of a scan
+over every job file. Job results are stored as zlib-compressed JSON
+blobs; batches of jobs are written in one transaction.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+from .states import JobState
+
+STORAGE_VERSION = "sqlite-1"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    state TEXT,
+    user TEXT,
+    created_at TEXT,
+    updated_ts REAL NOT NULL,
+    data TEXT NOT NULL,
+    result BLOB
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created_at);
+CREATE INDEX IF NOT EXISTS jobs_user ON jobs (user, created_at);
+CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created_at);
+CREATE INDEX IF NOT EXISTS jobs_updated ON jobs (updated_ts);
+"""
+
+
+def _pack(value: Any) -> Optional[bytes]:
+    if value is None:
+        return None
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode(), 6)
+
+
+def _unpack(blob: Optional[bytes]) -> Any:
+    if blob is None:
+        return None
+    return json.loads(zlib.decompress(blob))
+
+
+class SQLiteJobStorage:
+    """Manages persistent storage for job data and results in SQLite"""
+
+    def __init__(self, base_path: str = "./data/jobs", filename: str = "jobs.db"):
+        """Initialize job storage with a database under ``base_path``"""
+        self.base_path = Path(base_path)
+        self.base_path.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.base_path / filename
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        """Per-thread connection; WAL lets readers run alongside one writer"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._conn()
+        if self._local.depth:
+            # Nested in batch(): the outer transaction commits
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+        finally:
+            self._local.depth = 0
+
+    @contextmanager
+    def batch(self) -> Iterator["SQLiteJobStorage"]:
+        """Group the writes made inside the block into one transaction"""
+        with self._transaction():
+            yield self
+
+    def close(self) -> None:
+        """Close this thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def save_job(self, job_id: str, job_data: Dict[str, Any]) -> None:
+        """Save job data to persistent storage"""
+        self.save_jobs({job_id: job_data})
+
+    def save_jobs(self, jobs: Dict[str, Dict[str, Any]]) -> None:
+        """Save many jobs in a single transaction"""
+        now = time.time()
+        last_updated = datetime.now(timezone.utc).isoformat()
+        rows = []
+        for job_id, job_data in jobs.items():
+            # Add timestamp metadata
+            job_data["_metadata"] = {
+                "last_updated": last_updated,
+                "storage_version": STORAGE_VERSION,
+            }
+            result = job_data.get("result")
+            data = job_data
+            if result is not None:
+                data = {k: v for k, v in job_data.items() if k != "result"}
+            request = job_data.get("request")
+            user = job_data.get("user")
+            if user is None and isinstance(request, dict):
+                user = request.get("user")
+            rows.append(
+                (
+                    job_id,
+                    job_data.get("state"),
+                    user,
+                    job_data.get("created_at"),
+                    now,
+                    json.dumps(data),
+                    _pack(result),
+                )
+            )
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO jobs"
+                " (job_id, state, user, created_at, updated_ts, data, result)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    @staticmethod
+    def _row_to_job(data: str, result: Optional[bytes]) -> Dict[str, Any]:
+        job_data = json.loads(data)
+        if result is not None:
+            job_data["result"] = _unpack(result)
+        return job_data
+
+    def load_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Load job data from persistent storage"""
+        row = (
+            self._conn()
+            .execute("SELECT data, result FROM jobs WHERE job_id = ?", (job_id,))
+            .fetchone()
+        )
+        if row is None:
+            return None
+        try:
+            return self._row_to_job(*row)
+        except (json.JSONDecodeError, zlib.error):
+            return None
+
+    def update_job_state(
+        self, job_id: str, new_state: JobState, message: str = "", progress: float = 0.0
+    ) -> bool:
+        """Update job state and related metadata in a single statement"""
+        now = datetime.now(timezone.utc).isoformat()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET state = ?, updated_ts = ?, data = json_set(data,"
+                " '$.state', ?, '$.message', ?, '$.progress', ?, '$.updated_at', ?)"
+                " WHERE job_id = ?",
+                (
+                    new_state.value,
+                    time.time(),
+                    new_state.value,
+                    message,
+                    progress,
+                    now,
+                    job_id,
+                ),
+            )
+        return cursor.rowcount > 0
+
+    def set_job_result(self, job_id: str, result: Dict[str, Any]) -> bool:
+        """Set the result data for a completed job"""
+        now = datetime.now(timezone.utc).isoformat()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET result = ?, updated_ts = ?,"
+                " data = json_set(data, '$.completed_at', ?) WHERE job_id = ?",
+                (_pack(result), time.time(), now, job_id),
+            )
+        return cursor.rowcount > 0
+
+    def list_jobs(
+        self,
+        state_filter: Optional[JobState] = None,
+        limit: Optional[int] = None,
+        user: Optional[str] = None,
+    ) -> Dict[str, Dict]:
+        """List jobs newest first, optionally filtered by state and user"""
+        query = "SELECT job_id, data, result FROM jobs"
+        clauses, params = [], []
+        if state_filter is not None:
+            clauses.append("state = ?")
+            params.append(state_filter.value)
+        if user is not None:
+            clauses.append("user = ?")
+            params.append(user)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY created_at DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+
+        jobs = {}
+        for job_id, data, result in self._conn().execute(query, params):
+            try:
+                jobs[job_id] = self._row_to_job(data, result)
+            except (json.JSONDecodeError, zlib.error):
+                continue
+        return jobs
+
+    def count_by_state(self) -> Dict[str, int]:
+        """Number of jobs per state"""
+        rows = self._conn().execute("SELECT state, COUNT(*) FROM jobs GROUP BY state")
+        return {state: count for state, count in rows}
+
+    def cleanup_old_jobs(self, max_age_days: int = 30) -> int:
+        """Remove jobs not updated within the specified age"""
+        cutoff = time.time() - (max_age_days * 86400)
+        with self._transaction() as conn:
+            cursor = conn.execute("DELETE FROM jobs WHERE updated_ts < ?", (cutoff,))
+        return cursor.rowcount
+
+    def delete_job(self, job_id: str) -> bool:
+        """Delete a specific job from storage"""
+        with self._transaction() as conn:
+            cursor = conn.execute("DELETE FROM jobs WHERE job_id = ?", (job_id,))
+        return cursor.rowcount > 0
@@ -16,14 +16,23 @@ class JobState(str, Enum):
     RUNNING = "running"
     COMPLETED = "completed"
     FAILED = "failed"
+    CANCELLED = "cancelled"
+    TIMEOUT = "timeout"
 
 
 # Valid state transitions
 VALID_TRANSITIONS = {
-    JobState.PENDING: {JobState.RUNNING, JobState.FAILED},
-    JobState.RUNNING: {JobState.COMPLETED, JobState.FAILED},
+    JobState.PENDING: {JobState.RUNNING, JobState.FAILED, JobState.CANCELLED},
+    JobState.RUNNING: {
+        JobState.COMPLETED,
+        JobState.FAILED,
+        JobState.CANCELLED,
+        JobState.TIMEOUT,
+    },
     JobState.COMPLETED: set(),  # Terminal state
     JobState.FAILED: set(),  # Terminal state
+    JobState.CANCELLED: set(),  # Terminal state
+    JobState.TIMEOUT: set(),  # Terminal state
 }
 
 
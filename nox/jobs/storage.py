@@ -79,8 +79,10 @@ class JobStorage:
         self.save_job(job_id, job_data)
         return True
 
-    def list_jobs(self, state_filter: Optional[JobState] = None) -> Dict[str, Dict]:
-        """List all jobs, optionally filtered by state"""
+    def list_jobs(
+        self, state_filter: Optional[JobState] = None, limit: Optional[int] = None
+    ) -> Dict[str, Dict]:
+        """List jobs newest first, optionally filtered by state and limited"""
         jobs = {}
 
         for job_file in self.base_path.glob("*.json"):
@@ -94,7 +96,18 @@ class JobStorage:
             if state_filter is None or job_state == state_filter.value:
                 jobs[job_id] = job_data
 
-        return jobs
+        ordered = sorted(
+            jobs.items(), key=lambda x: x[1].get("created_at", ""), reverse=True
+        )
+        return dict(ordered[:limit] if limit else ordered)
+
+    def count_by_state(self) -> Dict[str, int]:
+        """Number of jobs per state"""
+        counts: Dict[str, int] = {}
+        for job_data in self.list_jobs().values():
+            state = job_data.get("state")
+            counts[state] = counts.get(state, 0) + 1
+        return counts
 
     def cleanup_old_jobs(self, max_age_days: int = 30) -> int:
         """Remove jobs older than specified age"""
@@ -0,0 +1,237 @@
+"""
+Structured, single-pass parser for xtb output.
+
+Extends the incremental progress parser: the same line stream that drives
+progress events also collects the optimization trajectory, orbital
+energies and occupations, Mulliken charges, Wiberg bond orders and the
+dipole. ``xtb.log``/``xtb.out`` and ``xtbopt.log`` can all be fed to one
+parser, chunk by chunk while xtb runs; ``xtbout.json`` is merged with
+``feed_json``. Results are returned as NumPy arrays or as
+``ResultBundle``-style series (lists of rows).
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .xtb_progress import XTBProgressParser
+
+_NUMBER = r"-?\d+\.\d+(?:[eE][-+]?\d+)?"
+_SUMMARY_ENERGY = re.compile(rf"TOTAL\s+ENERGY\s+({_NUMBER})", re.IGNORECASE)
+_SUMMARY_GAP = re.compile(rf"HOMO[-\s]?LUMO\s+GAP\s+({_NUMBER})", re.IGNORECASE)
+_HL_GAP = re.compile(rf"HL-Gap\s+{_NUMBER}\s+Eh\s+({_NUMBER})\s+eV")
+_LEGACY_DIPOLE = re.compile(rf"dipole\s+moment.*total[:\s]+({_NUMBER})", re.IGNORECASE)
+_TRAJECTORY = re.compile(rf"energy:\s*({_NUMBER})\s+gnorm:\s*({_NUMBER})")
+_CHARGES_GFN2 = re.compile(r"#\s+Z\s+covCN\s+q\b")
+_FLOAT = re.compile(rf"^{_NUMBER}$")
+
+
+def _is_float(token: str) -> bool:
+    return bool(_FLOAT.match(token))
+
+
+class XTBOutputParser(XTBProgressParser):
+    """Collects structured xtb results while emitting progress events.
+
+    Sections that can appear several times (e.g. orbitals printed after
+    each SCF) keep the last occurrence, i.e. the final geometry.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._section: Optional[str] = None
+        self._rows: Dict[str, List[List[float]]] = {
+            "opt_cycles": [],
+            "opt_trajectory": [],
+            "orbitals": [],
+            "mulliken_charges": [],
+            "wiberg_bond_orders": [],
+            "dipole_au": [],
+        }
+        self._text_scalars: Dict[str, float] = {}
+        self._json_scalars: Dict[str, float] = {}
+
+    # -- text ---------------------------------------------------------------
+
+    def _parse_line(self, line: str) -> Optional[Dict[str, Any]]:
+        self._parse_sections(line)
+        event = super()._parse_line(line)
+        if event is not None and event["type"] == "cycle":
+            self._rows["opt_cycles"].append(
+                [event["cycle"], event["energy"], event["gradient_norm"]]
+            )
+        return event
+
+    def _parse_sections(self, line: str) -> None:
+        stripped = line.strip()
+        parts = stripped.split()
+
+        # Section starts reset the section's rows
+        if "Orbital Energies and Occupations" in line:
+            self._start("orbitals")
+            return
+        if _CHARGES_GFN2.search(line) or stripped.startswith("Mulliken/CM5 charges"):
+            self._start("mulliken_charges")
+            return
+        if "Wiberg/Mayer (AO) data" in line:
+            self._start("wiberg_bond_orders")
+            return
+        if stripped.startswith("molecular dipole"):
+            self._section = "dipole_au"
+            return
+
+        m = _TRAJECTORY.search(line)
+        if m:
+            frame = len(self._rows["opt_trajectory"]) + 1
+            self._rows["opt_trajectory"].append(
+                [frame, float(m.group(1)), float(m.group(2))]
+            )
+            return
+        m = _SUMMARY_ENERGY.search(line)
+        if m:
+            self._text_scalars["E_total_hartree"] = float(m.group(1))
+            return
+        m = _SUMMARY_GAP.search(line)
+        if m:
+            self._text_scalars["gap_eV"] = float(m.group(1))
+            return
+        m = _LEGACY_DIPOLE.search(line)
+        if m:
+            self._text_scalars["dipole_D"] = float(m.group(1))
+            return
+
+        section = self._section
+        if section == "orbitals":
+            self._orbital_row(stripped, parts)
+        elif section == "mulliken_charges":
+            self._charge_row(parts)
+        elif section == "wiberg_bond_orders":
+            self._wiberg_row(stripped, parts)
+        elif section == "dipole_au" and parts[:1] == ["full:"]:
+            values = [float(p) for p in parts[1:] if _is_float(p)]
+            if len(values) >= 3:
+                self._rows["dipole_au"] = [values[:3]]
+            if len(values) >= 4:
+                self._text_scalars["dipole_D"] = values[3]
+            self._section = None
+
+    def _start(self, section: str) -> None:
+        self._section = section
+        self._rows[section] = []
+
+    def _orbital_row(self, stripped: str, parts: List[str]) -> None:
+        m = _HL_GAP.search(stripped)
+        if m:
+            self._text_scalars["gap_eV"] = float(m.group(1))
+            self._section = None
+            return
+        if not parts or not parts[0].isdigit():
+            return
+        numbers = [float(p) for p in parts[1:4] if _is_float(p)]
+        if len(numbers) == 3:
+            occupation, _, energy_ev = numbers
+        elif len(numbers) == 2:  # virtual orbitals print no occupation
+            occupation, energy_ev = 0.0, numbers[1]
+        else:
+            return
+        self._rows["orbitals"].append([int(parts[0]), occupation, energy_ev])
+
+    def _charge_row(self, parts: List[str]) -> None:
+        if len(parts) >= 5 and parts[0].isdigit() and parts[1].isdigit():
+            # GFN2: "#  Z sym covCN q ..."
+            self._rows["mulliken_charges"].append([int(parts[0]), float(parts[4])])
+        elif len(parts) >= 2 and re.match(r"^\d+[A-Za-z]+$", parts[0]):
+            # GFN1: "1O  mulliken cm5 ..."
+            atom = int(re.match(r"\d+", parts[0]).group())
+            self._rows["mulliken_charges"].append([atom, float(parts[1])])
+        elif not parts and self._rows["mulliken_charges"]:
+            self._section = None
+
+    def _wiberg_row(self, stripped: str, parts: List[str]) -> None:
+        rows = self._rows["wiberg_bond_orders"]
+        if not parts:
+            if rows:
+                self._section = None
+            return
+        if not parts[0].isdigit():
+            return
+        atom = int(parts[0])
+        if "--" in parts:
+            # "i Z sym total -- j sym wbo j sym wbo ..."
+            rest = parts[parts.index("--") + 1 :]
+            bonds = [(rest[k], rest[k + 2]) for k in range(0, len(rest) - 2, 3)]
+        else:
+            # older layout: "i sym total sym j wbo sym j wbo ..."
+            rest = parts[3:]
+            bonds = [(rest[k + 1], rest[k + 2]) for k in range(0, len(rest) - 2, 3)]
+        for partner, order in bonds:
+            if partner.isdigit() and _is_float(order) and int(partner) > atom:
+                rows.append([atom, int(partner), float(order)])
+
+    # -- json ---------------------------------------------------------------
+
+    def feed_json(self, data: Dict[str, Any]) -> None:
+        """Merge ``xtbout.json`` content; its scalars take precedence."""
+        scalars = self._json_scalars
+        for key, path in (
+            ("E_total_hartree", ("total energy",)),
+            ("E_total_hartree", ("energy", "total")),
+            ("E_total_hartree", ("results", "total_energy")),
+            ("E_total_hartree", ("scf", "etot")),
+            ("E_total_hartree", ("etot",)),
+            ("E_total_hartree", ("energy",)),
+            ("gap_eV", ("HOMO-LUMO gap / eV",)),
+            ("gap_eV", ("gap",)),
+            ("gap_eV", ("results", "gap")),
+            ("gap_eV", ("orbitals", "gap")),
+            ("gap_eV", ("homo_lumo_gap_ev",)),
+            ("dipole_D", ("dipole", "total")),
+            ("dipole_D", ("properties", "dipole", "total")),
+            ("dipole_D", ("dipole_debye",)),
+        ):
+            if key in scalars:
+                continue
+            node: Any = data
+            for k in path:
+                node = node.get(k) if isinstance(node, dict) else None
+            if isinstance(node, (int, float, str)) and not isinstance(node, bool):
+                try:
+                    scalars[key] = float(node)
+                except ValueError:
+                    continue
+
+        rows = self._rows
+        dipole = data.get("dipole / a.u.")
+        if not rows["dipole_au"] and isinstance(dipole, list) and len(dipole) == 3:
+            rows["dipole_au"] = [[float(x) for x in dipole]]
+        charges = data.get("partial charges")
+        if not rows["mulliken_charges"] and isinstance(charges, list):
+            rows["mulliken_charges"] = [
+                [i + 1, float(q)] for i, q in enumerate(charges)
+            ]
+        energies = data.get("orbital energies / eV")
+        occupations = data.get("fractional occupation")
+        if not rows["orbitals"] and isinstance(energies, list):
+            if not isinstance(occupations, list) or len(occupations) != len(energies):
+                occupations = [0.0] * len(energies)
+            rows["orbitals"] = [
+                [i + 1, float(o), float(e)]
+                for i, (o, e) in enumerate(zip(occupations, energies))
+            ]
+
+    # -- results ------------------------------------------------------------
+
+    def scalars(self) -> Dict[str, float]:
+        return {**self._text_scalars, **self._json_scalars}
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        """Non-empty series as 2D float arrays (one row per entry)."""
+        return {
+            name: np.asarray(rows, dtype=float)
+            for name, rows in self._rows.items()
+            if rows
+        }
+
+    def series(self) -> Dict[str, List[List[float]]]:
+        return {name: array.tolist() for name, array in self.arrays().items()}
@@ -0,0 +1,86 @@
+"""
+Incremental parser for xtb log output.
+
+Text can be fed in arbitrary chunks while xtb is still writing its log;
+complete lines are parsed and turned into structured progress events.
+"""
+
+import re
+from typing import Any, Dict, List, Optional
+
+_MAX_CYCLES = re.compile(r"max\.\s+optcycles\s+(\d+)")
+_CYCLE = re.compile(r"\bCYCLE\s+(\d+)\b")
+_TOTAL_ENERGY = re.compile(r"\*\s+total energy\s*:\s*(-?\d+\.\d+)\s*Eh")
+_GRADIENT_NORM = re.compile(r"gradient norm\s*:\s*(-?\d+\.\d+)")
+_CONVERGED = "GEOMETRY OPTIMIZATION CONVERGED"
+_FAILED = "FAILED TO CONVERGE GEOMETRY OPTIMIZATION"
+_FINISHED = "normal termination of xtb"
+
+DEFAULT_MAX_CYCLES = 200
+
+
+class XTBProgressParser:
+    """Turns xtb log text into progress events.
+
+    Events are dicts with a ``type`` key: ``cycle`` (optimization cycle with
+    its energy and gradient norm), ``converged``, ``not_converged`` and
+    ``finished``. ``progress`` tracks the estimated completion in [0, 1].
+    """
+
+    def __init__(self) -> None:
+        self._buffer = ""
+        self.max_cycles = DEFAULT_MAX_CYCLES
+        self.cycle = 0
+        self.energy: Optional[float] = None
+        self.gradient_norm: Optional[float] = None
+        self.progress = 0.0
+        self.finished = False
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """Parse the complete lines in ``text`` and return new events."""
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split("\n")
+        events: List[Dict[str, Any]] = []
+        for line in lines:
+            event = self._parse_line(line)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def close(self) -> List[Dict[str, Any]]:
+        """Parse any trailing partial line once the log is complete."""
+        return self.feed("\n") if self._buffer else []
+
+    def _parse_line(self, line: str) -> Optional[Dict[str, Any]]:
+        m = _MAX_CYCLES.search(line)
+        if m:
+            self.max_cycles = max(1, int(m.group(1)))
+            return None
+        m = _CYCLE.search(line)
+        if m:
+            self.cycle = int(m.group(1))
+            return None
+        m = _TOTAL_ENERGY.search(line)
+        if m and self.cycle:
+            self.energy = float(m.group(1))
+            return None
+        m = _GRADIENT_NORM.search(line)
+        if m and self.cycle and self.energy is not None:
+            self.gradient_norm = float(m.group(1))
+            self.progress = max(self.progress, min(0.99, self.cycle / self.max_cycles))
+            return {
+                "type": "cycle",
+                "cycle": self.cycle,
+                "energy": self.energy,
+                "gradient_norm": self.gradient_norm,
+                "progress": self.progress,
+            }
+        if _CONVERGED in line:
+            return {"type": "converged", "cycle": self.cycle, "energy": self.energy}
+        if _FAILED in line:
+            return {"type": "not_converged", "cycle": self.cycle}
+        if _FINISHED in line:
+            self.finished = True
+            self.progress = 1.0
+            return {"type": "finished", "progress": 1.0}
+        return None
@@ -0,0 +1,121 @@
+"""
+Tests for the NumPy cube file reader/writer.
+"""
+
+import numpy as np
+import pytest
+
+from nox.artifacts.cubes import (
+    CubeFile,
+    compact_cube_file,
+    cube_text_chunks,
+    validate_cube_file,
+)
+
+
+def _sample_cube(tmp_path, shape=(4, 5, 7)):
+    data = np.random.default_rng(0).normal(size=shape)
+    cube = CubeFile.from_array(
+        data,
+        origin=(-1.0, -2.0, -3.0),
+        atoms=[[8, 8.0, 0.0, 0.0, 0.0], [1, 1.0, 1.8, 0.0, 0.0]],
+        comments=("water", "density"),
+    )
+    return cube.write(tmp_path / "sample.cube"), data
+
+
+class TestCubeFile:
+    def test_round_trip(self, tmp_path):
+        path, data = _sample_cube(tmp_path)
+
+        cube = CubeFile(path)
+        assert cube.shape == data.shape
+        assert cube.header["natoms"] == 2
+        assert cube.header["comments"] == ["water", "density"]
+        np.testing.assert_allclose(cube.header["origin"], [-1.0, -2.0, -3.0])
+        # Written with 5 significant decimals in scientific notation
+        np.testing.assert_allclose(cube.data, data, rtol=1e-5)
+
+    def test_rows_wrap_every_six_values(self, tmp_path):
+        path, _ = _sample_cube(tmp_path)
+        voxel_lines = path.read_text().splitlines()[8:]
+        assert [len(line.split()) for line in voxel_lines[:2]] == [6, 1]
+
+    def test_slice(self, tmp_path):
+        path, data = _sample_cube(tmp_path)
+        cube = CubeFile(path)
+        assert cube.slice(2, 3).shape == (4, 5)
+        np.testing.assert_allclose(cube.slice(0, 1), data[1], rtol=1e-5)
+
+    def test_sidecar_is_memory_mapped(self, tmp_path):
+        path, data = _sample_cube(tmp_path)
+        CubeFile(path).write_sidecar()
+
+        cube = CubeFile(path)
+        assert isinstance(cube.data, np.memmap)
+        np.testing.assert_allclose(cube.data, data, rtol=1e-5)
+
+    def test_orbital_cube_header(self, tmp_path):
+        path = tmp_path / "mo.cube"
+        path.write_text(
+            "MO cube\n\n"
+            "   -1    0.0 0.0 0.0\n"
+            "    2    0.5 0.0 0.0\n"
+            "    2    0.0 0.5 0.0\n"
+            "    2    0.0 0.0 0.5\n"
+            "    1    1.0 0.0 0.0 0.0\n"
+            "    1    5\n"
+            "1 2 3 4 5 6\n7 8\n"
+        )
+        cube = CubeFile(path)
+        assert cube.header["mo_indices"] == [5]
+        assert cube.data[1, 1, 1] == 8.0
+
+    def test_truncated_data_raises(self, tmp_path):
+        path, _ = _sample_cube(tmp_path)
+        text = path.read_text()
+        path.write_text(text[: len(text) // 2])
+        with pytest.raises(ValueError):
+            CubeFile(path).data
+
+    def test_validate_reads_header_only(self, tmp_path):
+        path, _ = _sample_cube(tmp_path)
+        info = validate_cube_file(path)
+        assert info["valid"]
+        assert info["grid_points"] == [4, 5, 7]
+        assert info["grid_vectors"][0] == [0.2, 0.0, 0.0]
+
+    def test_validate_invalid_file(self, tmp_path):
+        path = tmp_path / "bad.cube"
+        path.write_text("too\nshort\n")
+        info = validate_cube_file(path)
+        assert info["valid"] is False
+        assert "error" in info
+
+
+class TestCompactCube:
+    def test_compact_round_trip(self, tmp_path):
+        path, data = _sample_cube(tmp_path)
+        text_size = path.stat().st_size
+
+        compact = compact_cube_file(path)
+        assert compact.name == "sample.cube.npz"
+        assert not path.exists()
+        assert compact.stat().st_size < text_size
+
+        cube = CubeFile.from_compact(compact)
+        assert cube.data.dtype == np.float32
+        assert cube.header["comments"] == ["water", "density"]
+        np.testing.assert_allclose(cube.data, data, rtol=1e-5)
+
+    def test_stream_text_cube(self, tmp_path):
+        path, data = _sample_cube(tmp_path)
+        compact = compact_cube_file(path)
+
+        text = b"".join(cube_text_chunks(compact))
+        # Nothing is written beside the compact file
+        assert not path.exists()
+        out = tmp_path / "streamed.cube"
+        out.write_bytes(text)
+        assert validate_cube_file(out)["grid_points"] == [4, 5, 7]
+        np.testing.assert_allclose(CubeFile(out).data, data, rtol=1e-4)
@@ -0,0 +1,55 @@
+"""
+Tests for grid downsampling and isosurface extraction.
+"""
+
+import numpy as np
+
+from nox.artifacts.isosurface import downsample, marching_tetrahedra
+
+
+def _sphere(n=40, radius=8.0):
+    g = np.arange(n) - n / 2 + 0.25
+    x, y, z = np.meshgrid(g, g, g, indexing="ij")
+    return radius - np.sqrt(x * x + y * y + z * z), -(n / 2 - 0.25)
+
+
+class TestIsosurface:
+    def test_sphere_mesh_is_closed_and_outward(self):
+        data, start = _sphere()
+        origin = np.full(3, start)
+        vertices, faces = marching_tetrahedra(data, 0.0, origin, np.eye(3))
+
+        assert vertices.dtype == np.float32 and faces.dtype == np.uint32
+        radii = np.linalg.norm(vertices, axis=1)
+        assert np.allclose(radii, 8.0, atol=0.1)
+
+        # Every edge is shared by exactly two faces
+        edges = np.sort(
+            np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]]),
+            axis=1,
+        )
+        _, counts = np.unique(edges, axis=0, return_counts=True)
+        assert set(counts.tolist()) == {2}
+
+        tri = vertices[faces]
+        normals = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+        assert ((normals * tri.mean(axis=1)).sum(axis=1) > 0).all()
+
+    def test_no_crossing_gives_empty_mesh(self):
+        vertices, faces = marching_tetrahedra(
+            np.zeros((4, 4, 4)), 1.0, np.zeros(3), np.eye(3)
+        )
+        assert vertices.shape == (0, 3) and faces.shape == (0, 3)
+
+    def test_downsample_block_average(self):
+        data = np.arange(4 * 4 * 4, dtype=float).reshape(4, 4, 4)
+        reduced, origin, axes = downsample(data, np.zeros(3), np.eye(3) * 0.5, 2)
+        assert reduced.shape == (2, 2, 2)
+        assert reduced[0, 0, 0] == data[:2, :2, :2].mean()
+        np.testing.assert_allclose(origin, [0.25, 0.25, 0.25])
+        np.testing.assert_allclose(axes, np.eye(3))
+
+    def test_downsample_pads_uneven_shapes(self):
+        reduced, _, _ = downsample(np.ones((5, 3, 7)), np.zeros(3), np.eye(3), 3)
+        assert reduced.shape == (2, 1, 3)
+        assert np.all(reduced == 1.0)
@@ -0,0 +1,110 @@
+"""
+Tests for the bounded job cache and write-behind updates of JobManager
+"""
+
+import shutil
+import tempfile
+import time
+
+import pytest
+
+from nox.jobs import JobCache, JobManager, JobState, JobStorage
+
+
+class CountingStorage(JobStorage):
+    def __init__(self, base_path):
+        super().__init__(base_path)
+        self.writes = 0
+
+    def save_job(self, job_id, job_data):
+        self.writes += 1
+        super().save_job(job_id, job_data)
+
+
+@pytest.fixture
+def temp_dir():
+    path = tempfile.mkdtemp()
+    yield path
+    shutil.rmtree(path)
+
+
+def test_lru_eviction_by_count():
+    cache = JobCache(max_items=2)
+    cache.put("a", {"state": "pending"})
+    cache.put("b", {"state": "pending"})
+    cache.get("a")
+    cache.put("c", {"state": "pending"})
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+
+
+def test_byte_budget():
+    cache = JobCache(max_bytes=1000)
+    for i in range(10):
+        cache.put(f"job{i}", {"state": "completed", "result": {"x": "y" * 200}})
+    assert len(cache) < 10
+    assert cache.nbytes <= 1000
+    assert "job9" in cache
+
+
+def test_terminal_ttl():
+    cache = JobCache(terminal_ttl=0.05)
+    cache.put("done", {"state": "completed"})
+    cache.put("running", {"state": "running"})
+    time.sleep(0.1)
+    assert cache.get("done") is None
+    assert cache.get("running") is not None
+
+
+def test_views_are_read_only():
+    cache = JobCache()
+    cache.put("a", {"state": "pending"})
+    with pytest.raises(TypeError):
+        cache.get("a")["state"] = "running"
+
+
+def test_write_behind_coalesces_updates(temp_dir):
+    storage = CountingStorage(temp_dir)
+    manager = JobManager(storage, write_delay=30)
+    job_id = manager.create_job({"name": "screen"})
+    assert storage.writes == 1
+
+    manager.update_job_state(job_id, JobState.RUNNING, "Step 0", 0.0)
+    for i in range(1, 50):
+        manager._write_behind(job_id, {**manager.get_job(job_id), "progress": i / 50})
+    assert manager.get_job(job_id)["progress"] == pytest.approx(49 / 50)
+    assert storage.writes == 1
+    assert storage.load_job(job_id)["state"] == "pending"
+
+    manager.flush()
+    assert storage.writes == 2
+    assert storage.load_job(job_id)["progress"] == pytest.approx(49 / 50)
+
+    # Terminal states are written through
+    manager.update_job_state(job_id, JobState.COMPLETED, "Done", 1.0)
+    assert storage.writes == 3
+    manager.close()
+    assert storage.writes == 3
+
+
+def test_flush_thread(temp_dir):
+    storage = CountingStorage(temp_dir)
+    manager = JobManager(storage, write_delay=0.05)
+    job_id = manager.create_job({})
+    manager.update_job_state(job_id, JobState.RUNNING, "Processing", 0.5)
+    deadline = time.time() + 5
+    while storage.load_job(job_id)["state"] != "running" and time.time() < deadline:
+        time.sleep(0.02)
+    assert storage.load_job(job_id)["progress"] == 0.5
+    manager.close()
+
+
+def test_evicted_pending_update_is_not_lost(temp_dir):
+    storage = JobStorage(temp_dir)
+    manager = JobManager(storage, cache=JobCache(max_items=1), write_delay=30)
+    job_a = manager.create_job({})
+    manager.update_job_state(job_a, JobState.RUNNING)
+    manager.create_job({})
+    assert manager.get_job(job_a)["state"] == "running"
+    manager.close()
+    assert storage.load_job(job_a)["state"] == "running"
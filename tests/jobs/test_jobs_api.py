@@ -6,6 +6,17 @@ from httpx import AsyncClient
 from httpx import ASGITransport
 
 from api.routes.jobs import router as jobs_router
+from api.services import cube_views, lazy_cubes, result_cache
+from api.services.settings import settings
+
+
+@pytest.fixture(autouse=True)
+def artifacts(monkeypatch, tmp_path):
+    # Job directories and the disk caches stay out of the real artifacts
+    monkeypatch.setattr(settings, "artifacts_root", tmp_path)
+    for module in (cube_views, lazy_cubes, result_cache):
+        monkeypatch.setattr(module, "_cache_singleton", None)
+    return tmp_path
 
 
 @pytest.mark.asyncio
@@ -46,3 +57,475 @@ async def test_jobs_store_redis_via_fakeredis(monkeypatch):
     store.set_state(j.id, "done", result={"ok": True})
     got2 = store.get(j.id)
     assert got2.state == "done" and got2.result == {"ok": True}
+
+
+@pytest.mark.parametrize("cls", ["RedisJobsStore", "AtomicRedisJobsStore"])
+def test_redis_store_validates_transitions(cls):
+    from api.services import jobs_store as js
+    import fakeredis
+
+    store = getattr(js, cls)(fakeredis.FakeRedis())
+    j = store.create()
+    assert store.get(j.id).state == "queued"
+
+    running = store.set_state(j.id, "running")
+    assert running is not None and running.state == "running"
+    done = store.set_state(j.id, "done", result={"ok": True})
+    assert done.state == "done" and done.result == {"ok": True}
+
+    # Terminal state: a late update from another process is rejected
+    assert store.set_state(j.id, "failed", error="late") is None
+    got = store.get(j.id)
+    assert got.state == "done" and got.error is None
+    assert got.updated_at >= got.created_at
+    done_ids = store.r.zrange(store._state_index("done"), 0, -1)
+    assert done_ids == [j.id.encode()]
+    assert not store.r.zrange(store._state_index("running"), 0, -1)
+
+    assert store.set_state("missing", "running") is None
+
+
+def test_atomic_redis_store_list_jobs_uses_indexes():
+    from api.services import jobs_store as js
+    import fakeredis
+
+    store = js.AtomicRedisJobsStore(fakeredis.FakeRedis())
+    ids = [store.create(user="alice" if i % 2 else "bob").id for i in range(5)]
+    store.set_state(ids[0], "running")
+    store.set_state(ids[0], "done", result={"ok": True})
+
+    page, cursor = store.list_jobs(limit=2)
+    assert [j.id for j in page] == [ids[4], ids[3]]
+    assert cursor == 2
+    page, cursor = store.list_jobs(cursor=cursor, limit=10)
+    assert [j.id for j in page] == [ids[2], ids[1], ids[0]]
+    assert cursor is None
+
+    done, _ = store.list_jobs(state="done")
+    assert [j.id for j in done] == [ids[0]]
+    queued, _ = store.list_jobs(state="queued")
+    assert ids[0] not in {j.id for j in queued}
+    alice, _ = store.list_jobs(user="alice")
+    assert {j.id for j in alice} == {ids[1], ids[3]}
+
+
+def test_redis_job_storage_indexes_and_cleanup():
+    from api.services.redis_jobs import RedisJobStorage
+    import fakeredis
+
+    storage = RedisJobStorage.__new__(RedisJobStorage)
+    storage.redis_client = fakeredis.FakeRedis(decode_responses=True)
+
+    old = storage.create_job({"n": 1}, user="alice")
+    new = storage.create_job({"n": 2})
+    storage.set_job_result(old, {"ok": True})
+
+    assert list(storage.list_jobs(state="completed")) == [old]
+    assert list(storage.list_jobs(state="pending")) == [new]
+    assert list(storage.list_jobs(user="alice")) == [old]
+    assert list(storage.list_jobs()) == [new, old]
+
+    assert storage.cleanup_old_jobs(max_age_hours=1) == 0
+    assert storage.cleanup_old_jobs(max_age_hours=-1) == 1
+    assert storage.get_job(old) is None
+    assert list(storage.list_jobs()) == [new]
+
+    # Expired job keys are dropped from the user index they were listed by
+    gone = storage.create_job({"n": 3}, user="bob")
+    storage.redis_client.delete(storage._job_key(gone))
+    assert storage.list_jobs(user="bob") == {}
+    assert storage.redis_client.zcard(storage._user_index("bob")) == 0
+
+
+@pytest.mark.asyncio
+async def test_jobs_listing_endpoint_local_mode(monkeypatch):
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    monkeypatch.setenv("JOBS_FORCE_LOCAL", "1")
+    app = FastAPI()
+    app.include_router(jobs_router)
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        user = "lister-" + str(time.time())
+        for i in range(3):
+            r = await client.post(
+                "/jobs", json={"kind": "echo", "payload": {"i": i}, "user": user}
+            )
+            assert r.status_code == 200
+        r = await client.get("/jobs", params={"user": user, "limit": 2})
+        assert r.status_code == 200
+        body = r.json()
+        assert len(body["jobs"]) == 2
+        assert body["next_cursor"] == 2
+        r = await client.get(
+            "/jobs", params={"user": user, "cursor": body["next_cursor"]}
+        )
+        assert len(r.json()["jobs"]) == 1
+        assert r.json()["next_cursor"] is None
+
+
+def test_atomic_redis_store_create_many():
+    from api.services import jobs_store as js
+    import fakeredis
+
+    store = js.AtomicRedisJobsStore(fakeredis.FakeRedis())
+    jobs = store.create_many(["alice", None, "alice"])
+    assert len({j.id for j in jobs}) == 3
+    assert all(store.get(j.id).state == "queued" for j in jobs)
+    alice, _ = store.list_jobs(user="alice")
+    assert {j.id for j in alice} == {jobs[0].id, jobs[2].id}
+
+
+def test_redis_store_child_tracking():
+    from api.services import jobs_store as js
+    import fakeredis
+
+    store = js.AtomicRedisJobsStore(fakeredis.FakeRedis())
+    assert store.add_child("parent", 0, "a") == 1
+    assert store.add_child("parent", 1, "b") == 2
+    # Re-delivered child messages are not counted twice
+    assert store.add_child("parent", 1, "b") == 2
+    assert store.children("parent") == {0: "a", 1: "b"}
+
+
+@pytest.mark.asyncio
+async def test_jobs_batch_endpoint_array_and_ndjson(monkeypatch):
+    import json as _json
+    from api.services import queue
+
+    monkeypatch.setenv("JOBS_FORCE_LOCAL", "1")
+    monkeypatch.setattr(
+        queue,
+        "_xtb_runner",
+        lambda payload: {"scalars": {"E_total_hartree": -1.0}, "returncode": 0},
+    )
+    app = FastAPI()
+    app.include_router(jobs_router)
+    transport = ASGITransport(app=app)
+    requests = [
+        {"inputs": {"xyz": f"1\nH\nH 0 0 {i}\n"}, "user": "screen"} for i in range(3)
+    ]
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.post("/jobs/batch", json=requests)
+        assert r.status_code == 200
+        body = r.json()
+        assert body["count"] == 3 and len(body["job_ids"]) == 3
+
+        ndjson = "\n".join(_json.dumps(req) for req in requests) + "\n"
+        r = await client.post(
+            "/jobs/batch",
+            content=ndjson,
+            headers={"content-type": "application/x-ndjson"},
+        )
+        assert r.status_code == 200
+        job_ids = body["job_ids"] + r.json()["job_ids"]
+
+        r = await client.post("/jobs/batch", json=[{"inputs": {}}])
+        assert r.status_code == 422
+
+        deadline = time.time() + 5
+        states = set()
+        while time.time() < deadline:
+            states = {(await client.get(f"/jobs/{j}")).json()["state"] for j in job_ids}
+            if states == {"done"}:
+                break
+            await asyncio.sleep(0.05)
+        assert states == {"done"}
+
+
+@pytest.mark.asyncio
+async def test_job_events_stream_progress_from_log(monkeypatch):
+    import json as _json
+    import pathlib
+    from api.services.jobs_store import get_store
+    from api.services.storage import job_dir
+
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    store = get_store()
+    job = store.create()
+    store.set_state(job.id, "running")
+    log = pathlib.Path(__file__).parents[1] / "xtb" / "data" / "xtb_opt.log"
+    (job_dir(job.id) / "xtb.log").write_text(log.read_text(encoding="utf-8"))
+
+    app = FastAPI()
+    app.include_router(jobs_router)
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+
+        async def finish_later():
+            await asyncio.sleep(0.2)
+            store.set_state(job.id, "done", result={})
+
+        finisher = asyncio.create_task(finish_later())
+        r = await client.get(f"/jobs/{job.id}/events")
+        await finisher
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("text/event-stream")
+
+        messages = [m for m in r.text.split("\n\n") if m.startswith("event:")]
+        events = [
+            (m.split("\n")[0][len("event: ") :], _json.loads(m.split("data: ", 1)[1]))
+            for m in messages
+        ]
+        cycles = [data for name, data in events if data.get("type") == "cycle"]
+        assert [c["cycle"] for c in cycles] == [1, 2]
+        assert events[-1] == (
+            "state",
+            {"job_id": job.id, "state": "done", "error": None},
+        )
+
+        r = await client.get("/jobs/missing/events")
+        assert r.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_artifact_download_range_etag_and_gzip(monkeypatch):
+    from api.services.jobs_store import get_store
+    from api.services.storage import job_dir
+
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    store = get_store()
+    job = store.create()
+    data = bytes(range(256)) * 40
+    path = job_dir(job.id) / "homo.cube"
+    path.write_bytes(data)
+    art = {"name": "homo.cube", "path": str(path), "mime": "application/x-cube"}
+    store.set_state(job.id, "running")
+    store.set_state(job.id, "done", result={"artifacts": [art], "scalars": {}})
+
+    app = FastAPI()
+    app.include_router(jobs_router)
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        url = f"/jobs/{job.id}/artifacts/homo.cube"
+        r = await client.get(url)
+        assert r.status_code == 200 and r.content == data
+        etag = r.headers["etag"]
+
+        r = await client.get(url, headers={"Range": "bytes=100-199"})
+        assert r.status_code == 206
+        assert r.content == data[100:200]
+
+        r = await client.get(url, headers={"If-None-Match": etag})
+        assert r.status_code == 304
+
+        r = await client.get(url, params={"compress": "gzip"})
+        assert r.headers["content-encoding"] == "gzip"
+        assert r.content == data  # httpx decodes transparently
+
+        r = await client.get(url, params={"compress": "brotli"})
+        assert r.status_code == 406
+        r = await client.get(
+            url, params={"compress": "brotli"}, headers={"If-None-Match": "*"}
+        )
+        assert r.status_code == 406
+
+        r = await client.get(f"/jobs/{job.id}/artifacts/../../etc/passwd")
+        assert r.status_code == 404
+        r = await client.get(f"/jobs/{job.id}/artifacts/missing.cube")
+        assert r.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_compact_cube_artifact_formats(monkeypatch):
+    import numpy as np
+    from api.services.jobs_store import get_store
+    from api.services.storage import job_dir
+    from nox.artifacts.cubes import CubeFile, compact_cube_file
+
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    store = get_store()
+    job = store.create()
+    cube = job_dir(job.id) / "homo.cube"
+    CubeFile.from_array(np.ones((3, 3, 3))).write(cube)
+    compact = compact_cube_file(cube)
+    art = {
+        "name": "homo.cube",
+        "path": str(compact),
+        "mime": "application/x-cube",
+        "size": compact.stat().st_size,
+        "formats": ["cube", "npz"],
+    }
+    store.set_state(job.id, "running")
+    store.set_state(job.id, "done", result={"artifacts": [art], "scalars": {}})
+
+    app = FastAPI()
+    app.include_router(jobs_router)
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.get(f"/jobs/{job.id}/artifacts")
+        assert r.json()["artifacts"][0]["formats"] == ["cube", "npz"]
+
+        url = f"/jobs/{job.id}/artifacts/homo.cube"
+        r = await client.get(url)
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("application/x-cube")
+        assert r.text.startswith("Cube file generated by NOX")
+        assert 'filename="homo.cube"' in r.headers["content-disposition"]
+        # Streamed from the compact file: no text copy is left on disk
+        assert not cube.exists()
+        r2 = await client.get(url, headers={"If-None-Match": r.headers["etag"]})
+        assert r2.status_code == 304
+
+        r = await client.get(url, params={"format": "npz"})
+        assert r.content == compact.read_bytes()
+        assert "homo.cube.npz" in r.headers["content-disposition"]
+
+        r = await client.get(url, params={"format": "xyz"})
+        assert r.status_code == 406
+        r = await client.get(
+            url, params={"format": "xyz"}, headers={"If-None-Match": "*"}
+        )
+        assert r.status_code == 406
+
+
+@pytest.mark.asyncio
+async def test_cube_views(monkeypatch):
+    import base64
+    import numpy as np
+    from api.services.jobs_store import get_store
+    from api.services.storage import job_dir
+    from nox.artifacts.cubes import CubeFile, compact_cube_file
+
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    store = get_store()
+    job = store.create()
+    g = np.arange(20) - 9.5
+    x, y, z = np.meshgrid(g, g, g, indexing="ij")
+    cube = job_dir(job.id) / "homo.cube"
+    CubeFile.from_array(np.exp(-(x * x + y * y + z * z) / 10)).write(cube)
+    compact = compact_cube_file(cube)
+    art = {
+        "name": "homo.cube",
+        "path": str(compact),
+        "mime": "application/x-cube",
+        "formats": ["cube", "npz"],
+    }
+    store.set_state(job.id, "running")
+    store.set_state(job.id, "done", result={"artifacts": [art], "scalars": {}})
+
+    app = FastAPI()
+    app.include_router(jobs_router)
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        base = f"/jobs/{job.id}/artifacts/homo.cube"
+        r = await client.get(f"{base}/grid", params={"resolution": 10})
+        assert r.status_code == 200
+        assert r.json()["values"]["shape"] == [10, 10, 10]
+
+        r = await client.get(f"{base}/slice", params={"axis": 0})
+        values = r.json()["values"]
+        plane = np.frombuffer(base64.b64decode(values["data"]), "<f4")
+        assert values["shape"] == [20, 20] and plane.size == 400
+
+        params = {"isovalue": 0.5, "resolution": 20}
+        r = await client.get(f"{base}/isosurface", params=params)
+        mesh = r.json()
+        assert mesh["faces"]["shape"][0] > 0
+        # Served from the view cache the second time
+        r2 = await client.get(f"{base}/isosurface", params=params)
+        assert r2.content == r.content
+
+        r = await client.get(f"{base}/isosurface")
+        assert r.status_code == 422
+        r = await client.get(f"{base}/volume")
+        assert r.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_lazy_cube_download(monkeypatch):
+    from api.services.jobs_store import get_store
+    from api.services.lazy_cubes import orbitals_record
+    from api.services.storage import job_dir
+
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    store = get_store()
+    job = store.create()
+    molden = job_dir(job.id) / "molden.input"
+    molden.write_text("[Molden Format]\n", encoding="utf-8")
+    result = {
+        "artifacts": [
+            {
+                "name": "molden.input",
+                "path": str(molden),
+                "mime": "text/plain",
+                "size": molden.stat().st_size,
+            }
+        ],
+        "orbitals": orbitals_record("molden.input"),
+    }
+    store.set_state(job.id, "running")
+    store.set_state(job.id, "done", result=result)
+
+    app = FastAPI()
+    app.include_router(jobs_router)
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.get(f"/jobs/{job.id}/artifacts")
+        assert r.json()["cubes"] == ["homo.cube", "lumo.cube", "density.cube"]
+
+        r = await client.get(f"/jobs/{job.id}/artifacts/lumo.cube")
+        assert r.status_code == 200
+        assert "LUMO" in r.text.splitlines()[1]
+
+        r = await client.get(f"/jobs/{job.id}/artifacts/mo3.cube/grid")
+        assert r.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_workflow_endpoint_rejects_cycles(monkeypatch):
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    app = FastAPI()
+    app.include_router(jobs_router)
+    transport = ASGITransport(app=app)
+    body = {
+        "inputs": {"xyz": "1\n\nH 0 0 0\n"},
+        "stages": [
+            {"name": "a", "depends_on": ["b"]},
+            {"name": "b", "depends_on": ["a"]},
+        ],
+    }
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.post("/jobs/workflow", json=body)
+        assert r.status_code == 422
+        assert "cycle" in r.json()["detail"]
+
+
+@pytest.mark.asyncio
+async def test_cancel_queued_job(monkeypatch):
+    import threading
+
+    from api.services import executor as ex
+
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    monkeypatch.setenv("JOBS_FORCE_LOCAL", "1")
+    pool = ex.LocalExecutor(1, max_queue=10)
+    monkeypatch.setattr(ex, "_executor_singleton", pool)
+    gate = threading.Event()
+    started = threading.Event()
+
+    def blocker():
+        started.set()
+        gate.wait(5)
+
+    pool.submit(blocker)
+    assert started.wait(5)
+
+    app = FastAPI()
+    app.include_router(jobs_router)
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        r = await client.post("/jobs", json={"kind": "echo", "payload": {"x": 1}})
+        job_id = r.json()["job_id"]
+        status = (await client.get(f"/jobs/{job_id}/status")).json()
+        assert status["queue_position"] == 1
+
+        r = await client.post(f"/jobs/{job_id}/cancel")
+        assert r.status_code == 200
+        assert r.json()["state"] == "cancelled"
+
+        # The slot skips the cancelled job once it frees up
+        gate.set()
+        pool._queue.join()
+        assert (await client.get(f"/jobs/{job_id}")).json()["state"] == "cancelled"
+        assert (await client.delete(f"/jobs/{job_id}")).status_code == 200
+        assert (await client.delete("/jobs/missing")).status_code == 404
@@ -0,0 +1,128 @@
+"""
+Tests for the SQLite job storage backend
+"""
+
+import shutil
+import tempfile
+import threading
+import zlib
+
+import pytest
+
+from nox.jobs import JobManager, JobState, SQLiteJobStorage
+
+
+@pytest.fixture
+def sqlite_storage():
+    """Create temporary SQLite storage for testing"""
+    temp_dir = tempfile.mkdtemp()
+    storage = SQLiteJobStorage(temp_dir)
+    yield storage
+    storage.close()
+    shutil.rmtree(temp_dir)
+
+
+def test_wal_mode(sqlite_storage):
+    mode = sqlite_storage._conn().execute("PRAGMA journal_mode").fetchone()[0]
+    assert mode == "wal"
+
+
+def test_save_load_update(sqlite_storage):
+    sqlite_storage.save_job("job1", {"state": "pending", "message": "queued"})
+    assert sqlite_storage.update_job_state("job1", JobState.RUNNING, "Processing", 0.5)
+
+    job = sqlite_storage.load_job("job1")
+    assert job["state"] == "running"
+    assert job["message"] == "Processing"
+    assert job["progress"] == 0.5
+    assert "_metadata" in job
+    assert sqlite_storage.list_jobs(JobState.RUNNING).keys() == {"job1"}
+    assert not sqlite_storage.update_job_state("missing", JobState.RUNNING)
+
+
+def test_result_is_compressed(sqlite_storage):
+    sqlite_storage.save_job("job1", {"state": "running", "result": None})
+    result = {"energy": -5.07, "artifacts": [{"name": "xtb.log"}] * 50}
+    assert sqlite_storage.set_job_result("job1", result)
+
+    job = sqlite_storage.load_job("job1")
+    assert job["result"] == result
+    assert "completed_at" in job
+    blob = (
+        sqlite_storage._conn()
+        .execute("SELECT result FROM jobs WHERE job_id = 'job1'")
+        .fetchone()[0]
+    )
+    assert zlib.decompress(blob)
+
+
+def test_indexed_listing_and_counts(sqlite_storage):
+    with sqlite_storage.batch():
+        for i in range(6):
+            state = "completed" if i % 2 else "pending"
+            sqlite_storage.save_job(
+                f"job{i}",
+                {
+                    "state": state,
+                    "created_at": f"2024-01-0{i + 1}T00:00:00",
+                    "request": {"user": "alice" if i < 4 else "bob"},
+                },
+            )
+
+    assert sqlite_storage.count_by_state() == {"pending": 3, "completed": 3}
+    assert list(sqlite_storage.list_jobs(limit=2)) == ["job5", "job4"]
+    assert list(sqlite_storage.list_jobs(JobState.PENDING)) == ["job4", "job2", "job0"]
+    assert list(sqlite_storage.list_jobs(user="bob")) == ["job5", "job4"]
+
+    plan = " ".join(
+        row[-1]
+        for row in sqlite_storage._conn().execute(
+            "EXPLAIN QUERY PLAN SELECT job_id FROM jobs WHERE state = ?",
+            ("pending",),
+        )
+    )
+    assert "jobs_state" in plan
+
+
+def test_batch_rolls_back(sqlite_storage):
+    with pytest.raises(RuntimeError):
+        with sqlite_storage.batch():
+            sqlite_storage.save_job("job1", {"state": "pending"})
+            raise RuntimeError("boom")
+    assert sqlite_storage.load_job("job1") is None
+
+
+def test_concurrent_writers(sqlite_storage):
+    def write(n):
+        for i in range(20):
+            sqlite_storage.save_job(f"t{n}-{i}", {"state": "pending"})
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sqlite_storage.count_by_state() == {"pending": 80}
+
+
+def test_cleanup_and_delete(sqlite_storage):
+    sqlite_storage.save_job("old", {"state": "completed"})
+    sqlite_storage.save_job("new", {"state": "completed"})
+    with sqlite_storage.batch() as storage:
+        storage._conn().execute("UPDATE jobs SET updated_ts = 0 WHERE job_id = 'old'")
+    assert sqlite_storage.cleanup_old_jobs(max_age_days=1) == 1
+    assert sqlite_storage.delete_job("new")
+    assert not sqlite_storage.delete_job("new")
+
+
+def test_manager_on_sqlite(sqlite_storage):
+    manager = JobManager(sqlite_storage)
+    manager.create_job({"name": "job1"})
+    job2 = manager.create_job({"name": "job2"})
+    manager.update_job_state(job2, JobState.RUNNING)
+
+    stats = manager.get_job_stats()
+    assert stats["total"] == 2
+    assert stats["pending"] == 1
+    assert stats["running"] == 1
+    assert len(manager.list_jobs(limit=1)) == 1
@@ -0,0 +1,83 @@
+import fakeredis
+import pytest
+
+from api.services import async_jobs_store as ajs
+from api.services import jobs_store as js
+
+
+@pytest.mark.asyncio
+async def test_async_redis_store_reads_sync_writes():
+    server = fakeredis.FakeServer()
+    store = js.AtomicRedisJobsStore(fakeredis.FakeRedis(server=server))
+    astore = ajs.AsyncRedisJobsStore(
+        fakeredis.FakeAsyncRedis(server=server), store.prefix
+    )
+    jobs = store.create_many(["alice", "bob", "alice"])
+    store.set_state(jobs[0].id, "running")
+
+    j = await astore.get(jobs[0].id)
+    assert j.state == "running" and j.user == "alice"
+    assert await astore.get("missing") is None
+
+    await astore.set_progress(jobs[0].id, 0.5)
+    await astore.set_progress(jobs[1].id, 0.5)  # queued: ignored
+    assert store.get(jobs[0].id).progress == 0.5
+    assert store.get(jobs[1].id).progress == 0.0
+
+    page, cursor = await astore.list_jobs(user="alice", limit=1)
+    assert [j.id for j in page] == [jobs[2].id] and cursor == 1
+    page, _ = await astore.list_jobs(state="queued")
+    assert {j.id for j in page} == {jobs[1].id, jobs[2].id}
+
+
+@pytest.mark.asyncio
+async def test_get_async_store_follows_backend(monkeypatch):
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    local = js.InMemoryJobsStore()
+    monkeypatch.setattr(js, "_store_singleton", local)
+    astore = ajs.get_async_store()
+    assert isinstance(astore, ajs.AsyncInMemoryJobsStore)
+    j = local.create(user="alice")
+    assert (await astore.get(j.id)).id == j.id
+
+    # A Redis store without REDIS_URL (injected client) runs in threads
+    redis_store = js.AtomicRedisJobsStore(fakeredis.FakeRedis())
+    monkeypatch.setattr(js, "_store_singleton", redis_store)
+    astore = ajs.get_async_store()
+    assert isinstance(astore, ajs.AsyncThreadedJobsStore)
+    j = redis_store.create(user="bob")
+    assert (await astore.get(j.id)).user == "bob"
+    page, _ = await astore.list_jobs(user="bob")
+    assert [x.id for x in page] == [j.id]
+
+
+@pytest.mark.asyncio
+async def test_async_redis_store_reads_offloaded_results_in_threads(
+    monkeypatch, tmp_path
+):
+    from api.services import envelope
+
+    monkeypatch.setattr(envelope.settings, "artifacts_root", tmp_path)
+    monkeypatch.setattr(envelope.settings, "result_inline_max_bytes", 1024)
+    server = fakeredis.FakeServer()
+    store = js.AtomicRedisJobsStore(fakeredis.FakeRedis(server=server))
+    astore = ajs.AsyncRedisJobsStore(
+        fakeredis.FakeAsyncRedis(server=server), store.prefix
+    )
+    job = store.create()
+    store.set_state(job.id, "running")
+    result = {"series": {"x": [[i, i * 0.5] for i in range(5000)]}}
+    store.set_state(job.id, "done", result=result)
+
+    reads = []
+    real_to_thread = ajs.asyncio.to_thread
+
+    async def to_thread(func, *args):
+        reads.append(func)
+        return await real_to_thread(func, *args)
+
+    monkeypatch.setattr(ajs.asyncio, "to_thread", to_thread)
+    assert (await astore.get(job.id)).result == result
+    page, _ = await astore.list_jobs(state="done")
+    assert page[0].result == result
+    assert reads == [envelope.read_offloaded] * 2
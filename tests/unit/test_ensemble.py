@@ -0,0 +1,137 @@
+import json
+import time
+
+import numpy as np
+import pytest
+
+from api.schemas.job import JobRequest
+from api.services import queue
+from api.services.ensemble import (
+    KB_HARTREE,
+    boltzmann_weights,
+    split_frames,
+    submit_ensemble,
+)
+from api.services.jobs_store import get_store
+
+FRAMES = "".join(
+    f"2\nframe {i}\nH 0 0 0\nH 0 0 {0.70 + 0.01 * i:.2f}\n" for i in range(4)
+)
+
+
+def fake_runner(payload):
+    """Energy depends on the H-H distance; frame 2 fails."""
+    jr = JobRequest.model_validate(payload["job_request"])
+    distance = float(jr.inputs.xyz.split()[-1])
+    if abs(distance - 0.72) < 1e-6:
+        raise RuntimeError("SCF did not converge")
+    return {
+        "scalars": {"E_total_hartree": -1.0 - distance / 100, "gap_eV": distance},
+        "series": {},
+        "artifacts": [],
+        "returncode": 0,
+    }
+
+
+def wait_terminal(job_id, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        j = get_store().get(job_id)
+        if j.state in ("done", "failed", "cancelled"):
+            return j
+        time.sleep(0.01)
+    return get_store().get(job_id)
+
+
+def test_split_frames():
+    frames = split_frames(FRAMES)
+    assert len(frames) == 4
+    assert frames[1].splitlines()[1] == "frame 1"
+    assert split_frames(["2\n\nH 0 0 0\nH 0 0 1\n", " "]) == ["2\n\nH 0 0 0\nH 0 0 1\n"]
+    with pytest.raises(ValueError):
+        split_frames("3\ntruncated\nH 0 0 0\n")
+
+
+def test_boltzmann_weights():
+    energies = np.array([0.0, KB_HARTREE * 300 * np.log(2), np.nan])
+    w = boltzmann_weights(energies, 300)
+    np.testing.assert_allclose(w, [2 / 3, 1 / 3, 0.0])
+
+
+def test_list_of_frames_requires_ensemble_kind():
+    with pytest.raises(ValueError):
+        JobRequest(inputs={"xyz": ["2\n\nH 0 0 0\nH 0 0 1\n"]})
+
+
+def test_ensemble_fans_out_and_aggregates(monkeypatch):
+    monkeypatch.setenv("JOBS_FORCE_LOCAL", "1")
+    monkeypatch.setattr(queue, "_xtb_runner", fake_runner)
+
+    jr = JobRequest(kind="ensemble", inputs={"xyz": FRAMES, "temperature": 300})
+    parent = submit_ensemble(jr)
+    j = wait_terminal(parent.id)
+
+    assert j.state == "done"
+    res = j.result
+    assert len(res["children"]) == 4
+    child_states = [get_store().get(c).state for c in res["children"]]
+    assert child_states == ["done", "done", "failed", "done"]
+    assert res["scalars"]["n_failed"] == 1.0
+    # Frame 2 failed, so it is absent from the series
+    assert [f for f, _ in res["series"]["energy_hartree"]] == [0, 1, 3]
+    weights = [w for _, w in res["series"]["boltzmann_weight"]]
+    assert sum(weights) == pytest.approx(1.0)
+    assert weights[-1] == max(weights)  # lowest energy
+    json.dumps(res)  # stays JSON-serializable for the stores
+
+
+def test_ensemble_fails_when_all_frames_fail(monkeypatch):
+    monkeypatch.setenv("JOBS_FORCE_LOCAL", "1")
+
+    def failing(payload):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(queue, "_xtb_runner", failing)
+    parent = submit_ensemble(JobRequest(kind="ensemble", inputs={"xyz": FRAMES}))
+    j = wait_terminal(parent.id)
+    assert j.state == "failed"
+    assert "All 4 frames failed" in j.error
+
+
+def test_cancelling_an_ensemble_cancels_its_frames(monkeypatch):
+    import threading
+
+    from api.services import executor as ex
+
+    monkeypatch.setenv("JOBS_FORCE_LOCAL", "1")
+    # One slot: frame 0 runs while the others wait in the queue
+    monkeypatch.setattr(ex, "_executor_singleton", ex.LocalExecutor(1, max_queue=10))
+    started = threading.Event()
+    ran = []
+
+    def runner(payload):
+        ran.append(payload["frame"])
+        started.set()
+        limits = queue.run_limits(
+            JobRequest.model_validate(payload["job_request"]),
+            payload["job_id"],
+            queue.parent_of(payload),
+        )
+        stopped, deadline = None, time.time() + 3
+        while stopped is None and time.time() < deadline:
+            stopped = limits.check(0)
+            time.sleep(0.01)
+        return {"stopped": stopped, "scalars": {}, "artifacts": []}
+
+    monkeypatch.setattr(queue, "_xtb_runner", runner)
+    frames = FRAMES.replace(" 0.7", " 0.8")
+    parent = submit_ensemble(JobRequest(kind="ensemble", inputs={"xyz": frames}))
+    assert started.wait(3)
+    assert queue.cancel_job(parent.id).state == "running"
+
+    j = wait_terminal(parent.id)
+    assert j.state == "cancelled"
+    children = get_store().children(parent.id)
+    assert [get_store().get(children[i]).state for i in range(4)] == ["cancelled"] * 4
+    # Queued frames were skipped rather than run
+    assert ran == [0]
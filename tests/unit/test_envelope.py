@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+from api.services import envelope
+
+
+def test_roundtrip_small_and_compressed():
+    small = {"a": 1, "xyz": "1\n\nH 0 0 0\n"}
+    data = envelope.dumps(small)
+    assert data[:4] == b"NX\x01j"
+    assert envelope.loads(data) == small
+
+    large = {"series": {"orbitals": [[i, 2.0, -0.5 * i] for i in range(2000)]}}
+    data = envelope.dumps(large)
+    assert data[3:4] in (envelope.CODEC_ZLIB, envelope.CODEC_ZSTD)
+    assert len(data) < len(json.dumps(large))
+    assert envelope.loads(data) == large
+
+
+def test_plain_json_is_accepted():
+    assert envelope.loads('{"job_request": "{}"}') == {"job_request": "{}"}
+    assert envelope.loads(b"null") is None
+
+
+def test_unknown_version_rejected():
+    with pytest.raises(ValueError):
+        envelope.loads(b"NX\x09j{}")
+
+
+@pytest.mark.parametrize("codec", [envelope.CODEC_ZLIB, envelope.CODEC_ZSTD])
+def test_corrupt_body_rejected(codec):
+    if codec == envelope.CODEC_ZSTD and envelope.zstandard is None:
+        pytest.skip("zstandard is not installed")
+    with pytest.raises(ValueError, match="Corrupt envelope"):
+        envelope.loads(b"NX\x01" + codec + b"not compressed")
+    with pytest.raises(ValueError):
+        envelope.loads(b"NX")
+
+
+def test_numpy_and_bytes_with_either_encoder(monkeypatch):
+    import numpy as np
+
+    value = {"v": np.arange(3, dtype=np.float32), "n": np.int64(7), "b": b"\x00\xff"}
+    expected = {"v": [0.0, 1.0, 2.0], "n": 7, "b": "AP8="}
+    assert envelope.loads(envelope.dumps(value)) == expected
+    monkeypatch.setattr(envelope, "orjson", None)
+    assert envelope.loads(envelope.dumps(value)) == expected
+
+
+def _offloaded(tmp_path, job_id):
+    return sorted((tmp_path / job_id).glob("result.*.nxe"))
+
+
+def test_large_results_are_offloaded(tmp_path, monkeypatch):
+    import fakeredis
+
+    from api.services import jobs_store as js
+
+    monkeypatch.setattr(envelope.settings, "artifacts_root", tmp_path)
+    monkeypatch.setattr(envelope.settings, "result_inline_max_bytes", 1024)
+    store = js.AtomicRedisJobsStore(fakeredis.FakeRedis())
+    job = store.create()
+    store.set_state(job.id, "running")
+    result = {
+        "scalars": {"E": -5.07},
+        "series": {"x": [[i, i * 0.5] for i in range(5000)]},
+    }
+    done = store.set_state(job.id, "done", result=result)
+    assert done.result == result
+
+    raw = store.r.hget(store._key(job.id), "result")
+    assert len(raw) < 100
+    assert len(_offloaded(tmp_path, job.id)) == 1
+    assert store.get(job.id).result == result
+
+
+def test_rejected_transition_keeps_offloaded_result(tmp_path, monkeypatch):
+    import fakeredis
+
+    from api.services import jobs_store as js
+
+    monkeypatch.setattr(envelope.settings, "artifacts_root", tmp_path)
+    monkeypatch.setattr(envelope.settings, "result_inline_max_bytes", 1024)
+    store = js.AtomicRedisJobsStore(fakeredis.FakeRedis())
+    job = store.create()
+    store.set_state(job.id, "running")
+    result = {"series": {"x": [[i, i * 0.5] for i in range(5000)]}}
+    store.set_state(job.id, "done", result=result)
+    files = _offloaded(tmp_path, job.id)
+
+    # A late cancel with its own partial result is refused by the script
+    partial = {"series": {"x": [[i, 0.0] for i in range(5000)]}}
+    assert store.set_state(job.id, "cancelled", result=partial) is None
+    assert _offloaded(tmp_path, job.id) == files
+    assert store.get(job.id).result == result
@@ -0,0 +1,62 @@
+import threading
+
+import pytest
+
+from api.services import executor as ex
+from api.services.queue import submit
+
+
+def test_executor_bounds_queue_and_reports_depth():
+    pool = ex.LocalExecutor(workers=1, max_queue=2)
+    gate = threading.Event()
+    started = threading.Event()
+
+    def blocker():
+        started.set()
+        gate.wait(5)
+
+    pool.submit(blocker)
+    assert started.wait(5)
+    pool.submit(gate.wait, 5)
+    pool.submit(gate.wait, 5)
+    with pytest.raises(ex.QueueFullError):
+        pool.submit(gate.wait, 5)
+    with pytest.raises(ex.QueueFullError):
+        pool.ensure_capacity(1)
+
+    stats = pool.stats()
+    assert stats["busy"] == 1 and stats["queued"] == 2
+    assert stats["rejected"] == 2
+
+    gate.set()
+    pool._queue.join()
+    assert pool.stats()["completed"] == 3
+
+
+def test_xtb_env_partitions_threads(monkeypatch):
+    monkeypatch.setattr(ex.settings, "xtb_threads", 2)
+    monkeypatch.setattr(ex.settings, "local_workers", 0)
+    env = ex.xtb_env()
+    assert env["OMP_NUM_THREADS"] == "2"
+    assert ex.slot_count() >= 1
+
+
+def test_submit_rejects_when_local_queue_full(monkeypatch):
+    monkeypatch.setenv("JOBS_FORCE_LOCAL", "1")
+    pool = ex.LocalExecutor(1, max_queue=1)
+    monkeypatch.setattr(ex, "_executor_singleton", pool)
+    gate = threading.Event()
+    started = threading.Event()
+
+    def blocker():
+        started.set()
+        gate.wait(5)
+
+    pool.submit(blocker)
+    assert started.wait(5)
+    pool.submit(gate.wait, 5)
+    try:
+        with pytest.raises(ex.QueueFullError):
+            submit("echo", {"x": 1})
+    finally:
+        gate.set()
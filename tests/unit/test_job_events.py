@@ -0,0 +1,78 @@
+import asyncio
+import json
+import threading
+import time
+
+import fakeredis
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from api.routes.jobs import router as jobs_router
+from api.services import jobs_store as js
+from api.services.job_events import wait_for_job, waiters
+
+
+@pytest.fixture
+def local_store(monkeypatch):
+    monkeypatch.delenv("REDIS_URL", raising=False)
+    store = js.InMemoryJobsStore()
+    monkeypatch.setattr(js, "_store_singleton", store)
+    return store
+
+
+@pytest.mark.asyncio
+async def test_wait_wakes_on_transition(local_store):
+    j = local_store.create()
+    local_store.set_state(j.id, "running")
+
+    def finish():
+        time.sleep(0.2)
+        local_store.set_state(j.id, "done", result={"ok": True})
+
+    threading.Thread(target=finish).start()
+    start = time.monotonic()
+    done = await wait_for_job(j.id, 10)
+    assert done.state == "done"
+    assert time.monotonic() - start < 2
+    assert len(waiters) == 0
+
+
+@pytest.mark.asyncio
+async def test_wait_times_out_and_missing(local_store):
+    j = local_store.create()
+    assert (await wait_for_job(j.id, 0.1)).state == "queued"
+    assert await wait_for_job("missing", 0.1) is None
+
+
+@pytest.mark.asyncio
+async def test_wait_route(local_store):
+    app = FastAPI()
+    app.include_router(jobs_router)
+    j = local_store.create()
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        waiting = asyncio.create_task(client.get(f"/jobs/{j.id}/wait?timeout=10"))
+        await asyncio.sleep(0.1)
+        local_store.set_state(j.id, "failed", error="boom")
+        r = await waiting
+        assert r.status_code == 200
+        assert r.json()["state"] == "failed"
+        assert r.json()["message"] == "boom"
+        r = await client.get("/jobs/missing/wait?timeout=0")
+        assert r.status_code == 404
+
+
+@pytest.mark.parametrize("store_cls", [js.RedisJobsStore, js.AtomicRedisJobsStore])
+def test_redis_stores_publish_transitions(store_cls):
+    fake = fakeredis.FakeRedis()
+    store = store_cls(fake)
+    pubsub = fake.pubsub()
+    pubsub.subscribe(store._events_channel())
+    pubsub.get_message(timeout=1)  # subscription confirmation
+
+    j = store.create()
+    store.set_state(j.id, "running")
+    message = pubsub.get_message(timeout=1)
+    assert json.loads(message["data"]) == {"id": j.id, "state": "running"}
@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+from api.services import lazy_cubes
+from api.services.disk_cache import DiskLRUCache
+from api.services.settings import settings
+from nox.artifacts.cubes import CubeGenerationError
+
+
+@pytest.fixture
+def job(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "artifacts_root", tmp_path)
+    monkeypatch.setattr(
+        lazy_cubes, "_cache_singleton", DiskLRUCache(tmp_path / "cubes", 10**8)
+    )
+    molden = tmp_path / "job" / "molden.input"
+    molden.parent.mkdir()
+    molden.write_text("[Molden Format]\n", encoding="utf-8")
+    art = {"name": "molden.input", "path": str(molden), "mime": "text/plain"}
+    return {
+        "artifacts": [art],
+        "orbitals": lazy_cubes.orbitals_record("molden.input"),
+    }
+
+
+def test_builds_cube_once_on_request(job, monkeypatch):
+    calls = []
+    real = lazy_cubes.generate_cubes_from_molden
+
+    def counting(molden, out, kinds):
+        calls.append(kinds)
+        time.sleep(0.05)
+        return real(molden, out, kinds)
+
+    monkeypatch.setattr(lazy_cubes, "generate_cubes_from_molden", counting)
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(lazy_cubes.find_lazy_cube(job, "homo.cube"))
+        )
+        for _ in range(4)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert calls == [["homo"]]
+    paths = {str(path) for path, _ in results}
+    assert len(paths) == 1
+    path, art = results[0]
+    assert path.name == "homo.cube.npz" and art["formats"] == ["cube", "npz"]
+
+
+def test_orbital_index_and_unknown_names(job):
+    path, art = lazy_cubes.find_lazy_cube(job, "mo7.cube")
+    assert path.name.startswith("mo7.cube")
+    assert lazy_cubes.find_lazy_cube(job, "xtb.log") is None
+    assert lazy_cubes.find_lazy_cube({"artifacts": []}, "homo.cube") is None
+
+
+def test_failed_build_is_not_cached(job, monkeypatch):
+    monkeypatch.setattr(
+        lazy_cubes, "generate_cubes_from_molden", lambda molden, out, kinds: []
+    )
+    with pytest.raises(CubeGenerationError):
+        lazy_cubes.find_lazy_cube(job, "lumo.cube")
+    assert lazy_cubes.get_cube_cache().stats()["entries"] == 0
@@ -0,0 +1,109 @@
+import time
+
+import pytest
+
+from api.services import jobs_store as js
+
+
+@pytest.fixture
+def artifacts(monkeypatch, tmp_path):
+    monkeypatch.setattr(js.settings, "artifacts_root", tmp_path)
+    return tmp_path
+
+
+def test_job_uses_slots():
+    assert not hasattr(js.Job(id="x"), "__dict__")
+
+
+def test_max_jobs_spills_oldest_finished(artifacts):
+    store = js.InMemoryJobsStore(max_jobs=2, terminal_ttl=0)
+    a, b = store.create(), store.create()
+    store.set_state(a.id, "running")
+    store.set_state(a.id, "done", result={"energy": -5.0})
+    c = store.create()
+
+    assert a.id not in store._jobs
+    assert (artifacts / a.id / js.SPILL_FILE).is_file()
+    spilled = store.get(a.id)
+    assert spilled.state == "done" and spilled.result == {"energy": -5.0}
+    # Queued jobs are never evicted, even past the bound
+    d = store.create()
+    assert {b.id, c.id, d.id} <= set(store._jobs)
+    page, _ = store.list_jobs()
+    assert a.id not in {j.id for j in page}
+
+
+def test_result_byte_budget(artifacts):
+    store = js.InMemoryJobsStore(max_result_bytes=10_000, terminal_ttl=0)
+    ids = []
+    for _ in range(5):
+        j = store.create()
+        store.set_state(j.id, "running")
+        store.set_state(j.id, "done", result={"blob": "x" * 4000})
+        ids.append(j.id)
+    assert store._result_bytes <= 10_000
+    assert ids[0] not in store._jobs and ids[-1] in store._jobs
+    assert all(store.get(i).result == {"blob": "x" * 4000} for i in ids)
+
+
+def test_terminal_ttl(artifacts):
+    store = js.InMemoryJobsStore(terminal_ttl=0.05)
+    j = store.create()
+    store.set_state(j.id, "failed", error="boom")
+    time.sleep(0.1)
+    store.create()
+    assert j.id not in store._jobs
+    assert store.get(j.id).error == "boom"
+
+
+def test_spilled_job_is_reloaded_for_transitions(artifacts):
+    store = js.InMemoryJobsStore(max_jobs=1, terminal_ttl=0)
+    j = store.create()
+    store.set_state(j.id, "cancelled", error="early")
+    store.create()
+    assert j.id not in store._jobs
+    # Terminal once spilled too: the late write is rejected
+    assert store.set_state(j.id, "failed", error="late") is None
+    assert store.get(j.id).error == "early"
+    assert store.get("unknown") is None
+
+
+def test_set_state_validates_transitions():
+    store = js.InMemoryJobsStore()
+    j = store.create()
+    seen = []
+    store.add_listener(lambda job_id, state: seen.append(state))
+    assert store.set_state(j.id, "done") is None
+    job = store.set_state(j.id, "running")
+    assert job is not None and job.state == "running"
+    assert store.set_state(j.id, "done", result={"x": 1}).result == {"x": 1}
+    assert store.set_state(j.id, "failed", error="late") is None
+    assert store.get(j.id).state == "done" and store.get(j.id).error is None
+    assert store.set_state("unknown", "running") is None
+    assert seen == ["running", "done"]
+
+
+def test_failed_spill_keeps_job_accounted(artifacts, monkeypatch):
+    store = js.InMemoryJobsStore(max_result_bytes=10_000, terminal_ttl=0)
+
+    def broken_spill(job):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(store, "_spill", broken_spill)
+    ids = []
+    for _ in range(3):
+        j = store.create()
+        store.set_state(j.id, "running")
+        store.set_state(j.id, "done", result={"blob": "x" * 4000})
+        ids.append(j.id)
+    # Nothing could be spilled: every job stays in memory and in the budget
+    assert all(i in store._jobs for i in ids)
+    assert set(store._finished) == set(ids)
+    assert store._result_bytes == sum(store._finished.values())
+
+    monkeypatch.undo()
+    monkeypatch.setattr(js.settings, "artifacts_root", artifacts)
+    store.create()
+    assert store._result_bytes <= 10_000
+    assert len([i for i in ids if i not in store._jobs]) == 1
+    assert all(store.get(i).result == {"blob": "x" * 4000} for i in ids)
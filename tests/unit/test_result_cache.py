@@ -0,0 +1,91 @@
+import json
+
+from api.services import result_cache as rc
+from api.services.queue import submit
+from api.schemas.job import JobRequest
+
+
+XYZ = "2\nH2\nH 0 0 0\nH 0 0 0.74\n"
+
+
+def test_cache_key_ignores_formatting_noise():
+    noisy = "2\n  some comment \nh   0.000000 -0.0000001 0\nH 0 0 0.7400000001\n"
+    params = {"gfn": 2, "opt": True}
+    assert rc.cache_key(XYZ, 0, 1, params) == rc.cache_key(noisy, 0, 1, params)
+    assert rc.cache_key(XYZ, 0, 1, params) != rc.cache_key(XYZ, 1, 1, params)
+    assert rc.cache_key(XYZ, 0, 1, params) != rc.cache_key(
+        XYZ, 0, 1, {"gfn": 1, "opt": True}
+    )
+
+
+def test_result_cache_roundtrip_and_lru_eviction(tmp_path):
+    cache = rc.ResultCache(tmp_path / "cache", max_bytes=10**6)
+    job = tmp_path / "job"
+    job.mkdir()
+    (job / "xtbout.json").write_text("x" * 50)
+    result = {
+        "scalars": {"E_total_hartree": -1.0},
+        "artifacts": [
+            {"name": "xtbout.json", "path": str(job / "xtbout.json"), "size": 50}
+        ],
+        "returncode": 0,
+    }
+
+    cache.put("a" * 64, result)
+    # Room for two entries only
+    cache.store.max_bytes = int(cache.stats()["bytes"] * 2.5)
+    hit = cache.get("a" * 64, tmp_path / "other")
+    assert hit["scalars"] == {"E_total_hartree": -1.0}
+    assert (tmp_path / "other" / "xtbout.json").read_text() == "x" * 50
+    assert hit["artifacts"][0]["path"] == str(tmp_path / "other" / "xtbout.json")
+
+    cache.put("b" * 64, result)
+    cache.get("a" * 64, tmp_path / "other")  # "a" is now most recently used
+    cache.put("c" * 64, result)
+    assert cache.get("b" * 64, tmp_path / "other") is None
+    assert cache.get("a" * 64, tmp_path / "other") is not None
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 3 and stats["misses"] == 1
+
+
+def test_submit_serves_cache_hit_without_running(monkeypatch, tmp_path):
+    monkeypatch.setenv("JOBS_FORCE_LOCAL", "1")
+    cache = rc.ResultCache(tmp_path / "cache", max_bytes=10**6)
+    monkeypatch.setattr(rc, "_cache_singleton", cache)
+
+    request = JobRequest(**{"inputs": {"xyz": XYZ}})
+    cache.put(
+        rc.request_key(request),
+        {"scalars": {"E_total_hartree": -1.17}, "artifacts": [], "returncode": 0},
+    )
+
+    def must_not_run(payload):
+        raise AssertionError("cache hit should not run xtb")
+
+    monkeypatch.setattr("api.services.queue._xtb_runner", must_not_run)
+    job = submit("xtb", {"job_request": json.dumps(request.model_dump())})
+    assert job.state == "done"
+    assert job.result["scalars"]["E_total_hartree"] == -1.17
+    assert job.result["cache_key"] == rc.request_key(request)
+
+
+def test_malformed_xyz_is_a_miss_not_a_submit_error(monkeypatch, tmp_path):
+    monkeypatch.setenv("JOBS_FORCE_LOCAL", "1")
+    cache = rc.ResultCache(tmp_path / "cache", max_bytes=10**6)
+    monkeypatch.setattr(rc, "_cache_singleton", cache)
+    monkeypatch.setattr("api.services.queue._xtb_runner", lambda payload: {})
+
+    bad = "2\nH2\nH a b c\nH 0 0 0.74\n"
+    job = submit("xtb", {"job_request": {"inputs": {"xyz": bad}}})
+    assert job.id and cache.stats()["hits"] == 0
+
+
+def test_unreadable_entry_counts_as_miss(tmp_path):
+    cache = rc.ResultCache(tmp_path / "cache", max_bytes=10**6)
+    cache.put("a" * 64, {"scalars": {}, "artifacts": []})
+    (tmp_path / "cache" / ("a" * 64) / rc.RESULT_FILE).write_text("{broken")
+    assert cache.get("a" * 64, tmp_path / "other") is None
+    stats = cache.stats()
+    assert stats["hits"] == 0 and stats["misses"] == 1
@@ -0,0 +1,82 @@
+import queue
+
+import pytest
+
+from api.services.scheduler import FairQueue, check_priority
+
+
+def drain(q, n):
+    return [q.get() for _ in range(n)]
+
+
+def test_users_share_a_class_round_robin():
+    q = FairQueue(100)
+    for i in range(5):
+        q.put(f"screen{i}", key=f"s{i}", user="bulk-user")
+    q.put("mine", key="m", user="alice")
+
+    # alice's single job goes second, not behind the whole screen
+    assert [item for item, _ in drain(q, 3)] == ["screen0", "mine", "screen1"]
+
+
+def test_weights_and_strict_priority():
+    q = FairQueue(100, weights={"alice": 2})
+    for i in range(4):
+        q.put(f"a{i}", user="alice")
+        q.put(f"b{i}", user="bob")
+    q.put("urgent", user="bob", priority="interactive")
+
+    order = [item for item, _ in drain(q, 7)]
+    assert order[0] == "urgent"
+    assert order[1:] == ["a0", "a1", "b0", "a2", "a3", "b1"]
+
+
+def test_user_cap_skips_busy_users():
+    q = FairQueue(100, user_cap=1)
+    q.put("a0", user="alice")
+    q.put("a1", user="alice")
+    q.put("b0", user="bob")
+
+    assert q.get() == ("a0", "alice")
+    assert q.get() == ("b0", "bob")  # alice is at her cap
+    q.task_done("alice")
+    assert q.get() == ("a1", "alice")
+
+
+def test_position_and_bounds():
+    q = FairQueue(3)
+    q.put("x", key="x0", user="screen", priority="bulk")
+    q.put("y", key="y0", user="screen", priority="bulk")
+    q.put("z", key="z0", user="alice", priority="interactive")
+    with pytest.raises(queue.Full):
+        q.put("w", user="alice")
+
+    assert q.position("z0") == 1
+    assert q.position("y0") == 3
+    assert q.position("missing") is None
+    assert q.stats()["queued_by_priority"] == {"interactive": 1, "batch": 0, "bulk": 2}
+
+
+def test_check_priority():
+    assert check_priority(None) == "batch"
+    assert check_priority(None, "interactive") == "interactive"
+    with pytest.raises(ValueError):
+        check_priority("urgent")
+
+
+@pytest.mark.parametrize("redis", [False, True])
+def test_store_slots_enforce_cap(redis):
+    from api.services import jobs_store as js
+
+    if redis:
+        import fakeredis
+
+        store = js.RedisJobsStore(fakeredis.FakeRedis())
+    else:
+        store = js.InMemoryJobsStore()
+    assert store.acquire_slot("alice", 2)
+    assert store.acquire_slot("alice", 2)
+    assert not store.acquire_slot("alice", 2)
+    assert store.acquire_slot("bob", 2)
+    store.release_slot("alice")
+    assert store.acquire_slot("alice", 2)
@@ -0,0 +1,79 @@
+import hashlib
+import time
+
+from api.services import scratch
+from api.services.jobs_store import get_store
+from api.services.queue import submit_job
+
+
+def poll_state(job_id: str, timeout: float = 3.0):
+    deadline = time.time() + timeout
+    store = get_store()
+    while time.time() < deadline:
+        j = store.get(job_id)
+        if j is not None and j.state in ("done", "failed"):
+            return j
+        time.sleep(0.01)
+    return store.get(job_id)
+
+
+def test_scratch_run_persists_declared_artifacts(monkeypatch, tmp_path):
+    monkeypatch.setenv("JOBS_FORCE_LOCAL", "1")
+    monkeypatch.setattr(scratch.settings, "artifacts_root", tmp_path / "artifacts")
+    monkeypatch.setattr(scratch.settings, "scratch_root", tmp_path / "scratch")
+    remembered = []
+
+    def runner(payload):
+        job_id = payload["job_id"]
+        work = scratch.run_dir(job_id)
+        assert work == tmp_path / "scratch" / job_id
+        (work / "xtb.log").write_text("log\n")
+        (work / "wbo").write_text("temporary\n")
+        scratch.when_persisted(job_id, remembered.append)
+        return {
+            "scalars": {"E_total_hartree": -1.0},
+            "artifacts": [
+                {"name": "xtb.log", "path": str(work / "xtb.log"), "size": 4}
+            ],
+            "returncode": 0,
+        }
+
+    monkeypatch.setattr("api.services.queue._xtb_runner", runner)
+    job_id = submit_job("xtb", {"job_request": {"inputs": {"xyz": "H 0 0 0"}}})
+    job = poll_state(job_id)
+    assert job.state == "done", job.error
+
+    art = job.result["artifacts"][0]
+    final = tmp_path / "artifacts" / job_id / "xtb.log"
+    assert art["path"] == str(final)
+    assert art["sha256"] == hashlib.sha256(b"log\n").hexdigest()
+    assert final.read_text() == "log\n"
+    # Undeclared temporaries are dropped with the scratch directory
+    assert not (tmp_path / "scratch" / job_id).exists()
+    assert not (tmp_path / "artifacts" / job_id / "wbo").exists()
+    assert remembered and remembered[0]["artifacts"][0]["path"] == str(final)
+
+
+def test_complete_in_foreground_persists_before_returning(monkeypatch, tmp_path):
+    monkeypatch.setattr(scratch.settings, "artifacts_root", tmp_path / "artifacts")
+    monkeypatch.setattr(scratch.settings, "scratch_root", tmp_path / "scratch")
+    work = scratch.run_dir("j1")
+    (work / "xtb.log").write_text("log\n")
+    result = {"artifacts": [{"name": "xtb.log", "path": str(work / "xtb.log")}]}
+    finished = []
+
+    scratch.complete(
+        "j1", result, lambda r, err: finished.append(err), background=False
+    )
+    assert finished == [None]
+    assert (tmp_path / "artifacts" / "j1" / "xtb.log").read_text() == "log\n"
+    assert not work.exists()
+
+
+def test_live_path_prefers_scratch(monkeypatch, tmp_path):
+    monkeypatch.setattr(scratch.settings, "artifacts_root", tmp_path / "artifacts")
+    monkeypatch.setattr(scratch.settings, "scratch_root", tmp_path / "scratch")
+    artifacts, scratch_root = tmp_path / "artifacts", tmp_path / "scratch"
+    assert scratch.live_path("j1", "xtb.log") == artifacts / "j1" / "xtb.log"
+    (scratch.run_dir("j1") / "xtb.log").write_text("")
+    assert scratch.live_path("j1", "xtb.log") == scratch_root / "j1" / "xtb.log"
@@ -0,0 +1,148 @@
+import threading
+import time
+
+from api.schemas.job import JobRequest
+from api.services import singleflight
+from api.services.jobs_store import get_store
+from api.services.queue import _request_hash, submit, submit_many
+
+XYZ = "2\nH2\nH 0 0 0\nH 0 0 0.7412\n"
+
+
+def wait_done(job_ids, timeout=5.0):
+    store = get_store()
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        jobs = [store.get(i) for i in job_ids]
+        if all(j.state in ("done", "failed", "cancelled") for j in jobs):
+            return jobs
+        time.sleep(0.01)
+    return [store.get(i) for i in job_ids]
+
+
+def test_concurrent_duplicates_run_once(monkeypatch):
+    monkeypatch.setenv("JOBS_FORCE_LOCAL", "1")
+    monkeypatch.setattr(singleflight.settings, "result_cache_enabled", False)
+    gate = threading.Event()
+    calls = []
+
+    def runner(payload):
+        calls.append(payload["job_id"])
+        gate.wait(5)
+        return {"scalars": {"E_total_hartree": -1.17}, "artifacts": [], "returncode": 0}
+
+    monkeypatch.setattr("api.services.queue._xtb_runner", runner)
+    request = {"inputs": {"xyz": XYZ, "params": {"gfn": 1}}}
+    leader = submit("xtb", {"job_request": request})
+    followers = submit_many("xtb", [{"job_request": request} for _ in range(2)])
+    assert all(j.state == "queued" for j in followers)
+
+    gate.set()
+    jobs = wait_done([leader.id] + [j.id for j in followers])
+    assert calls == [leader.id]
+    assert all(j.state == "done" for j in jobs)
+    for job in jobs[1:]:
+        assert job.result["coalesced_from"] == leader.id
+        assert job.result["scalars"] == {"E_total_hartree": -1.17}
+        assert job.result["payload"]["job_id"] == job.id
+
+    # The flight has landed: a new submission leads its own run
+    gate.clear()
+    again = submit("xtb", {"job_request": request})
+    gate.set()
+    wait_done([again.id])
+    assert calls == [leader.id, again.id]
+
+
+def test_followers_of_a_cancelled_leader_run_on_their_own(monkeypatch):
+    from api.services.queue import cancel_job, run_limits
+
+    monkeypatch.setenv("JOBS_FORCE_LOCAL", "1")
+    monkeypatch.setattr(singleflight.settings, "result_cache_enabled", False)
+    calls = []
+
+    def runner(payload):
+        calls.append(payload["job_id"])
+        limits = run_limits(JobRequest.model_validate(request), payload["job_id"])
+        if len(calls) == 1:
+            # The leader waits to be cancelled
+            deadline = time.time() + 5
+            while limits.check(0) is None and time.time() < deadline:
+                time.sleep(0.01)
+            return {"stopped": "cancelled", "scalars": {}, "artifacts": []}
+        return {"scalars": {"E_total_hartree": -1.17}, "artifacts": [], "returncode": 0}
+
+    monkeypatch.setattr("api.services.queue._xtb_runner", runner)
+    request = {"inputs": {"xyz": XYZ, "params": {"gfn": 2, "uhf": True}}}
+    leader = submit("xtb", {"job_request": request})
+    followers = submit_many("xtb", [{"job_request": request} for _ in range(2)])
+    deadline = time.time() + 5
+    while not calls and time.time() < deadline:
+        time.sleep(0.01)
+    cancel_job(leader.id)
+
+    jobs = wait_done([leader.id] + [j.id for j in followers])
+    assert [j.state for j in jobs] == ["cancelled", "done", "done"]
+    # One follower led a new flight and the other followed it
+    assert len(calls) == 2 and calls[1] in {j.id for j in followers}
+    assert sum("coalesced_from" in j.result for j in jobs[1:]) == 1
+
+
+def test_sweep_redispatches_followers_of_a_lost_leader(monkeypatch):
+    monkeypatch.setenv("JOBS_FORCE_LOCAL", "1")
+    monkeypatch.setattr(singleflight.settings, "result_cache_enabled", False)
+    calls = []
+
+    def runner(payload):
+        calls.append(payload["job_id"])
+        return {"scalars": {"E_total_hartree": -1.17}, "artifacts": [], "returncode": 0}
+
+    monkeypatch.setattr("api.services.queue._xtb_runner", runner)
+    request = {"inputs": {"xyz": XYZ, "params": {"gfn": 0}}}
+    # A leader whose worker died: it leads the flight but never lands
+    store = get_store()
+    lost = store.create()
+    key = _request_hash({"job_request": request})
+    assert singleflight.coalesce(key, {"job_id": lost.id}) is None
+    follower = submit("xtb", {"job_request": request})
+
+    singleflight.sweep()
+    assert store.get(follower.id).state == "queued"
+
+    # A queued leader is waiting for a slot, however long: never lost
+    monkeypatch.setattr(singleflight.settings, "singleflight_claim_sec", 0)
+    singleflight.sweep()
+    assert store.get(follower.id).state == "queued"
+
+    # A running leader without a heartbeat is
+    store.set_state(lost.id, "running")
+    assert singleflight.sweep() >= 1
+    (job,) = wait_done([follower.id])
+    assert job.state == "done" and "coalesced_from" not in job.result
+    assert calls == [follower.id]
+
+
+def test_redis_flights_hand_over_followers():
+    import fakeredis
+
+    flights = singleflight.RedisFlights(fakeredis.FakeRedis(), "jobs:")
+    assert flights.join("k", "a", {"job_id": "a"}) is None
+    assert flights.join("k", "b", {"job_id": "b", "parent_id": "p"}) == "a"
+    assert flights.land("k", "b") == []  # only the leader lands a flight
+    assert flights.land("k", "a") == [{"job_id": "b", "parent_id": "p"}]
+    assert flights.join("k", "c", {"job_id": "c"}) is None
+    assert list(flights.leaders()) == [("k", "c")]
+
+
+def test_redis_flights_land_after_the_leader_key_expired():
+    import fakeredis
+
+    r = fakeredis.FakeRedis()
+    flights = singleflight.RedisFlights(r, "jobs:")
+    assert flights.join("k", "a", {"job_id": "a"}) is None
+    assert flights.join("k", "b", {"job_id": "b"}) == "a"
+    r.delete("jobs:flight:k")
+    # The registry still finds the flight, and its followers are handed over
+    assert list(flights.leaders()) == [("k", "a")]
+    assert flights.land("k", "a") == [{"job_id": "b"}]
+    assert list(flights.leaders()) == []
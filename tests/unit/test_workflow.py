@@ -0,0 +1,202 @@
+import random
+import time
+
+import pytest
+
+from api.schemas.job import JobRequest, WorkflowRequest, WorkflowStage
+from api.services import queue
+from api.services import result_cache as rc
+from api.services.jobs_store import get_store
+from api.services.result_cache import remember
+from api.services.storage import job_dir
+from api.services.workflow import stage_order, submit_workflow
+
+
+@pytest.fixture(autouse=True)
+def artifacts(monkeypatch, tmp_path):
+    # Job directories and the result cache stay out of the real artifacts
+    monkeypatch.setattr(rc.settings, "artifacts_root", tmp_path)
+    monkeypatch.setattr(rc, "_cache_singleton", None)
+    return tmp_path
+
+
+def make_runner(calls):
+    """Fake xtb: 'optimizes' by shifting z, and caches like the real runner."""
+
+    def run(payload):
+        jr = JobRequest.model_validate(payload["job_request"])
+        jd = job_dir(payload["job_id"])
+        calls.append((jr.inputs.params, jr.inputs.xyz, jd))
+        artifacts = []
+        if jr.inputs.params.opt:
+            opt = jd / "xtbopt.xyz"
+            opt.write_text(jr.inputs.xyz.replace(" 0.74", " 0.70"), encoding="utf-8")
+            (jd / "xtbrestart").write_bytes(b"restart")
+            artifacts.append(
+                {"name": "xtbopt.xyz", "path": str(opt), "size": opt.stat().st_size}
+            )
+        result = {
+            "scalars": {"E_total_hartree": -1.1},
+            "series": {},
+            "artifacts": artifacts,
+            "returncode": 0,
+        }
+        remember(jr, result)
+        return result
+
+    return run
+
+
+def wait_terminal(job_id, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        j = get_store().get(job_id)
+        if j.state in ("done", "failed", "cancelled"):
+            return j
+        time.sleep(0.01)
+    return get_store().get(job_id)
+
+
+def unique_h2():
+    x = random.random()
+    return f"2\nH2\nH {x:.5f} 0 0\nH {x:.5f} 0 0.74\n"
+
+
+def test_stage_order_validation():
+    inputs = {"xyz": "1\n\nH 0 0 0\n"}
+    req = WorkflowRequest(inputs=inputs)
+    assert stage_order(req)[0] == "opt"
+    cyclic = WorkflowRequest(
+        inputs=inputs,
+        stages=[
+            WorkflowStage(name="a", depends_on=["b"]),
+            WorkflowStage(name="b", depends_on=["a"]),
+        ],
+    )
+    with pytest.raises(ValueError, match="cycle"):
+        stage_order(cyclic)
+    with pytest.raises(ValueError, match="unknown"):
+        stage_order(
+            WorkflowRequest(
+                inputs=inputs, stages=[WorkflowStage(name="a", depends_on=["x"])]
+            )
+        )
+
+
+def test_default_workflow_chains_stages(monkeypatch):
+    monkeypatch.setenv("JOBS_FORCE_LOCAL", "1")
+    calls = []
+    monkeypatch.setattr(queue, "_xtb_runner", make_runner(calls))
+
+    parent = submit_workflow(WorkflowRequest(inputs={"xyz": unique_h2()}))
+    j = wait_terminal(parent.id)
+
+    assert j.state == "done", j.error
+    assert set(j.result["stages"]) == {"opt", "hess", "properties", "cubes"}
+    assert len(calls) == 4
+    opt_params, _, opt_dir = calls[0]
+    assert opt_params.opt
+    for params, xyz, jd in calls[1:]:
+        assert not params.opt
+        # Later stages start from the optimized geometry and see opt's dir
+        assert " 0.70" in xyz
+        assert (jd / "deps" / "opt").resolve() == opt_dir.resolve()
+        assert (jd / "xtbrestart").read_bytes() == b"restart"
+    assert "opt.xtbopt.xyz" in {a["name"] for a in j.result["artifacts"]}
+
+
+def test_cached_stages_are_skipped(monkeypatch):
+    monkeypatch.setenv("JOBS_FORCE_LOCAL", "1")
+    calls = []
+    monkeypatch.setattr(queue, "_xtb_runner", make_runner(calls))
+    req = WorkflowRequest(inputs={"xyz": unique_h2()})
+
+    assert wait_terminal(submit_workflow(req).id).state == "done"
+    ran = len(calls)
+    j = wait_terminal(submit_workflow(req).id)
+
+    assert j.state == "done"
+    assert len(calls) == ran
+
+
+def test_failed_stage_fails_workflow(monkeypatch):
+    monkeypatch.setenv("JOBS_FORCE_LOCAL", "1")
+
+    def failing(payload):
+        raise RuntimeError("no SCF convergence")
+
+    monkeypatch.setattr(queue, "_xtb_runner", failing)
+    j = wait_terminal(submit_workflow(WorkflowRequest(inputs={"xyz": unique_h2()})).id)
+    assert j.state == "failed"
+    assert "Stage opt failed" in j.error
+
+
+def test_failed_branch_stops_the_other_branches(monkeypatch):
+    from api.services import executor as ex
+
+    monkeypatch.setenv("JOBS_FORCE_LOCAL", "1")
+    monkeypatch.setattr(ex, "_executor_singleton", ex.LocalExecutor(2, max_queue=10))
+    calls = []
+    req = WorkflowRequest(
+        inputs={"xyz": unique_h2()},
+        stages=[
+            WorkflowStage(name="a"),
+            WorkflowStage(name="b", params={"gfn": 1}),
+            WorkflowStage(name="c", depends_on=["a"], params={"gfn": 0}),
+        ],
+    )
+    parent = None
+
+    def runner(payload):
+        calls.append(payload["stage"])
+        if payload["stage"] == 1:
+            raise RuntimeError("no SCF convergence")
+        # Stage a finishes only once b has failed the workflow
+        deadline = time.time() + 3
+        while parent is None or get_store().get(parent.id).state != "failed":
+            if time.time() > deadline:
+                break
+            time.sleep(0.01)
+        return {"scalars": {}, "series": {}, "artifacts": [], "returncode": 0}
+
+    monkeypatch.setattr(queue, "_xtb_runner", runner)
+    parent = submit_workflow(req)
+    j = wait_terminal(parent.id)
+    deadline = time.time() + 3
+    while len(get_store().children(parent.id)) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+
+    assert j.state == "failed" and "Stage b failed" in j.error
+    assert sorted(calls) == [0, 1]
+    assert get_store().get(parent.id).error == j.error
+
+
+def test_cancelled_workflow_dispatches_no_more_stages(monkeypatch):
+    monkeypatch.setenv("JOBS_FORCE_LOCAL", "1")
+    calls = []
+
+    def runner(payload):
+        calls.append(payload["stage"])
+        limits = queue.run_limits(
+            JobRequest.model_validate(payload["job_request"]),
+            payload["job_id"],
+            queue.parent_of(payload),
+        )
+        stopped, deadline = None, time.time() + 3
+        while stopped is None and time.time() < deadline:
+            stopped = limits.check(0)
+            time.sleep(0.01)
+        return {"stopped": stopped, "scalars": {}, "artifacts": []}
+
+    monkeypatch.setattr(queue, "_xtb_runner", runner)
+    parent = submit_workflow(WorkflowRequest(inputs={"xyz": unique_h2()}))
+    deadline = time.time() + 3
+    while not calls and time.time() < deadline:
+        time.sleep(0.01)
+    queue.cancel_job(parent.id)
+
+    j = wait_terminal(parent.id)
+    assert j.state == "cancelled"
+    opt = get_store().children(parent.id)[0]
+    assert get_store().get(opt).state == "cancelled"
+    assert calls == [0]
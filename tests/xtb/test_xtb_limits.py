@@ -0,0 +1,71 @@
+import sys
+import time
+
+import pytest
+
+from ai.runners.xtb import RunLimits, _run_cmd
+
+
+def _alive(pid: int) -> bool:
+    """True unless ``pid`` is gone or a zombie waiting to be reaped."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="needs /proc and RLIMIT_CPU")
+def test_wall_time_kills_process_group(tmp_path):
+    # The shell starts a background child that must die with it
+    cmd = "sh -c 'sleep 30 & echo $! > child.pid; wait'"
+    limits = RunLimits(wall_time=0.5)
+    start = time.monotonic()
+    ret = _run_cmd(cmd, tmp_path, tmp_path / "x.log", limits=limits)
+    assert time.monotonic() - start < 10
+    assert ret != 0 and limits.stopped == "timeout"
+    child = int((tmp_path / "child.pid").read_text())
+    time.sleep(0.1)
+    assert not _alive(child)
+
+
+def test_cancel_keeps_streamed_output(tmp_path):
+    chunks = []
+    script = "import time; print('CYCLE 1', flush=True); time.sleep(30)"
+    limits = RunLimits(is_cancelled=lambda: bool(chunks))
+    _run_cmd(
+        f'{sys.executable} -c "{script}"',
+        tmp_path,
+        tmp_path / "x.log",
+        chunks.append,
+        limits=limits,
+    )
+    assert limits.stopped == "cancelled"
+    assert "CYCLE 1" in "".join(chunks)
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="needs /proc and RLIMIT_CPU")
+def test_cpu_limit_is_reported_as_timeout(tmp_path):
+    limits = RunLimits(cpu_time=1)
+    cmd = f'{sys.executable} -c "while True: pass"'
+    ret = _run_cmd(cmd, tmp_path, tmp_path / "x.log", limits=limits)
+    assert ret < 0 and limits.stopped == "timeout"
+
+
+def test_heartbeat_is_rate_limited():
+    beats = []
+    limits = RunLimits(heartbeat=lambda: beats.append(1), heartbeat_interval=60)
+    for elapsed in range(5):
+        assert limits.check(elapsed) is None
+    assert beats == [1]
+    limits.heartbeat_interval = 0
+    limits.check(5)
+    assert beats == [1, 1]
+
+
+@pytest.mark.skipif(sys.platform != "linux", reason="needs /proc and RLIMIT_CPU")
+def test_sigkill_before_cpu_limit_is_a_failure(tmp_path):
+    # Killed from outside (OOM killer, operator) long before the CPU limit
+    limits = RunLimits(cpu_time=60)
+    ret = _run_cmd("sh -c 'kill -9 $$'", tmp_path, tmp_path / "x.log", limits=limits)
+    assert ret < 0 and limits.stopped is None
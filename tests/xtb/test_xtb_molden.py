@@ -0,0 +1,82 @@
+import ai.runners.xtb as xtb_runner
+
+
+ENERGY = "          | TOTAL ENERGY               -0.500000000000 Eh   |\n"
+
+
+def _fake_xtb(calls, write_molden_on, returncode=0, log=ENERGY):
+    """Stand-in for _run_cmd that records commands and fakes xtb outputs."""
+
+    def run(cmd, cwd, log_path, on_output=None, limits=None):
+        calls.append(cmd)
+        log_path.write_text(log + "normal termination of xtb\n", encoding="utf-8")
+        if on_output is not None:
+            on_output(log_path.read_text(encoding="utf-8"))
+        if "--opt" in cmd:
+            (cwd / "xtbopt.xyz").write_text("1\n\nH 0 0 0\n", encoding="utf-8")
+        if len(calls) in write_molden_on:
+            (cwd / "molden.input").write_text("[Molden Format]\n", encoding="utf-8")
+        return returncode
+
+    return run
+
+
+def test_cubes_use_molden_from_primary_run(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(xtb_runner, "_run_cmd", _fake_xtb(calls, {1}))
+    params = {"gfn": 1, "opt": True, "cubes": True}
+
+    res = xtb_runner.run_xtb_job(tmp_path, "1\n\nH 0 0 0\n", -1, 1, params)
+
+    assert len(calls) == 1
+    assert "--molden" in calls[0] and "--opt" in calls[0]
+    assert [a["name"] for a in res["artifacts"]][-1] == "molden.input"
+    # Cubes are only built when downloaded
+    assert res["orbitals"]["molden"] == "molden.input"
+    assert not list(tmp_path.glob("*.cube*"))
+
+
+def test_molden_fallback_restarts_from_optimized_geometry(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(xtb_runner, "_run_cmd", _fake_xtb(calls, {2}))
+    params = {"gfn": 1, "opt": True, "cubes": True}
+
+    res = xtb_runner.run_xtb_job(tmp_path, "1\n\nH 0 0 0\n", -1, 1, params)
+
+    assert len(calls) == 2
+    restart = calls[1]
+    assert " xtbopt.xyz " in restart
+    assert "--gfn 1" in restart and "--chrg -1" in restart
+    assert "--opt" not in restart
+    assert any(a["name"] == "molden.input" for a in res["artifacts"])
+
+
+def test_molden_fallback_after_failed_run_with_energy(tmp_path, monkeypatch):
+    # e.g. an optimization that did not converge (returncode 2)
+    calls = []
+    monkeypatch.setattr(xtb_runner, "_run_cmd", _fake_xtb(calls, {2}, returncode=2))
+    params = {"gfn": 1, "opt": True, "cubes": True}
+
+    res = xtb_runner.run_xtb_job(tmp_path, "1\n\nH 0 0 0\n", -1, 1, params)
+
+    assert len(calls) == 2
+    assert res["orbitals"]["molden"] == "molden.input"
+
+
+def test_no_molden_fallback_without_energy(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(xtb_runner, "_run_cmd", _fake_xtb(calls, {2}, log=""))
+    params = {"gfn": 1, "opt": True, "cubes": True}
+
+    res = xtb_runner.run_xtb_job(tmp_path, "1\n\nH 0 0 0\n", -1, 1, params)
+
+    assert len(calls) == 1 and "orbitals" not in res
+
+
+def test_no_molden_without_cubes(tmp_path, monkeypatch):
+    calls = []
+    monkeypatch.setattr(xtb_runner, "_run_cmd", _fake_xtb(calls, set()))
+
+    xtb_runner.run_xtb_job(tmp_path, "1\n\nH 0 0 0\n", 0, 1, {"opt": True})
+
+    assert len(calls) == 1 and "--molden" not in calls[0]
@@ -0,0 +1,90 @@
+import json
+import pathlib
+import sys
+
+import numpy as np
+
+from ai.runners.xtb import _run_cmd
+from nox.parsers.xtb_output import XTBOutputParser
+
+DATA = pathlib.Path(__file__).parent / "data"
+
+
+def _parse(*names, chunk=53):
+    parser = XTBOutputParser()
+    for name in names:
+        text = (DATA / name).read_text(encoding="utf-8")
+        for i in range(0, len(text), chunk):
+            parser.feed(text[i : i + chunk])
+        parser.close()
+    return parser
+
+
+def test_single_point_sections():
+    parser = _parse("xtb_sp.log")
+    arrays = parser.arrays()
+
+    orbitals = arrays["orbitals"]
+    assert orbitals.shape == (6, 3)
+    np.testing.assert_allclose(orbitals[:, 1], [2, 2, 2, 2, 0, 0])
+    assert orbitals[3, 2] == -12.0237  # HOMO, eV
+
+    np.testing.assert_allclose(
+        arrays["mulliken_charges"], [[1, -0.5659], [2, 0.2830], [3, 0.2830]]
+    )
+    # Each bond once, lower atom index first
+    np.testing.assert_allclose(
+        arrays["wiberg_bond_orders"], [[1, 2, 0.9179], [1, 3, 0.9179]]
+    )
+    np.testing.assert_allclose(arrays["dipole_au"], [[0.0, 0.0, -0.865]])
+
+    scalars = parser.scalars()
+    assert scalars["E_total_hartree"] == -5.070544440612
+    assert scalars["gap_eV"] == 14.084517058887
+    assert scalars["dipole_D"] == 2.198
+
+
+def test_optimization_trajectory_and_cycles():
+    parser = _parse("xtb_opt.log", "xtbopt.log")
+    series = parser.series()
+    assert series["opt_cycles"] == [
+        [1.0, -1.0357484, 0.0412345],
+        [2.0, -1.0370123, 0.000321],
+    ]
+    assert [row[0] for row in series["opt_trajectory"]] == [1.0, 2.0]
+    assert series["opt_trajectory"][1][1] == -5.070757124431
+
+
+def test_json_scalars_take_precedence():
+    parser = _parse("xtb_sp.log")
+    parser.feed_json(json.loads((DATA / "xtbout.json").read_text(encoding="utf-8")))
+    assert parser.scalars()["E_total_hartree"] == -40.123456789
+    assert parser.scalars()["gap_eV"] == 3.217
+
+
+def test_json_fills_missing_series():
+    parser = XTBOutputParser()
+    parser.feed_json(
+        {
+            "total energy": -5.07,
+            "dipole / a.u.": [0.0, 0.0, -0.86],
+            "partial charges": [-0.56, 0.28, 0.28],
+            "orbital energies / eV": [-18.8, 2.06],
+            "fractional occupation": [2.0, 0.0],
+        }
+    )
+    series = parser.series()
+    assert parser.scalars()["E_total_hartree"] == -5.07
+    assert series["mulliken_charges"][0] == [1.0, -0.56]
+    assert series["orbitals"] == [[1.0, 2.0, -18.8], [2.0, 0.0, 2.06]]
+
+
+def test_run_cmd_streams_log_while_running(tmp_path):
+    chunks = []
+    script = "import time; print('CYCLE 1', flush=True); time.sleep(1.2); print('end')"
+    ret = _run_cmd(
+        f'{sys.executable} -c "{script}"', tmp_path, tmp_path / "x.log", chunks.append
+    )
+    assert ret == 0
+    assert "".join(chunks) == "CYCLE 1\nend\n"
+    assert len([c for c in chunks if c]) >= 2
@@ -0,0 +1,22 @@
+import pathlib
+
+from nox.parsers.xtb_progress import XTBProgressParser
+
+LOG = pathlib.Path(__file__).parent / "data" / "xtb_opt.log"
+
+
+def test_progress_parser_emits_cycles_in_arbitrary_chunks():
+    text = LOG.read_text(encoding="utf-8")
+    parser = XTBProgressParser()
+    events = []
+    for i in range(0, len(text), 37):  # split lines mid-way on purpose
+        events.extend(parser.feed(text[i : i + 37]))
+    events.extend(parser.close())
+
+    cycles = [e for e in events if e["type"] == "cycle"]
+    assert [c["cycle"] for c in cycles] == [1, 2]
+    assert cycles[0]["energy"] == -1.0357484
+    assert cycles[1]["gradient_norm"] == 0.000321
+    assert cycles[1]["progress"] == 0.2  # 2 of max. 10 optcycles
+    assert [e["type"] for e in events][-2:] == ["converged", "finished"]
+    assert parser.progress == 1.0
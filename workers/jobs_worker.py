@@ -2,8 +2,21 @@ from __future__ import annotations
 import os
 import time
 import dramatiq
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+from api.services import envelope
 from api.services.jobs_store import get_store
+from api.services.settings import settings
+from api.services.queue import (
+    job_message,
+    load_job_request,
+    notify_parents,
+    parent_of,
+    run_limits,
+    skip_cancelled,
+)
+from api.services.scheduler import DEFAULT_PRIORITY, PRIORITY_CLASSES, queue_name
+from api.services.scratch import complete, run_dir, when_persisted
+from api.services.workflow import prepare_stage_dir
 
 # Set up Dramatiq broker
 try:
@@ -19,10 +32,43 @@ except Exception:
 dramatiq.set_broker(broker)
 
 
+class EnvelopeEncoder(dramatiq.Encoder):
+    """Encode Dramatiq messages as job envelopes (see api.services.envelope)."""
+
+    def encode(self, data: Dict[str, Any]) -> bytes:
+        return envelope.dumps(data)
+
+    def decode(self, data: bytes) -> Dict[str, Any]:
+        try:
+            return envelope.loads(data)
+        except ValueError as e:
+            raise dramatiq.DecodeError(f"Invalid message: {e}", data, e) from e
+
+
+dramatiq.set_encoder(EnvelopeEncoder())
+
+
 @dramatiq.actor
-def enqueue_job(job_id: str, kind: str, payload: Dict[str, Any]):
+def enqueue_job(
+    job_id: str, kind: str, payload: Dict[str, Any], priority: Optional[str] = None
+):
     """Dramatiq actor for handling different job types"""
     store = get_store()
+    if skip_cancelled(store, job_id, payload):
+        return
+    job = store.get(job_id)
+    user = job.user if job is not None else None
+    cap = settings.user_max_running
+    if cap and not store.acquire_slot(user, cap):
+        # The user already runs their share: try again later, same class
+        message = job_message(
+            enqueue_job, job_id, kind, payload, priority or DEFAULT_PRIORITY
+        )
+        broker.enqueue(message, delay=settings.user_cap_retry_ms)
+        return
+
+    result = None
+    error = None
     try:
         store.set_state(job_id, "running")
 
@@ -34,27 +80,51 @@ def enqueue_job(job_id: str, kind: str, payload: Dict[str, Any]):
             result = run_xtb_calculation(payload)
         else:
             result = {"echo": payload}
-
-        store.set_state(job_id, "done", result=result)
     except Exception as e:  # noqa: BLE001
-        store.set_state(job_id, "failed", error=str(e))
+        error = str(e)
+
+    def finish(result, persist_error):
+        try:
+            if error or persist_error:
+                store.set_state(job_id, "failed", error=error or persist_error)
+            elif result.get("stopped"):
+                # Cancelled or timed out: keep the partial results
+                stopped = result["stopped"]
+                store.set_state(job_id, stopped, error=f"Job {stopped}", result=result)
+            else:
+                store.set_state(job_id, "done", result=result)
+        finally:
+            if cap:
+                store.release_slot(user)
+            # Ensemble and workflow children report to their parent job
+            notify_parents(payload)
+
+    # Persist before returning: the message is acknowledged when the actor
+    # returns, so a worker exiting mid-persist would otherwise lose the job
+    complete(job_id, result, finish, background=False)
+
+
+# One queue per priority class. Workers consume all of them by default;
+# strict priority needs dedicated workers per class, e.g.
+# ``dramatiq workers.jobs_worker -Q default.interactive``.
+for _priority in PRIORITY_CLASSES:
+    broker.declare_queue(queue_name(enqueue_job.queue_name, _priority))
 
 
 def run_xtb_calculation(payload: Dict[str, Any]) -> Dict[str, Any]:
     """Execute XTB calculation with given parameters"""
-    from api.schemas.job import JobRequest
-    from api.services.storage import job_dir
+    from api.services.result_cache import remember
     from ai.runners.xtb import run_xtb_job
 
     # Parse the job request
-    job_request_json = payload.get("job_request", "{}")
     try:
-        JR = JobRequest.model_validate_json(job_request_json)
+        JR = load_job_request(payload.get("job_request"))
     except Exception as e:
         raise ValueError(f"Invalid job request: {e}")
 
     job_id = payload.get("job_id", "unknown")
-    jd = job_dir(job_id)
+    jd = run_dir(job_id)
+    prepare_stage_dir(payload, jd)
 
     result = run_xtb_job(
         jd,
@@ -62,7 +132,11 @@ def run_xtb_calculation(payload: Dict[str, Any]) -> Dict[str, Any]:
         JR.inputs.charge,
         JR.inputs.multiplicity,
         JR.inputs.params.model_dump(),
+        on_progress=lambda p: get_store().set_progress(job_id, p),
+        limits=run_limits(JR, job_id, parent_of(payload)),
     )
+    if result.get("stopped"):
+        return result
 
     # XTB success: return code 0 OR (return code 2 with valid energy results)
     has_energy = result.get("scalars", {}).get("E_total_hartree") is not None
@@ -76,4 +150,6 @@ def run_xtb_calculation(payload: Dict[str, Any]) -> Dict[str, Any]:
         )
         raise RuntimeError(error_msg)
 
+    # Cache the result once its artifacts are in the artifact store
+    when_persisted(job_id, lambda r: remember(JR, r))
     return result